@@ -21,6 +21,51 @@ DATABASES = {
         'PORT': '5432',
     }
 }
+# Every request and websocket connect opens a new database connection with the above. With psycopg 3
+# (`pip install wahlfang[postgres]`) the threads of a worker process can share a bounded pool of connections instead.
+# Borrowed connections are checked first and recycled after `max_lifetime` seconds. The wait for a connection is
+# exported as `wahlfang_db_pool_wait_seconds`, keep `max_size` times the number of workers below max_connections.
+# DATABASES = {
+#     'default': {
+#         'ENGINE': 'wahlfang.db.postgresql',
+#         'NAME': '<db_name>',
+#         'USER': '<db_username>',
+#         'PASSWORD': '<password>',
+#         'HOST': 'localhost',
+#         'PORT': '5432',
+#         'CONN_MAX_AGE': 0,  # required with the pool
+#         'OPTIONS': {
+#             'pool': {
+#                 'min_size': 2,
+#                 'max_size': 10,
+#                 'timeout': 10,  # seconds waiting for a free connection
+#                 'max_lifetime': 30 * 60,
+#                 'max_idle': 10 * 60,
+#             },
+#         },
+#     }
+# }
+# Small deployments can use SQLite instead, with WAL journaling, a busy timeout and serialized writes.
+# Measure the ballot throughput with `wahlfang benchmark_ballots --voters 2000 --threads 32`
+# DATABASES = {
+#     'default': {
+#         'ENGINE': 'wahlfang.db.sqlite3',
+#         'NAME': '/var/lib/wahlfang/db.sqlite3',
+#         'OPTIONS': {
+#             'busy_timeout': 5000,  # milliseconds
+#             'mmap_size': 256 * 1024 * 1024,
+#         },
+#     }
+# }
+# A streaming read replica of the PostgreSQL database can serve the voter overview, the spectator page, the result
+# exports and the prometheus gauges. Writes, logins and everything else stay on `default`. Users who wrote to the
+# database (e.g. voted) read from `default` for `REPLICA_STICKY_SECONDS` afterwards, keep it above the replication lag.
+# DATABASES['replica'] = {
+#     **DATABASES['default'],
+#     'HOST': '<replica_host>',
+# }
+# REPLICA_DATABASE = 'replica'
+# REPLICA_STICKY_SECONDS = 10
 
 # 'collectstatic' command will copy all the static files here.
 # Alias this location from your webserver to `/static`
@@ -36,9 +81,32 @@ CHANNEL_LAYERS = {
         },
     },
 }
+# Without redis, the worker processes can exchange the channel layer messages over PostgreSQL (LISTEN/NOTIFY, requires
+# psycopg 3). Group messages are published in batches of up to `batch_delay` milliseconds. Compare the layers with
+# `wahlfang benchmark_channel_layer` after configuring both (e.g. under the aliases "default" and "redis").
+# CHANNEL_LAYERS = {
+#     "default": {
+#         "BACKEND": "wahlfang.layers.PostgresChannelLayer",
+#         "CONFIG": {
+#             "database": "default",  # or "conninfo": "host=db.example.org dbname=wahlfang", e.g. to bypass PgBouncer
+#             "batch_delay": 2,
+#             "max_batch": 100,
+#         },
+#     },
+# }
+
+# The live turnout counters and the versions of the cached election cards are kept in the cache. With more than one
+# worker process they need a cache shared by all workers, e.g. the redis server of the channel layer.
+# CACHES = {
+#     "default": {
+#         "BACKEND": "django.core.cache.backends.redis.RedisCache",
+#         "LOCATION": "redis://127.0.0.1:6379/1",
+#     },
+# }
 
 # Make sure that this directory is created or Django will fail on start.
 LOGGING['handlers']['file']['filename'] = '/var/log/wahlfang/wahlfang.log'
+LOGGING['handlers']['slow_queries']['filename'] = '/var/log/wahlfang/slow_queries.log'
 
 #: See https://docs.djangoproject.com/en/dev/ref/settings/#allowed-hosts
 ALLOWED_HOSTS = [
@@ -78,3 +146,49 @@ SEND_FROM_MANAGER_EMAIL = True
 # This has to be configured such that the mail server can actually send mails from the valid manager emails.
 VALID_MANAGER_EMAIL_DOMAINS = []
 URL = '<domain of your web server, e.g. "vote.stustanet.de">'
+
+# Record the number of database queries and the database time per view as prometheus metrics and log
+# queries slower than `SQL_SLOW_QUERY_THRESHOLD` milliseconds (with call site and query plan) to slow_queries.log
+# SQL_BUDGET_INSTRUMENTATION = True
+# SQL_SLOW_QUERY_THRESHOLD = 100
+
+
+# Sampling profiler for views and websocket consumers. Profiles one in `PROFILER_SAMPLE_RATE` requests and every
+# request slower than `PROFILER_SLOW_THRESHOLD` milliseconds to `PROFILER_SPOOL_DIR`.
+# Aggregate them into a flame graph with `wahlfang profile_flamegraph -o flamegraph.svg`
+# PROFILER_ENABLED = True
+# PROFILER_SAMPLE_RATE = 100
+# PROFILER_SLOW_THRESHOLD = 1000
+# PROFILER_SPOOL_DIR = '/var/lib/wahlfang/profiles'
+
+# Group commit for vote rushes: every worker process stores the submitted ballots in batches of up to
+# `BALLOT_GROUP_COMMIT_MAX_BATCH` ballots, waiting at most `BALLOT_GROUP_COMMIT_MAX_DELAY` milliseconds for further
+# ballots. A voter only gets the confirmation once the batch with the ballot is committed.
+# BALLOT_GROUP_COMMIT = True
+# BALLOT_GROUP_COMMIT_MAX_BATCH = 200
+# BALLOT_GROUP_COMMIT_MAX_DELAY = 10
+# BALLOT_GROUP_COMMIT_TIMEOUT = 30  # seconds, the voter gets an error page if the batch is not committed in time
+
+# The spectator page is rendered once per change of the session and shared by all spectators. Allow browsers and
+# proxies in front of wahlfang to reuse it for `SPECTATOR_MAX_AGE` seconds before revalidating it with its ETag
+# SPECTATOR_MAX_AGE = 5
+
+# When serving HTTP with ASGI (e.g. daphne), the voter index, ballot, access code login and spectator pages can be
+# served by native async views. Access codes are then verified by `ASYNC_PASSWORD_WORKERS` threads.
+# SQL_BUDGET_INSTRUMENTATION and PROFILER_ENABLED are synchronous and turn the request handling synchronous again.
+# ASYNC_VOTER_VIEWS = True
+# ASYNC_PASSWORD_WORKERS = 4
+
+# Every worker compiles the templates, populates the URL resolvers, connects to the databases and loads the password
+# hasher before it serves requests, the duration is logged and exported as `wahlfang_warmup_duration_seconds`.
+# This happens on ASGI lifespan startup (uvicorn, hypercorn) and when the WSGI application is loaded. Daphne sends no
+# lifespan events, warm up when it imports the application instead.
+# The warm-up on import (WSGI and WARM_UP_ON_IMPORT) does not connect to the databases, so a preloading server
+# (`gunicorn --preload`) does not hand the connections or the connection pool of the parent to the forked workers.
+# A database which can not be reached during the warm-up is logged, the worker starts anyway.
+# WARM_UP = True
+# WARM_UP_ON_IMPORT = True  # with daphne
+
+# `wahlfang archive_sessions` (e.g. run by a timer, see docs/deploying.md) freezes the results of the sessions whose
+# elections all ended `ARCHIVE_AFTER_DAYS` days ago, archives their ballots and purges the access codes and avatars.
+# ARCHIVE_AFTER_DAYS = 90
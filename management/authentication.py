@@ -1,7 +1,6 @@
 from django.contrib.auth import REDIRECT_FIELD_NAME
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth.decorators import user_passes_test
-from django_auth_ldap.backend import LDAPBackend
 
 from management.models import ElectionManager
 
@@ -46,6 +45,9 @@ class ManagementBackend(BaseBackend):
         return ElectionManager.objects.filter(pk=user_id).first()
 
 
-class ManagementBackendLDAP(LDAPBackend):
-    def get_user_model(self):
-        return ElectionManager
+def __getattr__(name):
+    # django-auth-ldap and python-ldap are only imported by deployments which enable the LDAP backend
+    if name == 'ManagementBackendLDAP':
+        from management.ldap import ManagementBackendLDAP  # pylint: disable=import-outside-toplevel
+        return ManagementBackendLDAP
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,17 +1,27 @@
+import asyncio
 import json
 
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from wahlfang.profiling import ProfiledConsumerMixin
 
-class ElectionConsumer(AsyncWebsocketConsumer):
+# turnout changes are collected and sent at most every TURNOUT_INTERVAL seconds
+TURNOUT_INTERVAL = 0.25
+
+
+class ElectionConsumer(ProfiledConsumerMixin, AsyncWebsocketConsumer):
 
     async def connect(self):
         self.group = "Election-" + \
             self.scope['url_route']['kwargs']['pk']  # pylint: disable=W0201
+        self.turnout_delta = {}  # pylint: disable=W0201
+        self.turnout_task = None  # pylint: disable=W0201
         await self.channel_layer.group_add(self.group, self.channel_name)
         await self.accept()
 
     async def disconnect(self, code):
+        if self.turnout_task:
+            self.turnout_task.cancel()
         await self.channel_layer.group_discard(self.group, self.channel_name)
 
     async def send_reload(self, event):
@@ -19,8 +29,21 @@ class ElectionConsumer(AsyncWebsocketConsumer):
             'reload': event['id'],
         }))
 
+    async def send_turnout(self, event):
+        for name, delta in event['delta'].items():
+            self.turnout_delta[name] = self.turnout_delta.get(name, 0) + delta
+        if self.turnout_task is None:
+            self.turnout_task = asyncio.ensure_future(self.flush_turnout())  # pylint: disable=W0201
+
+    async def flush_turnout(self):
+        await asyncio.sleep(TURNOUT_INTERVAL)
+        delta, self.turnout_delta, self.turnout_task = self.turnout_delta, {}, None  # pylint: disable=W0201
+        await self.send(text_data=json.dumps({
+            'turnout': delta,
+        }))
+
 
-class SessionConsumer(AsyncWebsocketConsumer):
+class SessionConsumer(ProfiledConsumerMixin, AsyncWebsocketConsumer):
 
     async def connect(self):
         session = self.scope['url_route']['kwargs']['pk']
@@ -51,7 +74,7 @@ class SessionConsumer(AsyncWebsocketConsumer):
         }))
 
 
-class AddMobileConsumer(AsyncWebsocketConsumer):
+class AddMobileConsumer(ProfiledConsumerMixin, AsyncWebsocketConsumer):
 
     async def connect(self):
         self.group = "QR-Reload-" + \
@@ -0,0 +1,122 @@
+import csv
+import json
+import re
+import zipfile
+from typing import Iterable, Iterator, List, Tuple
+
+from django.http import StreamingHttpResponse
+
+from vote.models import Application, Election
+
+ElectionResults = Tuple[Election, List[Application]]
+
+HEADER = ['#', 'applicant', 'email', 'yes', 'no', 'abstention']
+EXPORT_FORMATS = ('csv', 'jsonl', 'zip')
+
+
+class _Buffer:
+    """
+    File-like object collecting everything written to it until it is drained,
+    used to feed csv.writer and zipfile output into a streaming response.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(c if isinstance(c, bytes) else c.encode('utf-8') for c in self.chunks)
+        self.chunks = []
+        return data
+
+
+def _row(idx: int, application: Application) -> list:
+    return [idx + 1, application.get_display_name(), application.email, application.votes_accept,
+            application.votes_reject, application.votes_abstention]
+
+
+def _election_rows(election: Election, applications: List[Application]) -> Iterator[list]:
+    if election.max_votes_yes is None:
+        yield HEADER
+        for idx, application in enumerate(applications):
+            yield _row(idx, application)
+    else:
+        yield HEADER + ['elected']
+        for idx, application in enumerate(applications):
+            yield _row(idx, application) + [application.elected]
+
+
+def _election_csv(election: Election, applications: List[Application]) -> bytes:
+    buffer = _Buffer()
+    csv.writer(buffer).writerows(_election_rows(election, applications))
+    return buffer.drain()
+
+
+def stream_csv(results: Iterable[ElectionResults], with_election: bool) -> Iterator[bytes]:
+    """
+    Single csv file, either with the columns of the election result page or, `with_election`,
+    prefixed by the election title for exporting several elections at once.
+    """
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    if with_election:
+        writer.writerow(['election'] + HEADER + ['elected'])
+    for election, applications in results:
+        if with_election:
+            writer.writerows(
+                [election.title] + _row(idx, application) + ['' if application.elected is None else application.elected]
+                for idx, application in enumerate(applications)
+            )
+        else:
+            writer.writerows(_election_rows(election, applications))
+        yield buffer.drain()
+    yield buffer.drain()
+
+
+def stream_jsonl(results: Iterable[ElectionResults]) -> Iterator[bytes]:
+    for election, applications in results:
+        yield ''.join(json.dumps({
+            'election_id': election.pk,
+            'election': election.title,
+            'rank': idx + 1,
+            'applicant': application.get_display_name(),
+            'email': application.email,
+            'yes': application.votes_accept,
+            'no': application.votes_reject,
+            'abstention': application.votes_abstention,
+            'elected': application.elected,
+        }) + '\n' for idx, application in enumerate(applications)).encode('utf-8')
+
+
+def stream_zip(results: Iterable[ElectionResults]) -> Iterator[bytes]:
+    """
+    Zip archive with one csv file per election, written without seeking so it can be streamed.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for election, applications in results:
+            name = re.sub(r'[^\w.-]+', '_', election.title).strip('_') or 'election'
+            archive.writestr(f'{election.pk:04d}_{name}.csv', _election_csv(election, applications))
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def results_response(results: Iterable[ElectionResults], export_format: str, filename: str,
+                     with_election: bool = True) -> StreamingHttpResponse:
+    if export_format == 'jsonl':
+        content, content_type = stream_jsonl(results), 'application/jsonl'
+    elif export_format == 'zip':
+        content, content_type = stream_zip(results), 'application/zip'
+    else:
+        export_format = 'csv'
+        content, content_type = stream_csv(results, with_election), 'text/csv'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -1,16 +1,94 @@
 import csv
 import io
+import multiprocessing
+import os
 import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import timedelta
-from typing import Tuple, List
+from functools import partial
+from typing import Iterable, List, Optional, Tuple
 
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 from django import forms
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
 
 from management.models import ElectionManager
-from vote.models import Election, Application, Session, Voter, OpenVote
+from vote.avatars import process_avatar
+from vote.fragments import bump_election_versions
+from vote.models import Election, Application, Session, Voter
+from vote.selectors import existing_voter_emails
+
+VoterRow = Tuple[Optional[str], Optional[str]]
+
+# the avatar workers stay alive as long as the server process, in every server process
+AVATAR_WORKERS = 4
+_avatar_pool: Optional[ProcessPoolExecutor] = None
+_avatar_pool_lock = threading.Lock()
+
+
+def get_avatar_pool() -> ProcessPoolExecutor:
+    """
+    The worker processes converting the avatars of application imports, started by the first import and shared by
+    all later ones.
+    """
+    global _avatar_pool  # pylint: disable=W0603
+    with _avatar_pool_lock:
+        if _avatar_pool is None:
+            # spawned workers only import vote.avatars, forking the threaded server process is not safe
+            _avatar_pool = ProcessPoolExecutor(max_workers=min(AVATAR_WORKERS, os.cpu_count() or 1),
+                                               mp_context=multiprocessing.get_context('spawn'))
+        return _avatar_pool
+
+
+def discard_avatar_pool(pool: ProcessPoolExecutor) -> None:
+    # a worker died, the next import starts a new pool
+    global _avatar_pool  # pylint: disable=W0603
+    with _avatar_pool_lock:
+        if _avatar_pool is pool:
+            _avatar_pool = None
+    pool.shutdown(wait=False)
+
+
+def validate_voter_rows(session: Session, rows: Iterable[Tuple[int, str, Optional[str]]]) \
+        -> Tuple[List[VoterRow], List[str]]:
+    """
+    Validate the (line number, email, name) rows of a voter import for the session. Emails are normalized, rows
+    without an email become anonymous voters. Returns the (email, name) of the voters to add and an error message
+    for every invalid line, ordered by line number.
+    """
+    voters: List[VoterRow] = []
+    errors: List[Tuple[int, str]] = []
+    first_line = {}
+    for line_nr, email, name in rows:
+        if not email:
+            voters.append((None, name))
+            continue
+
+        email = Voter.normalize_email(email)
+        try:
+            validate_email(email)
+        except forms.ValidationError:
+            errors.append((line_nr, f'{email} is not a valid email address'))
+            continue
+        if email in first_line:
+            errors.append((line_nr, f'duplicate email address {email}, already in line {first_line[email]}'))
+            continue
+        first_line[email] = line_nr
+        voters.append((email, name))
+
+    for email in existing_voter_emails(session, first_line):
+        errors.append((first_line[email], f'a voter with email address {email} already exists'))
+
+    return voters, [f'Line {line_nr}: {message}' for line_nr, message in sorted(errors)]
 
 
 class StartElectionForm(forms.ModelForm):
@@ -20,12 +98,18 @@ class StartElectionForm(forms.ModelForm):
         model = Election
         fields: List[str] = []
 
+    def clean(self):
+        super().clean()
+        if self.instance.archived:
+            raise forms.ValidationError('The election is archived and can not be started again')
+
     def save(self, commit=True):
         instance = super().save(commit=False)
         instance.start_date = timezone.now()
         instance.end_date = timezone.now() + timedelta(minutes=self.cleaned_data['run_time'])
         if commit:
-            instance.save()
+            # keeps the archived_ballots of an archival which ran meanwhile, see Election.is_open
+            instance.save(update_fields=['start_date', 'end_date'])
 
         return instance
 
@@ -249,11 +333,6 @@ class AddElectionForm(forms.ModelForm, TemplateStringForm):
         self.session.elections.add(instance)
         if commit:
             self.session.save()
-            open_votes = [
-                OpenVote(voter=v, election=instance)
-                for v in self.session.participants.all()
-            ]
-            OpenVote.objects.bulk_create(open_votes)
 
         return instance
 
@@ -290,6 +369,141 @@ class ApplicationUploadForm(forms.ModelForm):
         return instance
 
 
+class ApplicationImportForm(forms.Form):
+    """
+    Bulk import of applications from a zip archive containing a csv manifest with the columns display_name, email,
+    text and avatar (file name of an image in the archive, may be empty).
+    """
+    archive = forms.FileField(label='ZIP File')
+
+    MAX_APPLICATIONS = 500
+    MAX_AVATAR_SIZE = 10 * 1024 * 1024
+    # of all avatars together, uncompressed
+    MAX_ARCHIVE_SIZE = 100 * 1024 * 1024
+
+    def __init__(self, election, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.election = election
+
+    def clean_archive(self):
+        if not self.election.can_apply:
+            raise forms.ValidationError('Applications are currently not allowed')
+        try:
+            with zipfile.ZipFile(self.cleaned_data['archive']) as archive:
+                rows, images, errors = self._read_manifest(archive)
+                # the avatars are read and converted in parallel, only after all entries are known to be valid
+                if not errors:
+                    avatars = self._process_avatars(archive, images)
+        except (zipfile.BadZipFile, UnicodeDecodeError, csv.Error) as e:
+            raise forms.ValidationError('File does not seem to be a zip archive with a CSV manifest.') from e
+
+        if not errors:
+            for line_nr, row in rows:
+                if row['avatar']:
+                    if isinstance(avatars[row['avatar']], Exception):
+                        errors.append(f'Line {line_nr}: {row["avatar"]} is not a valid image')
+                    else:
+                        row['avatar'] = avatars[row['avatar']]
+
+        if errors:
+            raise forms.ValidationError(errors)
+        return [row for _, row in rows]
+
+    def _read_manifest(self, archive: zipfile.ZipFile):
+        manifests = [name for name in archive.namelist() if name.lower().endswith('.csv') and '/' not in name]
+        if len(manifests) != 1:
+            raise forms.ValidationError('The archive needs to contain exactly one CSV file in its top level.')
+
+        files = {info.filename: info for info in archive.infolist()}
+        rows, images, errors = [], {}, []
+        with io.TextIOWrapper(archive.open(manifests[0]), encoding='utf-8-sig', newline='') as text_file:
+            csv_reader = csv.DictReader(text_file)
+            if not csv_reader.fieldnames or 'display_name' not in csv_reader.fieldnames:
+                raise forms.ValidationError('The CSV file needs to have the columns "display_name", "email", '
+                                            '"text" and "avatar".')
+            for row in csv_reader:
+                line_nr = csv_reader.line_num
+                row = {name: (row.get(name) or '').strip() for name in ('display_name', 'email', 'text', 'avatar')}
+                if not row['display_name']:
+                    errors.append(f'Line {line_nr}: the display name is missing')
+                elif len(row['display_name']) > 256:
+                    errors.append(f'Line {line_nr}: the display name is longer than 256 characters')
+                if len(row['text']) > 250:
+                    errors.append(f'Line {line_nr}: the text is longer than 250 characters')
+                if row['email']:
+                    try:
+                        validate_email(row['email'])
+                    except forms.ValidationError:
+                        errors.append(f'Line {line_nr}: {row["email"]} is not a valid email address')
+                if row['avatar']:
+                    info = files.get(row['avatar'])
+                    if info is None:
+                        errors.append(f'Line {line_nr}: {row["avatar"]} is not in the archive')
+                    elif info.file_size > self.MAX_AVATAR_SIZE:
+                        errors.append(f'Line {line_nr}: {row["avatar"]} is too large')
+                    else:
+                        images[row['avatar']] = info
+                rows.append((line_nr, row))
+
+        if not rows:
+            errors.append('The CSV file does not contain any applications')
+        elif len(rows) > self.MAX_APPLICATIONS:
+            errors.append(f'At most {self.MAX_APPLICATIONS} applications can be imported at once')
+        if sum(info.file_size for info in images.values()) > self.MAX_ARCHIVE_SIZE:
+            errors.append(f'The avatars must not be larger than {self.MAX_ARCHIVE_SIZE // (1024 * 1024)} MB in total')
+        return rows, images, errors
+
+    @staticmethod
+    def _process_avatars(archive: zipfile.ZipFile, images):
+        if len(images) <= 1:
+            results = {}
+            for name, info in images.items():
+                try:
+                    results[name] = process_avatar(archive.read(info))
+                except Exception as e:  # pylint: disable=W0703
+                    results[name] = e
+            return results
+
+        pool = get_avatar_pool()
+        try:
+            futures = {name: pool.submit(process_avatar, archive.read(info)) for name, info in images.items()}
+            results = {name: future.exception() or future.result() for name, future in futures.items()}
+        except BrokenProcessPool:
+            results = None
+        if results is None or any(isinstance(result, BrokenProcessPool) for result in results.values()):
+            discard_avatar_pool(pool)
+            raise forms.ValidationError('The avatars could not be converted, please try again.')
+        return results
+
+    def save(self) -> List[Application]:
+        with transaction.atomic():
+            # concurrent additions are rejected by the unique constraint on (election, ballot_index)
+            last_index = Application.objects.filter(election=self.election).aggregate(
+                Max('ballot_index'))['ballot_index__max']
+            first_index = 0 if last_index is None else last_index + 1
+            applications = Application.objects.bulk_create([
+                Application(
+                    election=self.election,
+                    display_name=row['display_name'],
+                    email=row['email'] or None,
+                    text=row['text'],
+                    avatar=ContentFile(row['avatar'], name='avatar.jpg') if row['avatar'] else None,
+                    ballot_index=first_index + idx,
+                )
+                for idx, row in enumerate(self.cleaned_data['archive'])
+            ])
+            # bulk_create does not call Application.save
+            Session.bump_revisions(pk=self.election.session_id)
+            # neither does it send the signals which invalidate the cached election cards
+            transaction.on_commit(partial(bump_election_versions, [self.election.pk]))
+            # one notification for all applications instead of one per application
+            transaction.on_commit(lambda: async_to_sync(get_channel_layer().group_send)(
+                "Session-" + str(self.election.session_id),
+                {'type': 'send_reload', 'id': '#electionCard'}
+            ))
+        return applications
+
+
 class AddVotersForm(forms.Form):
     voters_list = forms.CharField(widget=forms.Textarea, label='Emails')  # explicitly no max_length here
 
@@ -306,25 +520,13 @@ class AddVotersForm(forms.Form):
 
     def clean_voters_list(self):
         lines = self.cleaned_data['voters_list'].splitlines()
-        emails = []
-        for line in lines:
-            if line == '':
-                continue
-
-            try:
-                validate_email(line)
-            except forms.ValidationError:
-                self.add_error('voters_list', f'{line} is not a valid email address')
+        voters, errors = validate_voter_rows(self.session, (
+            (line_nr, line.strip(), None) for line_nr, line in enumerate(lines, start=1) if line.strip()
+        ))
+        if errors:
+            raise forms.ValidationError(errors)
 
-            if Voter.objects.filter(email=line, session=self.session).exists():
-                self.add_error('voters_list', f'a voter with email address {line} already exists')
-
-            emails.append(line)
-
-        if len(emails) != len(set(emails)):
-            raise forms.ValidationError('duplicate email address')
-
-        return emails
+        return [email for email, _ in voters]
 
 
 class AddTokensForm(forms.Form):
@@ -350,37 +552,27 @@ class CSVUploaderForm(forms.Form):
         self.session = session
 
     def clean_csv_data(self):
-        f = self.cleaned_data['csv_data'].file
-        data = {}
+        f = self.cleaned_data['csv_data']
         try:
-            with io.TextIOWrapper(f, encoding='utf-8') as text_file:
+            # the upload is decoded and parsed line by line instead of reading it into memory at once
+            with io.TextIOWrapper(f.file, encoding='utf-8-sig', newline='') as text_file:
                 csv_reader = csv.DictReader(text_file)
-                if 'email' not in csv_reader.fieldnames or 'name' not in csv_reader.fieldnames:
+                if not csv_reader.fieldnames or 'email' not in csv_reader.fieldnames or \
+                        'name' not in csv_reader.fieldnames:
                     raise forms.ValidationError('CSV file needs to have columns "email" and "name".')
-                for row in csv_reader:
-                    if row['email']:
-                        try:
-                            validate_email(row['email'])
-                        except forms.ValidationError:
-                            self.add_error('csv_data', f'Invalid email {row["email"]}')
-                    else:
-                        row['email'] = None
-
-                    if Voter.objects.filter(session=self.session, email=row['email']).exists():
-                        self.add_error('csv_data', f'Voter with email address {row["email"]} already exists')
-
-                    if row['email'] in data:
-                        self.add_error('csv_data', f'Duplicate email in csv: {row["email"]}')
-
-                    data[row['email']] = row['name']
-        except UnicodeDecodeError as e:
+                voters, errors = validate_voter_rows(self.session, (
+                    (csv_reader.line_num, (row['email'] or '').strip(), row['name']) for row in csv_reader
+                ))
+        except (UnicodeDecodeError, csv.Error) as e:
             raise forms.ValidationError('File does not seem to be in CSV format.') from e
 
-        return data
+        if errors:
+            raise forms.ValidationError(errors)
+        return voters
 
     def save(self):
         voters_codes = [
             Voter.from_data(session=self.session, email=email, name=name)
-            for email, name in self.cleaned_data['csv_data'].items()
+            for email, name in self.cleaned_data['csv_data']
         ]
         self.session.managers.all().first().send_invite_bulk_threaded(voters_codes)
@@ -0,0 +1,8 @@
+from django_auth_ldap.backend import LDAPBackend
+
+from management.models import ElectionManager
+
+
+class ManagementBackendLDAP(LDAPBackend):
+    def get_user_model(self):
+        return ElectionManager
@@ -17,5 +17,5 @@ class Command(BaseCommand):
                 continue
             election.remind_text_sent = True
             election.save()
-            for voter in election.session.participants.all():
+            for voter in election.eligible_voters():
                 voter.send_reminder(election.session.managers.all().first().sender_email, election)
@@ -0,0 +1,133 @@
+import json
+import os
+from collections import Counter
+from html import escape
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from wahlfang.profiling import COLLAPSED_SUFFIX
+
+FRAME_HEIGHT = 16
+WIDTH = 1200
+
+
+def read_collapsed(paths):
+    stacks = Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    stacks[stack] += int(count)
+    return stacks
+
+
+def to_speedscope(stacks, name):
+    frames = {}
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        samples.append([frames.setdefault(frame, len(frames)) for frame in stack.split(';')])
+        weights.append(count)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': [{'name': frame} for frame in frames]},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'none',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+        }],
+    }
+
+
+def to_svg(stacks, title):
+    root = {'children': {}, 'count': 0}
+    for stack, count in stacks.items():
+        root['count'] += count
+        node = root
+        for frame in stack.split(';'):
+            node = node['children'].setdefault(frame, {'children': {}, 'count': 0})
+            node['count'] += count
+
+    rects = []
+    max_depth = 0
+
+    def layout(node, x, depth):
+        nonlocal max_depth
+        max_depth = max(max_depth, depth)
+        for frame, child in sorted(node['children'].items()):
+            width = child['count'] / root['count'] * WIDTH
+            if width >= 0.5:
+                rects.append((frame, child['count'], x, depth, width))
+                layout(child, x, depth + 1)
+            x += width
+
+    if root['count']:
+        layout(root, 0, 0)
+
+    height = (max_depth + 2) * FRAME_HEIGHT
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="12">{escape(title)} ({root["count"]} samples)</text>',
+    ]
+    for frame, count, x, depth, width in rects:
+        y = height - (depth + 1) * FRAME_HEIGHT
+        hue = sum(map(ord, frame)) % 60
+        label = escape(frame[:int(width / 7)]) if width > 21 else ''
+        out.append(
+            f'<g><title>{escape(frame)} ({count} samples, {count / root["count"]:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{FRAME_HEIGHT - 1}" '
+            f'fill="hsl({hue},90%,60%)"/>'
+            f'<text x="{x + 2:.1f}" y="{y + 11}">{label}</text></g>'
+        )
+    out.append('</svg>')
+    return '\n'.join(out)
+
+
+class Command(BaseCommand):
+    help = 'Aggregate the sampled profiles from the profiler spool directory into a flame graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', type=str, required=True)
+        parser.add_argument('-f', '--format', choices=['svg', 'speedscope', 'collapsed'], default='svg')
+        parser.add_argument('-d', '--spool-dir', type=str, default=settings.PROFILER_SPOOL_DIR)
+        parser.add_argument('--name', type=str, default='',
+                            help='only include profiles whose name contains this string, e.g. "vote:index"')
+        parser.add_argument('--clear', action='store_true', default=False,
+                            help='delete the aggregated profiles from the spool directory')
+
+    def handle(self, *args, **options):
+        spool_dir = options['spool_dir']
+        if not os.path.isdir(spool_dir):
+            raise CommandError(f'profiler spool directory {spool_dir} does not exist')
+
+        name_filter = options['name'].replace(':', '_')
+        paths = [
+            os.path.join(spool_dir, filename) for filename in sorted(os.listdir(spool_dir))
+            if filename.endswith(COLLAPSED_SUFFIX) and name_filter in filename
+        ]
+        if not paths:
+            raise CommandError('no profiles found')
+
+        stacks = read_collapsed(paths)
+        title = options['name'] or 'wahlfang'
+        with open(options['output'], 'w') as f:
+            if options['format'] == 'svg':
+                f.write(to_svg(stacks, title))
+            elif options['format'] == 'speedscope':
+                json.dump(to_speedscope(stacks, title), f)
+            else:
+                for stack, count in stacks.items():
+                    f.write(f'{stack} {count}\n')
+
+        if options['clear']:
+            for path in paths:
+                os.remove(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Aggregated {len(paths)} profiles ({sum(stacks.values())} samples) into {options["output"]}'))
@@ -0,0 +1,50 @@
+from collections import defaultdict
+from subprocess import CalledProcessError
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from wahlfang.startup import profile_startup
+
+MIB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Report the import time and resident memory per module of a cold worker start'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='wahlfang.asgi', help='module the workers load, e.g. wahlfang.wsgi')
+        parser.add_argument('--runs', type=int, default=3, help='report the fastest of this many cold starts')
+        parser.add_argument('--top', type=int, default=25, help='number of modules listed')
+        parser.add_argument('--packages', default=False, action='store_true',
+                            help='sum up the modules of each top level package (by their own time)')
+        parser.add_argument('--sort', choices=['self', 'cumulative', 'rss_self', 'rss_cumulative'], default='self')
+
+    def handle(self, *args, **options):
+        try:
+            runs = [profile_startup(options['target'], settings.SETTINGS_MODULE)
+                    for _ in range(max(options['runs'], 1))]
+        except CalledProcessError as e:
+            raise CommandError(f'Importing {options["target"]} failed') from e
+        profile = min(runs, key=lambda run: run['total'])
+
+        if options['packages']:
+            packages = defaultdict(lambda: {'self': 0, 'rss_self': 0})
+            for name, record in profile['modules'].items():
+                packages[name.partition('.')[0]]['self'] += record['self']
+                packages[name.partition('.')[0]]['rss_self'] += record['rss_self']
+            self.stdout.write(f'{"ms":>9} {"MiB":>9}  package')
+            for name, record in sorted(packages.items(), key=lambda item: item[1]['self'],
+                                       reverse=True)[:options['top']]:
+                self.stdout.write(f'{record["self"] * 1000:9.1f} {record["rss_self"] / MIB:9.2f}  {name}')
+        else:
+            self.stdout.write(f'{"self ms":>9} {"cum. ms":>9} {"self MiB":>9} {"cum. MiB":>9}  module')
+            for name, record in sorted(profile['modules'].items(), key=lambda item: item[1][options['sort']],
+                                       reverse=True)[:options['top']]:
+                self.stdout.write(f'{record["self"] * 1000:9.1f} {record["cumulative"] * 1000:9.1f} '
+                                  f'{record["rss_self"] / MIB:9.2f} {record["rss_cumulative"] / MIB:9.2f}  {name}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {options["target"]} and the URL configuration ({len(profile["modules"])} modules) in '
+            f'{profile["total"] * 1000:.0f} ms, resident memory {profile["rss_before"] / MIB:.1f} MiB -> '
+            f'{profile["rss_after"] / MIB:.1f} MiB'))
@@ -4,10 +4,11 @@ from django.db import migrations, models
 
 
 def copy_house_id(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
     ElectionManager = apps.get_model('management', 'ElectionManager')
-    for e in ElectionManager.objects.all():
+    for e in ElectionManager.objects.using(db_alias).all():
         e.username = e.email
-        e.save()
+        e.save(using=db_alias)
 
 
 class Migration(migrations.Migration):
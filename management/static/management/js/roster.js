@@ -0,0 +1,78 @@
+$(function () {
+  // the voter list of the session is loaded page by page from the roster endpoint
+  let next = null;
+  let loading = false;
+  let generation = 0;
+  let search_timeout;
+
+  function voter_row(voter) {
+    const csrf = $('#voterRoster input[name="csrfmiddlewaretoken"]').val();
+    const label = $('<span class="w-25"></span>').text(' ' + voter.label);
+    if (voter.logged_in) {
+      label.addClass('text-success');
+    } else if (voter.invalid_email) {
+      label.addClass('text-danger');
+    }
+    const form = $('<form method="post"></form>').attr('action', voter.delete_url)
+      .append($('<input type="hidden" name="csrfmiddlewaretoken">').val(csrf))
+      .append('<button type="submit" class="close btn btn-danger" aria-label="remove voter">&times;</button>');
+    return $('<div class="list-group-item"></div>')
+      .append(label)
+      .append($('<span class="float-right"></span>').append(form));
+  }
+
+  function load_page(after) {
+    const roster = $('#voterRoster');
+    if (!roster.length || loading) {
+      return;
+    }
+    const params = $('#rosterFilter').serializeArray().filter(param => param.value !== '');
+    if (after !== null) {
+      params.push({name: 'after', value: after});
+    }
+    const current = generation;
+    loading = true;
+    $.getJSON(roster.data('url'), $.param(params)).done(data => {
+      if (current !== generation) {
+        return;
+      }
+      roster.append(data.voters.map(voter_row));
+      next = data.next;
+      $('#voterRosterEmpty').toggleClass('d-none', roster.children('.list-group-item').length > 0);
+    }).always(() => {
+      loading = false;
+      if (current !== generation) {
+        load_page(null);
+      } else {
+        fill();
+      }
+    });
+  }
+
+  function fill() {
+    // load further pages while the end of the list is visible
+    const roster = $('#voterRoster');
+    if (next !== null && roster.length && roster.scrollTop() + roster.innerHeight() >= roster[0].scrollHeight - 50) {
+      load_page(next);
+    }
+  }
+
+  function init() {
+    generation += 1;
+    next = null;
+    // scroll events do not bubble, bind again to the roster of a reloaded card
+    $('#voterRoster').off('scroll').on('scroll', fill).children('.list-group-item').remove();
+    load_page(null);
+  }
+
+  $('#rosterFilter').on('input', 'input', () => {
+    clearTimeout(search_timeout);
+    search_timeout = setTimeout(init, 300);
+  }).on('change', 'select', init).on('submit', e => e.preventDefault());
+  $(document).on('wahlfang:reloaded', (e, reload_id) => {
+    if (reload_id === '#voterCard') {
+      init();
+    }
+  });
+  init();
+});
@@ -6,17 +6,18 @@ import vote.views
 from management import views
 from management.models import ElectionManager
 from vote.models import Election, Session
+from wahlfang.routers import replica_reads
 
 app_name = 'management'
 
 election_gauge = Gauge('wahlfang_election_count', 'Wahlfang Number of Elections')
-election_gauge.set_function(lambda: Election.objects.all().count())
+election_gauge.set_function(replica_reads(lambda: Election.objects.all().count()))
 
 election_manager_gauge = Gauge('wahlfang_election_manager_count', 'Wahlfang Number of Election Managers')
 election_manager_gauge.set_function(lambda: ElectionManager.objects.all().count())
 
 session_gauge = Gauge('wahlfang_session_count', 'Wahlfang Number of Sessions')
-session_gauge.set_function(lambda: Session.objects.all().count())
+session_gauge.set_function(replica_reads(lambda: Session.objects.all().count()))
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -33,9 +34,12 @@ urlpatterns = [
     path('meeting/<int:pk>/print_token', views.print_token, name='print_token'),
     path('meeting/<int:pk>/import_csv', views.import_csv, name='import_csv'),
     path('meeting/<int:pk>/spectator', views.spectator, name='spectator'),
+    path('meeting/<int:pk>/export', views.export_session, name='export_session'),
+    path('meeting/<int:pk>/voters', views.session_voters, name='session_voters'),
 
     # Election
     path('election/<int:pk>/add_application', views.election_upload_application, name='add_application'),
+    path('election/<int:pk>/import_applications', views.election_import_applications, name='import_applications'),
     path('election/<int:pk>/edit/<int:application_id>', views.election_upload_application, name='edit_application'),
     path('election/<int:pk>/edit/<int:application_id>/delete_application', views.election_delete_application,
          name='delete_application'),
@@ -1,5 +1,4 @@
 import base64
-import csv
 from io import BytesIO
 import logging
 import os
@@ -8,11 +7,10 @@ from functools import partial
 from pathlib import Path
 from typing import Dict
 
-import qrcode
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import views as auth_views
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.http.response import HttpResponseNotFound
 from django.shortcuts import render, redirect, resolve_url
 from django.template.loader import get_template
@@ -20,7 +18,8 @@ from django.urls import reverse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_protect
-from latex.build import PdfLatexBuilder
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django_ratelimit.decorators import ratelimit
 # from ratelimit.decorators import ratelimit
 
@@ -31,13 +30,19 @@ from management.forms import (
     AddSessionForm,
     AddVotersForm,
     ApplicationUploadForm,
+    ApplicationImportForm,
     StopElectionForm,
     AddTokensForm,
     CSVUploaderForm,
     SessionSettingsForm
 )
+from management.export import EXPORT_FORMATS, results_response
 from vote.models import Election, Application, Voter
-from vote.selectors import open_elections, upcoming_elections, published_elections, closed_elections
+from vote.revisions import election_states, page_etag, session_election_states
+from vote.selectors import open_elections, upcoming_elections, published_elections, closed_elections, \
+    session_results, voter_roster
+from vote.turnout import get_turnout
+from wahlfang.routers import replica_reads
 
 logger = logging.getLogger('management.view')
 
@@ -93,7 +98,16 @@ def index(request):
     return render(request, template_name='management/index.html', context=context)
 
 
+def session_etag(request, pk=None):
+    revision = request.user.sessions.filter(pk=pk).values_list('revision', flat=True).first()
+    if revision is None:
+        return None
+    return page_etag(request, revision, session_election_states(pk))
+
+
 @management_login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=session_etag)
 def session_detail(request, pk=None):
     manager = request.user
     session = manager.sessions.get(id=pk)
@@ -104,11 +118,55 @@ def session_detail(request, pk=None):
         'upcoming_elections': upcoming_elections(session),
         'published_elections': published_elections(session),
         'closed_elections': closed_elections(session),
-        'voters': session.participants.all()
+        'has_voters': session.participants.exists(),
     }
     return render(request, template_name='management/session.html', context=context)
 
 
+ROSTER_PAGE_SIZE = 100
+ROSTER_MAX_PAGE_SIZE = 500
+
+
+def _flag(value):
+    if value in (None, ''):
+        return None
+    return value.lower() in ('1', 'true', 'yes')
+
+
+@management_login_required
+def session_voters(request, pk):
+    """
+    Roster of the session as JSON, one page at a time. `after` is the `next` cursor of the previous page.
+    """
+    session = request.user.sessions.filter(pk=pk).first()
+    if session is None:
+        return HttpResponseNotFound('Session does not exist')
+
+    try:
+        after = int(request.GET['after']) if request.GET.get('after') else None
+        limit = min(int(request.GET.get('limit', ROSTER_PAGE_SIZE)), ROSTER_MAX_PAGE_SIZE)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid cursor or limit')
+
+    voters, next_cursor = voter_roster(
+        session, after=after, limit=max(limit, 1), search=request.GET.get('q', '').strip(),
+        logged_in=_flag(request.GET.get('logged_in')),
+        invalid_email=_flag(request.GET.get('invalid_email')),
+        qr=_flag(request.GET.get('qr')),
+    )
+    return JsonResponse({
+        'voters': [{
+            'id': voter.pk,
+            'label': str(voter),
+            'logged_in': voter.logged_in,
+            'invalid_email': voter.invalid_email,
+            'qr': voter.qr,
+            'delete_url': reverse('management:delete_voter', args=[voter.pk]),
+        } for voter in voters],
+        'next': next_cursor,
+    })
+
+
 @management_login_required
 def session_settings(request, pk=None):
     manager = request.user
@@ -139,17 +197,24 @@ def session_settings(request, pk=None):
     context = {
         'session': session,
         'elections': session.elections.order_by('pk'),
-        'voters': session.participants.all(),
         'variables': form.variables,
         'form': form
     }
     return render(request, template_name='management/session_settings.html', context=context)
 
 
+def _archived_session(request, session):
+    # the results of an archived session are frozen, see vote.archive
+    messages.add_message(request, messages.ERROR, 'The session is archived and can not be changed anymore')
+    return redirect('management:session', pk=session.pk)
+
+
 @management_login_required
 def add_election(request, pk=None):
     manager = request.user
     session = manager.sessions.get(pk=pk)
+    if session.archived:
+        return _archived_session(request, session)
     context = {
         'session': session,
     }
@@ -187,6 +252,8 @@ def add_election(request, pk=None):
 def add_voters(request, pk):
     manager = request.user
     session = manager.sessions.get(pk=pk)
+    if session.archived:
+        return _archived_session(request, session)
     context = {
         'session': session,
         'form': AddVotersForm(session=session)
@@ -205,6 +272,8 @@ def add_voters(request, pk):
 def add_tokens(request, pk):
     manager = request.user
     session = manager.sessions.get(pk=pk)
+    if session.archived:
+        return _archived_session(request, session)
     context = {
         'session': session,
         'form': AddTokensForm(session=session)
@@ -228,13 +297,26 @@ def _unpack(request, pk):
     return manager, election, session
 
 
+def election_etag(request, pk):
+    election = Election.objects.select_related('session').filter(pk=pk, session__managers=request.user).first()
+    if election is None:
+        return None
+    # the turnout is updated live by the consumer, starting from the numbers in the page
+    return page_etag(request, election.session.revision,
+                     election_states([(election.pk, election.start_date, election.end_date)]),
+                     sorted(get_turnout(election).items()))
+
+
 @management_login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=election_etag)
 def election_detail(request, pk):
     _, election, session = _unpack(request, pk)
     context = {
         'election': election,
         'session': session,
         'applications': election.applications.all(),
+        'turnout': get_turnout(election),
         'stop_election_form': StopElectionForm(instance=election),
         'start_election_form': StartElectionForm(instance=election),
     }
@@ -251,11 +333,13 @@ def election_detail(request, pk):
         if form.is_valid():
             form.save()
             if election.send_emails_on_start:
-                for voter in session.participants.all():
+                for voter in election.eligible_voters():
                     voter.send_reminder(
                         session.managers.all().first().sender_email, election)
         else:
             context['start_election_form'] = form
+            for error in form.non_field_errors():
+                messages.add_message(request, messages.ERROR, error)
 
     if request.POST and request.POST.get('action') == 'publish':
         election.result_published = True
@@ -300,12 +384,35 @@ def election_upload_application(request, pk, application_id=None):
     return render(request, template_name='management/application.html', context=context)
 
 
+@management_login_required
+def election_import_applications(request, pk):
+    _, election, _ = _unpack(request, pk)
+
+    if not election.can_apply:
+        messages.add_message(request, messages.ERROR,
+                             'Applications are currently not accepted')
+        return redirect('management:election', pk=pk)
+
+    if request.method == 'POST':
+        form = ApplicationImportForm(election, data=request.POST, files=request.FILES)
+        if form.is_valid():
+            applications = form.save()
+            messages.add_message(request, messages.INFO, f'Imported {len(applications)} applications')
+            return redirect('management:election', pk=pk)
+    else:
+        form = ApplicationImportForm(election)
+    return render(request, 'management/import_applications.html', {'form': form, 'election': election})
+
+
 @management_login_required
 def election_delete_application(request, pk, application_id):
     e = Election.objects.filter(session__in=request.user.sessions.all(), pk=pk)
     if not e.exists():
         return HttpResponseNotFound('Election does not exist')
     e = e.first()
+    if e.archived:
+        messages.add_message(request, messages.ERROR, 'The election is archived and can not be changed anymore')
+        return redirect('management:election', pk=pk)
     try:
         a = e.applications.get(pk=application_id)
     except Application.DoesNotExist:
@@ -362,6 +469,8 @@ def add_mobile_voter_get(request, pk):
     if not session.exists():
         return HttpResponseNotFound('Session does not exist')
     session = session.first()
+    if session.archived:
+        return _archived_session(request, session)
 
     context = {
         'session': session,
@@ -376,6 +485,8 @@ def add_mobile_voter_post(request, pk):
     if not session.exists():
         return HttpResponseNotFound('Session does not exist')
     session = session.first()
+    if session.archived:
+        return _archived_session(request, session)
 
     if request.POST.get("cancel"):
         # delete the just created voter if manager cancels
@@ -390,6 +501,7 @@ def add_mobile_voter_post(request, pk):
     name = request.POST.get("name")
     voter, access_code = Voter.from_data(session=session, qr=True, name=name)
     link = f'https://{settings.URL}' + reverse('vote:link_login', kwargs={'access_code': access_code})
+    import qrcode  # pylint: disable=import-outside-toplevel
     img = qrcode.make(link)
 
     buffered = BytesIO()
@@ -410,6 +522,8 @@ def print_token(request, pk):
     if not session.exists():
         return HttpResponseNotFound('Session does not exist')
     session = session.first()
+    if session.archived:
+        return _archived_session(request, session)
     participants = session.participants
     tokens = [participant.new_access_token()
               for participant in participants.all() if participant.is_anonymous and not participant.qr]
@@ -418,6 +532,7 @@ def print_token(request, pk):
                              'No tokens have yet been generated.')
         return redirect('management:session', pk=session.pk)
 
+    import qrcode  # pylint: disable=import-outside-toplevel
     img = [qrcode.make(f'https://{settings.URL}' + reverse('vote:link_login', kwargs={'access_code': access_code}))
            for access_code in tokens]
     tmp_qr_path = '/tmp/wahlfang/qr_codes/session_{}'.format(session.pk)
@@ -450,6 +565,7 @@ def print_token(request, pk):
 
 
 def generate_pdf(template_name: str, context: Dict, tex_path: str):
+    from latex.build import PdfLatexBuilder  # pylint: disable=import-outside-toplevel
     template = get_template(template_name).render(context).encode('utf8')
     with open("/tmp/template.tex", "wb") as f:
         f.write(template)
@@ -464,6 +580,8 @@ def import_csv(request, pk):
     if not session.exists():
         return HttpResponseNotFound('Session does not exist')
     session = session.first()
+    if session.archived:
+        return _archived_session(request, session)
 
     if request.method == 'POST':
         form = CSVUploaderForm(session, data=request.POST, files=request.FILES)
@@ -476,34 +594,30 @@ def import_csv(request, pk):
 
 
 @management_login_required
+@replica_reads
 def export_csv(request, pk):
     e = Election.objects.filter(session__in=request.user.sessions.all(), pk=pk)
     if not e.exists():
         return HttpResponseNotFound('Election does not exist')
     e = e.first()
 
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="results.csv"'
-
-    writer = csv.writer(response)
-    header = ['#', 'applicant', 'email', 'yes', 'no', 'abstention']
-    if e.max_votes_yes is not None:
-        header.append('elected')
-    writer.writerow(header)
-    nr_elected = 0
-    for idx, applicant in enumerate(e.election_summary):
-        row = [idx + 1, applicant.get_display_name(), applicant.email, applicant.votes_accept, applicant.votes_reject,
-               applicant.votes_abstention]
-        if e.max_votes_yes is not None:
-            if applicant.votes_accept > applicant.votes_reject and nr_elected < e.max_votes_yes:
-                # elected if: more yes than no, within the persons with the most yes votes
-                row.append(True)
-                nr_elected += 1
-            else:
-                row.append(False)
-        writer.writerow(row)
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'Unknown export format {export_format}')
+    return results_response([(e, e.results)], export_format, filename='results', with_election=False)
 
-    return response
+
+@management_login_required
+@replica_reads
+def export_session(request, pk):
+    session = request.user.sessions.filter(pk=pk).first()
+    if session is None:
+        return HttpResponseNotFound('Session does not exist')
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'Unknown export format {export_format}')
+    return results_response(session_results(session), export_format, filename=f'results_session_{session.pk}')
 
 
 @management_login_required
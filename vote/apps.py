@@ -1,5 +1,28 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class VoteConfig(AppConfig):
     name = 'vote'
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel
+        from vote import fragments, revisions, turnout
+        from vote.models import Application, Ballot, Election, Voter
+
+        post_save.connect(turnout.voter_saved, sender=Voter)
+        post_delete.connect(turnout.voter_deleted, sender=Voter)
+        m2m_changed.connect(turnout.excluded_voters_changed, sender=Election.excluded_voters.through)
+
+        post_save.connect(fragments.election_changed, sender=Election)
+        post_delete.connect(fragments.election_changed, sender=Election)
+        post_save.connect(fragments.application_changed, sender=Application)
+        post_delete.connect(fragments.application_changed, sender=Application)
+        post_save.connect(fragments.ballot_saved, sender=Ballot)
+
+        # saved rows bump the revision of their session in their save method
+        post_delete.connect(revisions.session_deleted_child, sender=Election)
+        post_delete.connect(revisions.session_deleted_child, sender=Voter)
+        post_delete.connect(revisions.application_deleted, sender=Application)
+        m2m_changed.connect(revisions.excluded_voters_changed, sender=Election.excluded_voters.through)
+        post_save.connect(revisions.ballot_saved, sender=Ballot)
@@ -0,0 +1,158 @@
+"""
+Archival of finished sessions. The ballots, the records of who voted, the access codes and the avatars of long-closed
+sessions only slow down the aggregations and indexes of the hot tables. Archiving a session
+
+- freezes the final counts of every application into ElectionResult, the results are shown from there afterwards,
+- moves the ballots of each election into one compressed BallotArchive row, which `recount` still audits,
+- deletes the ballots and the BallotCast records in batches, each in its own transaction, so no long lock is held,
+- makes the access codes of the voters unusable and deletes the avatars of the applications.
+
+Every step can be repeated, an interrupted archival is completed by archiving the session again.
+"""
+import time
+import zlib
+from datetime import timedelta
+from typing import Dict, Iterator, Tuple
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, make_password
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from vote.models import Application, Ballot, BallotArchive, BallotCast, Election, ElectionResult, Session
+from vote.revisions import bump_revisions
+from vote.turnout import reset_session_turnout
+
+BATCH_SIZE = 1000
+# ballots fetched per query while compressing them
+CHUNK_SIZE = 10000
+
+
+def archivable_sessions(older_than: timedelta) -> 'models.QuerySet[Session]':
+    """
+    Sessions which are not archived yet and whose elections all ended more than `older_than` ago. Sessions without
+    elections are never archivable, it is not known when they were used.
+    """
+    return Session.objects.filter(archived_at__isnull=True).exclude(elections__end_date__isnull=True).annotate(
+        last_end_date=Max('elections__end_date')).filter(last_end_date__lt=timezone.now() - older_than).order_by('pk')
+
+
+def compress_ballots(election: Election) -> Tuple[int, int, bytes]:
+    """
+    Compress the ballots of the election, padded to the same width and sorted, so neither their order nor their
+    length tells anything about the voter. Returns the width, the number of ballots and the compressed data.
+    """
+    last_index = election.applications.aggregate(Max('ballot_index'))['ballot_index__max']
+    width = 0 if last_index is None else last_index // 4 + 1
+    compressor = zlib.compressobj(9)
+    chunks, number = [], 0
+    rows = Ballot.objects.filter(election=election).order_by('votes').values_list('votes', flat=True)
+    for votes in rows.iterator(chunk_size=CHUNK_SIZE):
+        chunks.append(compressor.compress(bytes(votes)[:width].ljust(width, b'\0')))
+        number += 1
+    chunks.append(compressor.flush())
+    return width, number, b''.join(chunks)
+
+
+def archived_ballots(archive: BallotArchive) -> Iterator[bytes]:
+    """
+    The packed ballots of an archived election.
+    """
+    if not archive.width:
+        return
+    data = zlib.decompress(bytes(archive.data))
+    for offset in range(0, len(data), archive.width):
+        yield data[offset:offset + archive.width]
+
+
+def archive_election(election: Election) -> bool:
+    """
+    Freeze the results and archive the ballots of a closed election. Returns False if it was archived already.
+    """
+    if not election.closed:
+        raise ValueError(f'Election "{election}" ({election.pk}) is not closed')
+
+    with transaction.atomic():
+        # a concurrent archival of the same election waits here and finds it archived
+        election = Election.objects.select_for_update().get(pk=election.pk)
+        if election.archived_ballots is not None:
+            return False
+        ElectionResult.objects.bulk_create([
+            ElectionResult(application=application, election=election, votes_accept=application.votes_accept,
+                           votes_reject=application.votes_reject, votes_abstention=application.votes_abstention)
+            for application in election.election_summary
+        ])
+        width, number, data = compress_ballots(election)
+        BallotArchive.objects.create(election=election, width=width, data=data)
+        # not with save(), the pages of the session are reloaded once the whole session is archived
+        Election.objects.filter(pk=election.pk).update(archived_ballots=number)
+    return True
+
+
+def delete_in_batches(queryset: models.QuerySet, batch_size: int = BATCH_SIZE, pause: float = 0) -> int:
+    """
+    Delete the rows of the queryset `batch_size` rows at a time, each batch in its own transaction, and wait `pause`
+    seconds between the batches to give way to other writers. Returns the number of deleted rows.
+    """
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            deleted += queryset.model.objects.filter(pk__in=pks).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def purge_credentials(session: Session, batch_size: int = BATCH_SIZE, pause: float = 0) -> int:
+    """
+    Make the access codes of the participants unusable, in batches like `delete_in_batches`. Returns the number of
+    purged voters. Their login sessions end once the session is archived, see AccessCodeBackend.get_user.
+    """
+    voters = session.participants.exclude(password__startswith=UNUSABLE_PASSWORD_PREFIX)
+    purged = 0
+    while True:
+        pks = list(voters.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return purged
+        with transaction.atomic():
+            purged += session.participants.filter(pk__in=pks).update(password=make_password(None), logged_in=False)
+        if pause:
+            time.sleep(pause)
+
+
+def purge_avatars(session: Session) -> int:
+    applications = Application.objects.filter(election__session=session, avatar__isnull=False).exclude(avatar='')
+    names = list(applications.values_list('avatar', flat=True))
+    applications.update(avatar=None)
+    for name in names:
+        default_storage.delete(name)
+    return len(names)
+
+
+def archive_session(session: Session, batch_size: int = BATCH_SIZE, pause: float = 0) -> Dict[str, int]:
+    """
+    Archive the session, all its elections have to be closed. Returns the number of archived elections and of
+    deleted or purged rows per kind.
+    """
+    elections = list(session.elections.order_by('pk'))
+    open_elections = [election for election in elections if not election.closed]
+    if open_elections:
+        raise ValueError(f'Session "{session.title}" ({session.pk}) has elections which are not closed: '
+                         + ', '.join(str(election.pk) for election in open_elections))
+
+    stats = {'elections': sum(archive_election(election) for election in elections)}
+    archived = Election.objects.filter(session=session, archived_ballots__isnull=False)
+    stats['ballots'] = delete_in_batches(Ballot.objects.filter(election__in=archived), batch_size, pause)
+    stats['ballots_cast'] = delete_in_batches(BallotCast.objects.filter(election__in=archived), batch_size, pause)
+    stats['credentials'] = purge_credentials(session, batch_size, pause)
+    stats['avatars'] = purge_avatars(session)
+
+    with transaction.atomic():
+        Session.objects.filter(pk=session.pk, archived_at__isnull=True).update(archived_at=timezone.now())
+        bump_revisions([session.pk])
+    session.refresh_from_db(fields=['archived_at', 'revision'])
+    reset_session_turnout(session.pk)
+    return stats
@@ -0,0 +1,133 @@
+"""
+Native async versions of the voter views hit hardest during a vote rush, routed instead of the ones in vote.views if
+ASYNC_VOTER_VIEWS is set (see vote.urls). The database is queried with the async ORM, channel layer messages are
+awaited and access codes are verified in a bounded executor, so waiting requests do not occupy a thread each.
+Templates and forms are synchronous and may query lazily (e.g. the applications of an election card on a fragment
+cache miss), they are run through sync_to_async.
+"""
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import alogin
+from django.core.cache import cache
+from django.http.response import Http404, HttpResponse, HttpResponseNotFound
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+from django_ratelimit.core import is_ratelimited
+
+from vote.authentication import aauthenticate_access_code, avoter_login_required
+from vote.fragments import election_versions
+from vote.models import Application, Election, Session, Voter
+from vote.revisions import election_states, page_etag
+from vote.selectors import closed_elections, open_elections, published_elections, upcoming_elections
+from vote.views import spectator as sync_spectator, vote_page
+from wahlfang.routers import replica_reads
+
+
+async def code_login(request, access_code=None):
+    # shares the counter with the sync view
+    if is_ratelimited(request, group='vote.views.code_login', key=settings.RATELIMIT_KEY, rate='10/h',
+                      increment=True):
+        return await sync_to_async(render)(request, template_name='vote/ratelimited.html', status=429)
+
+    if not access_code:
+        messages.error(request, 'No access code provided.')
+        return redirect('vote:code_login')
+
+    user = await aauthenticate_access_code(access_code)
+    if not user:
+        messages.error(request, 'Invalid access code.')
+        return redirect('vote:code_login')
+
+    await alogin(request, user)
+
+    if user.qr:
+        await get_channel_layer().group_send(
+            "QR-Reload-" + str(user.session_id),
+            {'type': 'send_reload', 'link': reverse('management:add_mobile_voter', args=[user.session_id])}
+        )
+
+    return redirect('vote:index')
+
+
+@avoter_login_required
+@replica_reads
+@cache_control(private=True, no_cache=True)
+async def index(request):
+    voter: Voter = request.user
+    session = await Session.objects.aget(pk=voter.session_id)
+    voter.session = session
+
+    # same ETag as vote.views.index_etag
+    states = election_states([row async for row in session.elections.values_list('pk', 'start_date', 'end_date')])
+    ballots_cast = [pk async for pk in voter.ballots_cast.values_list('election_id', flat=True)]
+    etag = page_etag(request, session.revision, states, sorted(ballots_cast))
+    if etag is not None:
+        etag = quote_etag(etag)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+    elections = {
+        'open_elections': [e async for e in open_elections(session)],
+        'upcoming_elections': [e async for e in upcoming_elections(session)],
+        'published_elections': [e async for e in published_elections(session)],
+        'closed_elections': [e async for e in closed_elections(session)],
+    }
+    versions = election_versions(e.pk for group in elections.values() for e in group)
+    # Voter.can_vote and Voter.has_applied for all elections at once
+    excluded = {pk async for pk in Election.excluded_voters.through.objects.filter(voter=voter).values_list(
+        'election_id', flat=True)}
+    applied = {pk async for pk in Application.objects.filter(voter=voter).values_list('election_id', flat=True)}
+
+    def list_elections(elections):
+        return [
+            (e, e.is_open and e.pk not in excluded and e.pk not in ballots_cast, e.pk in applied, versions[e.pk])
+            for e in elections
+        ]
+
+    context = {
+        'title': session.title,
+        'meeting_link': session.meeting_link,
+        'voter': voter,
+        'existing_elections': len(states) > 0,
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        **{name: list_elections(group) for name, group in elections.items()},
+    }
+    response = await sync_to_async(render)(request, template_name='vote/index.html', context=context)
+    if etag is not None:
+        response.headers['ETag'] = etag
+    return response
+
+
+@avoter_login_required
+async def vote(request, election_id):
+    voter: Voter = request.user
+    election = await Election.objects.filter(session_id=voter.session_id, pk=election_id).afirst()
+    if election is None:
+        return HttpResponseNotFound('Election does not exists')
+    return await sync_to_async(vote_page)(request, voter, election)
+
+
+@replica_reads
+async def spectator(request, uuid):
+    session = await Session.objects.filter(spectator_token=uuid).afirst()
+    if session is None:
+        raise Http404('No Session matches the given query.')
+
+    user = await request.auser()
+    key = f'spectator:{session.pk}:{session.revision}'
+    page = None if user.is_authenticated or len(messages.get_messages(request)) > 0 else await cache.aget(key)
+    if page is None:
+        # render (and cache) the page with the sync view
+        request.user = user
+        return await sync_to_async(sync_spectator)(request, uuid)
+
+    response = get_conditional_response(request, etag=page['etag'], response=HttpResponse(page['content']))
+    response.headers['ETag'] = page['etag']
+    patch_cache_control(response, public=True, max_age=settings.SPECTATOR_MAX_AGE)
+    return response
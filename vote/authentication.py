@@ -1,8 +1,20 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth.decorators import user_passes_test
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import resolve_url
 
 from vote.models import Voter
 
+_password_executor: Optional[ThreadPoolExecutor] = None
+
 
 def voter_login_required(function=None, redirect_field_name=None):
     """
@@ -18,6 +30,67 @@ def voter_login_required(function=None, redirect_field_name=None):
     return actual_decorator
 
 
+def avoter_login_required(function):
+    """
+    voter_login_required for async views. Replaces the lazy request.user, which can not be evaluated in async code.
+    """
+
+    @wraps(function)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not (user.is_authenticated and isinstance(user, Voter)):
+            return redirect_to_login(request.get_full_path(), resolve_url(settings.LOGIN_URL), None)
+        request.user = user
+        return await function(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _verify_password(password: str, encoded: str) -> Tuple[bool, bool]:
+    if not check_password(password, encoded):
+        return False, False
+    preferred = get_hasher('default')
+    return True, identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+async def _run_hasher(func, *args):
+    # argon2 releases the GIL, a bounded pool keeps a login rush from taking all threads of the default executor
+    global _password_executor  # pylint: disable=W0603
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_PASSWORD_WORKERS,
+                                                thread_name_prefix='password')
+    return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+
+
+async def aauthenticate_access_code(access_code: str) -> Optional[Voter]:
+    """
+    AccessCodeBackend.authenticate for async views.
+    """
+    voter_id, password = Voter.split_access_code(access_code)
+    if not voter_id:
+        return None
+
+    voter = await Voter.objects.filter(voter_id=voter_id).afirst()
+    if voter is None:
+        # Run the default password hasher once to reduce the timing
+        # difference between an existing and a nonexistent user (#20760).
+        await _run_hasher(make_password, password)
+        return None
+
+    is_correct, must_update = await _run_hasher(_verify_password, password, voter.password)
+    if not is_correct:
+        return None
+    if must_update:
+        # password hash upgrades are no password changes, see Voter.check_password
+        voter.password = await _run_hasher(make_password, password)
+        await sync_to_async(voter.save)(update_fields=['password'])
+    if not voter.logged_in:
+        voter.logged_in = True
+        await sync_to_async(voter.save)(update_fields=['logged_in'])
+    voter.backend = 'vote.authentication.AccessCodeBackend'
+    return voter
+
+
 class AccessCodeBackend(BaseBackend):
     def authenticate(self, request, **kwargs):
         access_code = kwargs.pop('access_code', None)
@@ -38,11 +111,12 @@ class AccessCodeBackend(BaseBackend):
             if voter.check_password(password):
                 if not voter.logged_in:
                     voter.logged_in = True
-                    voter.save()
+                    voter.save(update_fields=['logged_in'])
                 voter.backend = 'vote.authentication.AccessCodeBackend'
                 return voter
 
         return None
 
     def get_user(self, user_id):
-        return Voter.objects.filter(pk=user_id).first()
+        # the voters of an archived session are logged out, see vote.archive.purge_credentials
+        return Voter.objects.filter(pk=user_id, session__archived_at__isnull=True).first()
@@ -0,0 +1,40 @@
+"""
+Avatar image processing. Kept free of Django imports so it can run in worker processes, see
+management.forms.ApplicationImportForm. Pillow is only imported once an avatar is processed.
+"""
+from io import BytesIO
+from typing import BinaryIO, Union
+
+MAX_WIDTH = 100
+MAX_HEIGHT = 100
+
+
+def process_avatar(data: Union[bytes, BinaryIO]) -> bytes:
+    """
+    Convert an uploaded image to a JPEG of at most MAX_WIDTH x MAX_HEIGHT pixels.
+    """
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    img = Image.open(BytesIO(data) if isinstance(data, bytes) else data)
+
+    # remove alpha channel
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new(img.mode[:-1], img.size, '#FFF')
+        background.paste(img, img.split()[-1])
+        img = background
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    # resize
+    width = MAX_WIDTH
+    width_percent = (width / float(img.size[0]))
+    height = int((float(img.size[1]) * float(width_percent)))
+    if height > MAX_HEIGHT:
+        height = MAX_HEIGHT
+        height_percent = (height / float(img.size[1]))
+        width = int((float(img.size[0]) * float(height_percent)))
+    img = img.resize((width, height), Image.LANCZOS)
+
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=95)
+    return output.getvalue()
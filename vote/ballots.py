@@ -0,0 +1,50 @@
+"""
+Compact ballot encoding: a ballot stores one 2 bit vote code per application, indexed by
+`Application.ballot_index`, four votes per byte (lowest bits first).
+"""
+from typing import Dict, Iterable, List, Tuple
+
+VOTE_ACCEPT = 'accept'
+VOTE_ABSTENTION = 'abstention'
+VOTE_REJECT = 'reject'
+
+# code 0 marks a position without a vote, e.g. padding or an application added after the ballot was cast
+VOTE_CODES = {
+    VOTE_ACCEPT: 1,
+    VOTE_REJECT: 2,
+    VOTE_ABSTENTION: 3,
+}
+VOTE_DECODE = {code: vote for vote, code in VOTE_CODES.items()}
+
+
+def pack_ballot(votes: Dict[int, str]) -> bytes:
+    """
+    Pack a mapping of ballot index -> vote into the compact ballot representation.
+    """
+    data = bytearray(max(votes) // 4 + 1 if votes else 0)
+    for idx, vote in votes.items():
+        data[idx // 4] |= VOTE_CODES[vote] << (2 * (idx % 4))
+    return bytes(data)
+
+
+def unpack_ballot(data: bytes) -> Dict[int, str]:
+    votes = {}
+    for byte_idx, byte in enumerate(data):
+        for shift in range(4):
+            code = (byte >> (2 * shift)) & 0b11
+            if code:
+                votes[byte_idx * 4 + shift] = VOTE_DECODE[code]
+    return votes
+
+
+def tally_ballots(ballots: Iterable[Tuple[bytes, int]]) -> Dict[int, List[int]]:
+    """
+    Count the votes of (packed ballot, number of identical ballots) pairs, as returned by grouping the
+    ballots of an election by their content. Returns [yes, no, abstention] per ballot index.
+    """
+    counts: Dict[int, List[int]] = {}
+    columns = {VOTE_ACCEPT: 0, VOTE_REJECT: 1, VOTE_ABSTENTION: 2}
+    for data, number in ballots:
+        for idx, vote in unpack_ballot(bytes(data)).items():
+            counts.setdefault(idx, [0, 0, 0])[columns[vote]] += number
+    return counts
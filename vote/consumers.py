@@ -4,9 +4,11 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 
 from vote.models import Session
+from wahlfang.metrics import track_queries
+from wahlfang.profiling import ProfiledConsumerMixin
 
 
-class VoteConsumer(AsyncWebsocketConsumer):
+class VoteConsumer(ProfiledConsumerMixin, AsyncWebsocketConsumer):
 
     async def connect(self):
         self.group = await database_sync_to_async(self.get_session_key)()  # pylint: disable=W0201
@@ -22,9 +24,10 @@ class VoteConsumer(AsyncWebsocketConsumer):
         }))
 
     def get_session_key(self):
-        if 'uuid' in self.scope['url_route']['kwargs']:
-            uuid = self.scope['url_route']['kwargs']['uuid']
-            session = Session.objects.get(spectator_token=uuid)
-        else:
-            session = self.scope['user'].session
-        return "Session-" + str(session.pk)
+        with track_queries('websocket:vote.connect'):
+            if 'uuid' in self.scope['url_route']['kwargs']:
+                uuid = self.scope['url_route']['kwargs']['uuid']
+                session = Session.objects.get(spectator_token=uuid)
+            else:
+                session = self.scope['user'].session
+            return "Session-" + str(session.pk)
@@ -1,13 +1,17 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from functools import partial
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.utils.translation import gettext_lazy as _
 
 from management.forms import ApplicationUploadForm
-from vote.models import Application, Voter, OpenVote, VOTE_CHOICES, Vote, VOTE_ABSTENTION, VOTE_ACCEPT, \
+from vote import intake
+from vote.ballots import pack_ballot
+from vote.models import Ballot, BallotCast, Voter, VOTE_CHOICES, VOTE_ABSTENTION, VOTE_ACCEPT, \
     VOTE_CHOICES_NO_ABSTENTION
+from vote.turnout import record_ballot
 
 
 class AccessCodeAuthenticationForm(forms.Form):
@@ -95,7 +99,7 @@ class VoteForm(forms.Form):
 
     def clean(self):
         super().clean()
-        if not OpenVote.objects.filter(election_id=self.election.pk, voter_id=self.voter.pk).exists():
+        if not self.voter.can_vote(self.election):
             raise forms.ValidationError('You are not allowed to vote')
 
         votes_yes = 0
@@ -109,29 +113,30 @@ class VoteForm(forms.Form):
                 f'Too many "yes" votes, only max. {self.max_votes_yes} allowed.')
 
     def save(self, commit=True):
-        votes = [
-            Vote(
-                election=self.election,
-                candidate=Application.objects.get(pk=int(name)),
-                vote=value
-            ) for name, value in self.cleaned_data.items()
-        ]
+        ballot = Ballot(
+            election_id=self.election.pk,
+            votes=pack_ballot({
+                self.fields[name].application.ballot_index: value for name, value in self.cleaned_data.items()
+            })
+        )
 
-        # existence of can_vote object already checked in clean()
-        can_vote = OpenVote.objects.get(election_id=self.election.pk, voter_id=self.voter.pk)
+        if commit and settings.BALLOT_GROUP_COMMIT:
+            # validated, the ballot is committed together with the others submitted meanwhile
+            return ballot if intake.submit(self.election.pk, self.voter.pk, ballot.votes) else None
 
         if commit:
-            with transaction.atomic():
-                Vote.objects.bulk_create(votes)
-                can_vote.delete()
-            # notify manager that new votes were cast
-            group = "Election-" + str(self.election.pk)
-            async_to_sync(get_channel_layer().group_send)(
-                group,
-                {'type': 'send_reload', 'id': '#votes'}
-            )
-
-        return votes
+            try:
+                with transaction.atomic():
+                    # the unique constraint rejects a second ballot submitted concurrently by the same voter
+                    BallotCast.objects.create(election=self.election, voter=self.voter)
+                    ballot.save()
+                    # update the turnout shown to the managers once the ballot is stored
+                    transaction.on_commit(partial(record_ballot, self.election.pk))
+            except IntegrityError:
+                # a concurrent request of the same voter was faster, only its ballot is counted
+                return None
+
+        return ballot
 
 
 class ApplicationUploadFormUser(ApplicationUploadForm):
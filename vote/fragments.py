@@ -0,0 +1,51 @@
+"""
+Version numbers of the rendered election cards of the voters (`{% cache %}` in index_election_item.html). The version
+of an election is bumped whenever the election, its applications or its tally change, so stale fragments are never
+looked up again and expire on their own. Like vote.turnout, deployments with several processes need a shared cache
+backend for the versions to agree.
+"""
+import time
+from typing import Dict, Iterable
+
+from django.core.cache import cache
+
+
+def _key(election_id: int) -> str:
+    return f'election-version:{election_id}'
+
+
+def _new_version() -> int:
+    # never reuses a version after the cache evicted or lost it
+    return time.time_ns()
+
+
+def election_versions(election_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Current fragment versions of the elections, fetched from the cache at once.
+    """
+    keys = {election_id: _key(election_id) for election_id in election_ids}
+    values = cache.get_many(keys.values())
+    missing = {key: _new_version() for key in keys.values() if key not in values}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        values.update(missing)
+    return {election_id: values[key] for election_id, key in keys.items()}
+
+
+def bump_election_versions(election_ids: Iterable[int]) -> None:
+    cache.set_many({_key(election_id): _new_version() for election_id in election_ids}, timeout=None)
+
+
+def election_changed(sender, instance, **kwargs):
+    bump_election_versions([instance.pk])
+
+
+def application_changed(sender, instance, **kwargs):
+    bump_election_versions([instance.election_id])
+
+
+def ballot_saved(sender, instance, **kwargs):
+    # the tally is only rendered once the election is closed, ballots of open elections do not invalidate anything.
+    # There is no receiver for deleted ballots, it would disable the fast (signal free) cascade delete of elections.
+    if instance.election.closed:
+        bump_election_versions([instance.election_id])
@@ -0,0 +1,138 @@
+"""
+Group commit of ballots (setting BALLOT_GROUP_COMMIT). Instead of every submission committing its own transaction,
+the ballots are queued and a writer thread stores all ballots queued so far in one transaction. Submitters wait
+until the transaction containing their ballot is committed, so a successful submission is as durable as before.
+"""
+import logging
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+
+from vote.models import Ballot, BallotCast
+from vote.turnout import record_ballot
+from wahlfang.routers import mark_written
+
+logger = logging.getLogger('vote.intake')
+
+
+class PendingBallot:
+    def __init__(self, election_id: int, voter_id: int, votes: bytes):
+        self.election_id = election_id
+        self.voter_id = voter_id
+        self.votes = votes
+        self.stored: Optional[bool] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+    def finish(self, stored: bool = False, error: Optional[BaseException] = None):
+        self.stored = stored
+        self.error = error
+        self.done.set()
+
+
+class BallotWriter(threading.Thread):
+    def __init__(self, max_batch: int, max_delay: float):
+        super().__init__(name='ballot-writer', daemon=True)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue: 'queue.Queue[PendingBallot]' = queue.Queue()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            try:
+                close_old_connections()
+                self.commit(batch)
+            except Exception as e:  # pylint: disable=W0703
+                logger.exception('Storing a batch of %d ballots failed', len(batch))
+                for pending in batch:
+                    if not pending.done.is_set():
+                        pending.finish(error=e)
+            finally:
+                connection.close()
+
+    def commit(self, batch: List[PendingBallot]):
+        # the first ballot of a voter in an election wins, as with the unique constraint in the direct path
+        accepted, seen = [], set()
+        existing = set(BallotCast.objects.filter(
+            voter_id__in={pending.voter_id for pending in batch},
+            election_id__in={pending.election_id for pending in batch},
+        ).values_list('voter_id', 'election_id'))
+        for pending in batch:
+            key = (pending.voter_id, pending.election_id)
+            if key in existing or key in seen:
+                pending.finish(stored=False)
+            else:
+                seen.add(key)
+                accepted.append(pending)
+
+        try:
+            with transaction.atomic():
+                self.insert(accepted)
+        except IntegrityError:
+            # a ballot of the same voter was committed by another process meanwhile, isolate it
+            for pending in accepted:
+                try:
+                    with transaction.atomic():
+                        self.insert([pending])
+                except IntegrityError:
+                    pending.finish(stored=False)
+            accepted = [pending for pending in accepted if not pending.done.is_set()]
+
+        for election_id, number in Counter(pending.election_id for pending in accepted).items():
+            record_ballot(election_id, number)
+        for pending in accepted:
+            pending.finish(stored=True)
+
+    @staticmethod
+    def insert(batch: List[PendingBallot]):
+        BallotCast.objects.bulk_create(
+            [BallotCast(election_id=pending.election_id, voter_id=pending.voter_id) for pending in batch])
+        ballots = [Ballot(election_id=pending.election_id, votes=pending.votes) for pending in batch]
+        # besides the ids, the physical order of the rows must not follow the casts either
+        random.SystemRandom().shuffle(ballots)
+        Ballot.objects.bulk_create(ballots)
+
+
+_writer: Optional[BallotWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> BallotWriter:
+    global _writer  # pylint: disable=W0603
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = BallotWriter(max_batch=settings.BALLOT_GROUP_COMMIT_MAX_BATCH,
+                                   max_delay=settings.BALLOT_GROUP_COMMIT_MAX_DELAY / 1000)
+            _writer.start()
+        return _writer
+
+
+def submit(election_id: int, voter_id: int, votes: bytes) -> bool:
+    """
+    Queue a packed ballot and wait until it is committed. Returns False if the voter has already voted. Raises
+    TimeoutError if the ballot was not stored within BALLOT_GROUP_COMMIT_TIMEOUT seconds, it may still be stored
+    afterwards.
+    """
+    pending = PendingBallot(election_id, voter_id, votes)
+    get_writer().queue.put(pending)
+    if not pending.done.wait(settings.BALLOT_GROUP_COMMIT_TIMEOUT):
+        raise TimeoutError(f'The ballot for election {election_id} was not stored in time')
+    if pending.error is not None:
+        raise pending.error
+    # the ballot was written by the writer thread, the voter reads their own vote from the primary
+    mark_written()
+    return bool(pending.stored)
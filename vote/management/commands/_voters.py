@@ -0,0 +1,84 @@
+"""
+Helpers shared by the bulk voter commands.
+"""
+import csv
+import json
+from typing import Dict, List, Tuple
+
+from django.core.management.base import CommandError
+from django.db.models import Q
+
+from vote.models import Voter
+from vote.services import send_invitations
+
+REPORT_FIELDS = ['voter_id', 'session_id', 'email', 'status', 'access_code', 'error']
+
+
+def add_selection_arguments(parser):
+    parser.add_argument('-i', '--session-id', type=int, help='select the voters of this session')
+    parser.add_argument('--email-domain', type=str, help='select the voters with an email address at this domain')
+    parser.add_argument('--voters-file', type=str,
+                        help='select the voters listed in this file, one voter id or email address per line')
+
+
+def add_report_arguments(parser):
+    parser.add_argument('-f', '--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('-o', '--output', type=str, help='write the report to this file instead of stdout')
+
+
+def read_lines(path: str) -> List[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def select_voters(options) -> List[Voter]:
+    """
+    Voters matching all given selection options, fetched with one query.
+    """
+    if not (options['session_id'] or options['email_domain'] or options['voters_file']):
+        raise CommandError('Select the voters with --session-id, --email-domain and/or --voters-file')
+
+    voters = Voter.objects.select_related('session').order_by('voter_id')
+    if options['session_id']:
+        voters = voters.filter(session_id=options['session_id'])
+    if options['email_domain']:
+        voters = voters.filter(email__iendswith='@' + options['email_domain'].lstrip('@'))
+    if options['voters_file']:
+        entries = read_lines(options['voters_file'])
+        voter_ids = [int(entry) for entry in entries if entry.isdigit()]
+        emails = [Voter.normalize_email(entry) for entry in entries if not entry.isdigit()]
+        voters = voters.filter(Q(voter_id__in=voter_ids) | Q(email__in=emails))
+    return list(voters)
+
+
+def report_row(voter: Voter, status: str, **kwargs) -> Dict:
+    return dict({'voter_id': voter.voter_id, 'session_id': voter.session_id, 'email': voter.email},
+                status=status, **kwargs)
+
+
+def invitation_report(voters_codes: List[Tuple[Voter, str]], status: str, send: bool) -> List[Dict]:
+    """
+    Report rows for voters with new access codes, sending their invitations unless `send` is False.
+    """
+    if not send:
+        return [report_row(voter, status, access_code=code) for voter, code in voters_codes]
+    codes = {voter.voter_id: code for voter, code in voters_codes}
+    return [
+        report_row(voter, 'invitation_failed' if error else 'invited' if voter.email else status,
+                   access_code=codes[voter.voter_id], error=error)
+        for voter, error in send_invitations(voters_codes)
+    ]
+
+
+def write_report(command, rows: List[Dict], options):
+    out = open(options['output'], 'w', newline='') if options['output'] else command.stdout  # pylint: disable=R1732
+    try:
+        if options['format'] == 'csv':
+            writer = csv.DictWriter(out, fieldnames=REPORT_FIELDS, extrasaction='ignore', lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            out.write(json.dumps(rows, indent=2) + '\n')
+    finally:
+        if options['output']:
+            out.close()
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from vote.archive import BATCH_SIZE, archivable_sessions, archive_session
+from vote.models import Session
+
+
+class Command(BaseCommand):
+    help = 'Freeze the results of finished sessions, archive their ballots and purge the access codes and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-i', '--session-id', type=int, nargs='+',
+                            help='archive these sessions, by default all sessions which ended ARCHIVE_AFTER_DAYS ago')
+        parser.add_argument('--older-than', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='days since the last election of the session ended')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='seconds to wait between the batches')
+        parser.add_argument('--dry-run', default=False, action='store_true',
+                            help='only list the sessions which would be archived')
+
+    def handle(self, *args, **options):
+        if options['session_id']:
+            sessions = Session.objects.filter(pk__in=options['session_id']).order_by('pk')
+        else:
+            sessions = archivable_sessions(timedelta(days=options['older_than']))
+
+        failed = 0
+        for session in sessions:
+            if options['dry_run']:
+                self.stdout.write(f'Would archive session "{session.title}" ({session.pk})')
+                continue
+            try:
+                stats = archive_session(session, batch_size=options['batch_size'], pause=options['pause'])
+            except ValueError as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(str(e)))
+                continue
+            except Exception as e:  # pylint: disable=W0703
+                # e.g. the storage or the database failed, the archived elections stay archived, run it again later
+                failed += 1
+                self.stdout.write(self.style.ERROR(
+                    f'Archiving session "{session.title}" ({session.pk}) failed: {e.__class__.__name__}: {e}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'Archived session "{session.title}" ({session.pk}): ' + ', '.join(
+                    f'{number} {name.replace("_", " ")}' for name, number in stats.items())))
+
+        if failed:
+            raise CommandError(f'{failed} session(s) could not be archived')
@@ -0,0 +1,95 @@
+import queue
+import statistics
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+
+from vote.ballots import VOTE_ACCEPT, VOTE_REJECT
+from vote.forms import VoteForm
+from vote.models import Application, Election, Session, Voter
+from vote.turnout import reset_turnout
+
+
+class Command(BaseCommand):
+    help = 'Measure the ballot throughput of the configured database with many voters voting at the same time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=32, help='voters submitting their ballot concurrently')
+        parser.add_argument('--applications', type=int, default=5)
+        parser.add_argument('--keep', default=False, action='store_true', help='keep the generated session')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        session = Session.objects.create(title='Ballot benchmark', start_date=now)
+        election = Election.objects.create(session=session, title='Benchmark', start_date=now - timedelta(minutes=1),
+                                           end_date=now + timedelta(hours=1))
+        applications = Application.objects.bulk_create([
+            Application(election=election, display_name=f'Candidate {idx + 1}', ballot_index=idx)
+            for idx in range(options['applications'])
+        ])
+        password = make_password(None)
+        voters = Voter.objects.bulk_create([
+            Voter(session=session, password=password, name=f'Voter {idx + 1}', logged_in=True)
+            for idx in range(options['voters'])
+        ], batch_size=1000)
+
+        pending = queue.Queue()
+        for idx, voter in enumerate(voters):
+            pending.put((idx, voter))
+        latencies, errors, rejected = [], [], []
+
+        def vote():
+            try:
+                while True:
+                    try:
+                        idx, voter = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    data = {str(application.pk): VOTE_ACCEPT if idx % 2 else VOTE_REJECT
+                            for application in applications}
+                    start = time.perf_counter()
+                    try:
+                        form = VoteForm(SimpleNamespace(user=voter), election, data=data)
+                        if not form.is_valid() or form.save() is None:
+                            rejected.append(voter.pk)
+                    except OperationalError as e:
+                        errors.append(str(e))
+                        continue
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=vote) for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+
+        stored = election.number_votes_cast()
+        self.stdout.write(f'engine: {connection.settings_dict["ENGINE"]}, threads: {options["threads"]}')
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.stdout.write(f'journal mode: {cursor.fetchone()[0]}')
+        if latencies:
+            latencies.sort()
+            self.stdout.write(
+                f'latency ms: median {statistics.median(latencies) * 1000:.1f}, '
+                f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}, max {latencies[-1] * 1000:.1f}')
+        self.stdout.write(f'ballots stored: {stored}, rejected: {len(rejected)}, failed: {len(errors)}')
+        for message in sorted(set(errors)):
+            self.stdout.write(self.style.ERROR(f'  {errors.count(message)}x {message}'))
+
+        if not options['keep']:
+            session.delete()
+            reset_turnout([election.pk])
+        self.stdout.write(self.style.SUCCESS(f'{stored / duration:.0f} ballots/s ({stored} in {duration:.2f}s)'))
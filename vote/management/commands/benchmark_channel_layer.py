@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+from channels.layers import channel_layers
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+GROUP = 'benchmark'
+
+
+async def receive_messages(alias, receivers, expected, timeout, ready):
+    layer = channel_layers.make_backend(alias)
+    channels = [await layer.new_channel() for _ in range(receivers)]
+    for channel in channels:
+        await layer.group_add(GROUP, channel)
+
+    async def receive(channel):
+        latencies = []
+        try:
+            while len(latencies) < expected:
+                message = await asyncio.wait_for(layer.receive(channel), timeout)
+                latencies.append(time.time() - message['sent'])
+        except asyncio.TimeoutError:
+            pass
+        return latencies, time.time()
+
+    tasks = [asyncio.create_task(receive(channel)) for channel in channels]
+    # give the layer time to subscribe (e.g. LISTEN) before the sender starts
+    await asyncio.sleep(1)
+    ready.set()
+    results = await asyncio.gather(*tasks)
+    await layer.close()
+    return [latency for latencies, _ in results for latency in latencies], max(end for _, end in results)
+
+
+def receiver_process(alias, receivers, expected, timeout, ready, results):
+    results.put(asyncio.run(receive_messages(alias, receivers, expected, timeout, ready)))
+
+
+async def send_messages(alias, messages, rate):
+    layer = channel_layers.make_backend(alias)
+    start = time.time()
+    for seq in range(messages):
+        # paced, so the bounded channels of the receivers are not flooded
+        delay = start + seq / rate - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await layer.group_send(GROUP, {'type': 'benchmark.message', 'sent': time.time(), 'seq': seq})
+    duration = time.time() - start
+    # let batching layers publish the last messages before closing
+    await asyncio.sleep(0.5)
+    await layer.close()
+    return start, duration
+
+
+class Command(BaseCommand):
+    help = 'Measure the throughput and latency of group messages from one process to the consumers of another ' \
+           'process for the configured channel layers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--layers', nargs='+', help='aliases in CHANNEL_LAYERS, all configured layers by default')
+        parser.add_argument('--messages', type=int, default=2000, help='group messages sent')
+        parser.add_argument('--receivers', type=int, default=50, help='consumers in the group')
+        parser.add_argument('--rate', type=int, default=500, help='group messages sent per second')
+        parser.add_argument('--timeout', type=float, default=5,
+                            help='seconds a receiver waits for the next message before giving up')
+
+    def handle(self, *args, **options):
+        aliases = options['layers'] or list(settings.CHANNEL_LAYERS)
+        unknown = set(aliases) - set(settings.CHANNEL_LAYERS)
+        if unknown:
+            raise CommandError(f'Unknown channel layers: {", ".join(sorted(unknown))}')
+
+        # the receiver is forked, it must not share the database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        for alias in aliases:
+            ready, results = context.Event(), context.Queue()
+            receiver = context.Process(target=receiver_process, args=(
+                alias, options['receivers'], options['messages'], options['timeout'], ready, results))
+            receiver.start()
+            if not ready.wait(30):
+                receiver.terminate()
+                raise CommandError(f'The receiver of {alias} did not start')
+            start, send_duration = asyncio.run(send_messages(alias, options['messages'], options['rate']))
+            latencies, end = results.get()
+            receiver.join()
+            self.report(alias, options, latencies, start, end, send_duration)
+
+    def report(self, alias, options, latencies, start, end, send_duration):
+        expected = options['messages'] * options['receivers']
+        line = f'{alias} ({settings.CHANNEL_LAYERS[alias]["BACKEND"].rpartition(".")[2]}): ' \
+               f'{options["messages"] / send_duration:.0f} group_send/s, delivered {len(latencies)}/{expected}'
+        if latencies:
+            latencies.sort()
+            line += f', {len(latencies) / (end - start):.0f} messages/s, latency ms median ' \
+                    f'{statistics.median(latencies) * 1000:.1f}, p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}' \
+                    f', max {latencies[-1] * 1000:.1f}'
+        self.stdout.write(self.style.SUCCESS(line) if len(latencies) == expected else self.style.WARNING(line))
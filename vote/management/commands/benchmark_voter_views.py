@@ -0,0 +1,77 @@
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from vote.ballots import VOTE_ACCEPT, VOTE_REJECT
+from vote.models import Application, Election, Session
+from vote.services import create_voters
+
+
+class Command(BaseCommand):
+    help = 'Measure the concurrent throughput of the voter views served with ASGI, run it once with and once ' \
+           'without ASYNC_VOTER_VIEWS to compare the async and the sync views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50, help='requests in flight at the same time')
+        parser.add_argument('--reloads', type=int, default=5, help='index page loads per voter')
+        parser.add_argument('--keep', default=False, action='store_true', help='keep the generated session')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        session = Session.objects.create(title='View benchmark', start_date=now)
+        election = Election.objects.create(session=session, title='Benchmark', start_date=now - timedelta(minutes=1),
+                                           end_date=now + timedelta(hours=1))
+        applications = [Application.objects.create(election=election, display_name=f'Candidate {idx + 1}')
+                        for idx in range(5)]
+        access_codes = [code for _, code in create_voters(session, [(None, f'Voter {idx + 1}')
+                                                                    for idx in range(options['voters'])])]
+        token = session.create_spectator_token()
+
+        self.stdout.write(f'views: {"async" if settings.ASYNC_VOTER_VIEWS else "sync"}, voters: {options["voters"]}, '
+                          f'concurrency: {options["concurrency"]}')
+        # all clients share one address, the rate limit of the login would reject most of them
+        with override_settings(RATELIMIT_ENABLE=False, ALLOWED_HOSTS=['testserver']):
+            asyncio.run(self.run(options, access_codes, election, applications, token))
+
+        if not options['keep']:
+            session.delete()
+
+    async def run(self, options, access_codes, election, applications, token):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        clients = [AsyncClient() for _ in access_codes]
+        ballot = {str(application.pk): VOTE_ACCEPT if idx % 2 else VOTE_REJECT
+                  for idx, application in enumerate(applications)}
+
+        async def timed(request, expected_status):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await request
+                if response.status_code != expected_status:
+                    raise RuntimeError(f'{response.status_code} instead of {expected_status}: {response.content[:200]}')
+                return time.perf_counter() - start
+
+        phases = [
+            ('login', [timed(client.get(reverse('vote:link_login', args=[code])), 302)
+                       for client, code in zip(clients, access_codes)]),
+            ('index', [timed(client.get(reverse('vote:index')), 200)
+                       for _ in range(options['reloads']) for client in clients]),
+            ('vote', [timed(client.post(reverse('vote:vote', args=[election.pk]), ballot), 302)
+                      for client in clients]),
+            ('spectator', [timed(AsyncClient().get(reverse('vote:spectator', args=[token])), 200)
+                           for _ in clients]),
+        ]
+        for name, requests in phases:
+            start = time.perf_counter()
+            latencies = sorted(await asyncio.gather(*requests))
+            duration = time.perf_counter() - start
+            self.stdout.write(
+                f'{name:>10}: {len(latencies) / duration:8.1f} requests/s, latency ms median '
+                f'{statistics.median(latencies) * 1000:.1f}, p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}')
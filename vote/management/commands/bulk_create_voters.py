@@ -0,0 +1,37 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from management.forms import validate_voter_rows
+from vote.management.commands._voters import add_report_arguments, invitation_report, write_report
+from vote.models import Session
+from vote.services import HASH_WORKERS, create_voters
+
+
+class Command(BaseCommand):
+    help = 'Create the voters listed in a CSV file with the columns email and name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-i', '--session-id', type=int, required=True)
+        parser.add_argument('--csv', type=str, required=True)
+        add_report_arguments(parser)
+        parser.add_argument('--no-invitation', default=False, action='store_true')
+        parser.add_argument('--hash-workers', type=int, default=HASH_WORKERS)
+
+    def handle(self, *args, **options):
+        session = Session.objects.get(pk=options['session_id'])
+        with open(options['csv'], encoding='utf-8-sig', newline='') as f:
+            csv_reader = csv.DictReader(f)
+            if not csv_reader.fieldnames or 'email' not in csv_reader.fieldnames:
+                raise CommandError('CSV file needs to have the column "email".')
+            rows, errors = validate_voter_rows(session, (
+                (csv_reader.line_num, (row['email'] or '').strip(), row.get('name') or None) for row in csv_reader
+            ))
+        if errors:
+            raise CommandError('\n'.join(errors))
+
+        voters_codes = create_voters(session, rows, workers=options['hash_workers'])
+        report = invitation_report(voters_codes, 'created', send=not options['no_invitation'])
+
+        write_report(self, report, options)
+        self.stderr.write(self.style.SUCCESS(f'Successfully created {len(report)} voters'))
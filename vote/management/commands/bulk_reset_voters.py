@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from vote.management.commands._voters import add_report_arguments, add_selection_arguments, invitation_report, \
+    select_voters, write_report
+from vote.services import HASH_WORKERS, reset_voters
+
+
+class Command(BaseCommand):
+    help = 'Reset the access codes of the selected voters and resend their invitations'
+
+    def add_arguments(self, parser):
+        add_selection_arguments(parser)
+        add_report_arguments(parser)
+        parser.add_argument('--no-invitation', default=False, action='store_true')
+        parser.add_argument('--hash-workers', type=int, default=HASH_WORKERS)
+
+    def handle(self, *args, **options):
+        voters = select_voters(options)
+        voters_codes = reset_voters(voters, workers=options['hash_workers'])
+        rows = invitation_report(voters_codes, 'reset', send=not options['no_invitation'])
+
+        write_report(self, rows, options)
+        self.stderr.write(self.style.SUCCESS(f'Successfully reset {len(rows)} voters'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vote.management.commands._voters import add_report_arguments, add_selection_arguments, read_lines, \
+    report_row, select_voters, write_report
+from vote.services import HASH_WORKERS, check_access_codes, revoke_voters
+
+
+class Command(BaseCommand):
+    help = 'Revoke the access codes of the selected voters or the access codes listed in a file'
+
+    def add_arguments(self, parser):
+        add_selection_arguments(parser)
+        add_report_arguments(parser)
+        parser.add_argument('--access-codes-file', type=str, help='file with one access code per line')
+        parser.add_argument('--hash-workers', type=int, default=HASH_WORKERS)
+
+    def handle(self, *args, **options):
+        rows = []
+        if options['access_codes_file']:
+            if options['session_id'] or options['email_domain'] or options['voters_file']:
+                raise CommandError('--access-codes-file cannot be combined with other selections')
+            voters = []
+            for access_code, voter in check_access_codes(read_lines(options['access_codes_file']),
+                                                         workers=options['hash_workers']):
+                if voter is None:
+                    rows.append({'status': 'invalid_code', 'access_code': access_code})
+                else:
+                    voters.append(voter)
+                    rows.append(report_row(voter, 'revoked', access_code=access_code))
+        else:
+            voters = select_voters(options)
+            rows = [report_row(voter, 'revoked') for voter in voters]
+
+        revoke_voters(voters)
+        write_report(self, rows, options)
+        self.stderr.write(self.style.SUCCESS(f'Successfully revoked access for {len(voters)} voters'))
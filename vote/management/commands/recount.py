@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vote.models import Election
+from vote.tally import recount, summary_tally
+
+
+class Command(BaseCommand):
+    help = 'Recount the votes of closed elections and compare them with the published results'
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('-e', '--election-id', type=int, nargs='+')
+        group.add_argument('-i', '--session-id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        if options['election_id']:
+            elections = Election.objects.filter(pk__in=options['election_id'])
+        else:
+            elections = Election.objects.filter(session_id=options['session_id'])
+
+        mismatches = 0
+        for election in elections.order_by('pk'):
+            if not election.closed:
+                self.stdout.write(self.style.WARNING(f'Skipping election "{election}" ({election.pk}), not closed yet'))
+                continue
+
+            counted = recount(election, chunk_size=options['chunk_size'])
+            expected = summary_tally(election)
+            if counted == expected:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Election "{election}" ({election.pk}): {len(counted)} applications, results match'))
+                continue
+
+            mismatches += 1
+            self.stdout.write(self.style.ERROR(f'Election "{election}" ({election.pk}): results differ'))
+            for application_id in sorted(set(counted) | set(expected)):
+                if counted.get(application_id) != expected.get(application_id):
+                    self.stdout.write(f'  application {application_id}: recount (yes, no, abstention) '
+                                      f'{counted.get(application_id)}, summary {expected.get(application_id)}')
+
+        if mismatches:
+            raise CommandError(f'{mismatches} election(s) with differing results')
@@ -0,0 +1,204 @@
+import json
+import random
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.hashers import MD5PasswordHasher, make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from management.models import ElectionManager
+from vote.avatars import process_avatar
+from vote.ballots import VOTE_ABSTENTION, VOTE_ACCEPT, VOTE_REJECT, pack_ballot
+from vote.models import Application, Ballot, BallotCast, Election, Enc32, Session, Voter
+from vote.turnout import reset_turnout
+
+FIRST_NAMES = ['Anna', 'Ben', 'Clara', 'David', 'Emma', 'Felix', 'Greta', 'Hannes', 'Ida', 'Jonas', 'Klara', 'Lukas',
+               'Mia', 'Noah', 'Olivia', 'Paul', 'Quirin', 'Rosa', 'Simon', 'Tara', 'Uwe', 'Vera', 'Wim', 'Zoe']
+LAST_NAMES = ['Bauer', 'Fischer', 'Hoffmann', 'Koch', 'Meyer', 'Müller', 'Richter', 'Schmidt', 'Schneider',
+              'Schulz', 'Wagner', 'Weber', 'Wolf', 'Zimmermann']
+FAST_HASHER = 'django.contrib.auth.hashers.MD5PasswordHasher'
+BATCH_SIZE = 5000
+
+
+def random_votes(rng, election, applications):
+    """
+    Random votes of one ballot, with at most `max_votes_yes` yes votes.
+    """
+    votes, nr_yes = {}, 0
+    for application in applications:
+        vote = rng.choice([VOTE_ACCEPT, VOTE_REJECT, VOTE_ABSTENTION])
+        if vote == VOTE_ACCEPT:
+            if election.max_votes_yes is not None and nr_yes >= election.max_votes_yes:
+                vote = VOTE_REJECT
+            else:
+                nr_yes += 1
+        votes[application.ballot_index] = vote
+    return votes
+
+
+def random_id(rng, model):
+    # the uuid4 primary keys of the ballots and the ballots cast, reproducible with the seed
+    return model._meta.pk.get_db_prep_value(uuid.UUID(int=rng.getrandbits(128), version=4),  # pylint: disable=W0212
+                                            connection)
+
+
+def insert_rows(model, columns, rows):
+    """
+    Insert plain value tuples with executemany, several times faster than bulk_create for the ballots of large
+    datasets.
+    """
+    qn = connection.ops.quote_name
+    table = model._meta.db_table  # pylint: disable=W0212
+    sql = f'INSERT INTO {qn(table)} ({", ".join(qn(column) for column in columns)}) ' \
+          f'VALUES ({", ".join(["%s"] * len(columns))})'
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(sql, rows[i:i + BATCH_SIZE])
+
+
+class Command(BaseCommand):
+    help = 'Generate large sessions with voters, elections, applications and ballots for load and regression tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--sessions', type=int, default=1)
+        parser.add_argument('--voters', type=int, default=10000, help='voters per session')
+        parser.add_argument('--elections', type=int, default=20, help='elections per session')
+        parser.add_argument('--applications', type=int, default=5, help='applications per election')
+        parser.add_argument('--avatars', type=float, default=0.5, help='share of applications with an avatar')
+        parser.add_argument('--turnout', type=float, default=0.6,
+                            help='share of the voters who voted in the open and closed elections')
+        parser.add_argument('--anonymous', type=float, default=0.1, help='share of voters without email address')
+        parser.add_argument('--fast-hasher', default=False, action='store_true',
+                            help='store MD5 password hashes, only for benchmarks not measuring logins')
+        parser.add_argument('--manifest', type=str, help='write the ids and access codes of the data to this file')
+        parser.add_argument('--fixture', type=str, help='additionally dump the generated data as a Django fixture')
+
+    def handle(self, *args, **options):
+        if options['fast_hasher'] and FAST_HASHER not in settings.PASSWORD_HASHERS:
+            raise CommandError(f'--fast-hasher requires {FAST_HASHER} in PASSWORD_HASHERS')
+
+        username = f'perf-{options["seed"]}'
+        if ElectionManager.objects.filter(username=username).exists():
+            raise CommandError(f'Data for seed {options["seed"]} exists already, use another seed or database')
+
+        rng = random.Random(options['seed'])
+        # all voters and the manager share one password, so it only has to be hashed once
+        password = ''.join(rng.choice(Enc32.alphabet) for _ in range(20))
+        if options['fast_hasher']:
+            password_hash = MD5PasswordHasher().encode(password, 'perf')
+        else:
+            password_hash = make_password(password)
+        avatars = [self.avatar(rng) for _ in range(8)]
+
+        with transaction.atomic():
+            manager = ElectionManager.objects.create(username=username, password=password_hash)
+            sessions = [self.seed_session(rng, number, manager, password, password_hash, avatars, options)
+                        for number in range(options['sessions'])]
+        reset_turnout(election_id for session in sessions for state in session['elections'].values()
+                      for election_id in state)
+
+        manifest = {
+            'seed': options['seed'],
+            'fast_hasher': options['fast_hasher'],
+            'manager': manager.username,
+            'password': password,
+            'sessions': sessions,
+        }
+        if options['manifest']:
+            with open(options['manifest'], 'w') as f:
+                json.dump(manifest, f, indent=2)
+        if options['fixture']:
+            call_command('dumpdata', 'vote', 'management', output=options['fixture'], verbosity=0)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully created {len(sessions)} sessions with {options["voters"]} voters and '
+            f'{options["elections"]} elections each, manager "{manager.username}"'))
+
+    @staticmethod
+    def avatar(rng):
+        image = BytesIO()
+        Image.new('RGB', (200, 200), tuple(rng.randrange(256) for _ in range(3))).save(image, format='PNG')
+        return process_avatar(image.getvalue())
+
+    def seed_session(self, rng, number, manager, password, password_hash, avatars, options):
+        now = timezone.now()
+        session = Session.objects.create(title=f'Assembly {number + 1}', start_date=now)
+        manager.sessions.add(session)
+
+        voters = []
+        for idx in range(options['voters']):
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            anonymous = rng.random() < options['anonymous']
+            voters.append(Voter(
+                session=session,
+                password=password_hash,
+                name=name,
+                email=None if anonymous else f'voter{idx}@s{number}.example.org',
+                logged_in=rng.random() < options['turnout'],
+            ))
+        voters = Voter.objects.bulk_create(voters, batch_size=BATCH_SIZE)
+
+        # a third of the elections is closed, a third open and the rest has not started yet
+        states = {'closed': [], 'open': [], 'upcoming': []}
+        for idx in range(options['elections']):
+            if idx < options['elections'] // 3:
+                state, start, end = 'closed', now - timedelta(hours=2), now - timedelta(hours=1)
+            elif idx < 2 * options['elections'] // 3:
+                state, start, end = 'open', now - timedelta(hours=1), now + timedelta(hours=1)
+            else:
+                state, start, end = 'upcoming', now + timedelta(hours=1), now + timedelta(hours=2)
+            nr_applications = options['applications']
+            election = Election.objects.bulk_create([Election(
+                session=session,
+                title=f'Election {idx + 1}',
+                start_date=start,
+                end_date=end,
+                max_votes_yes=rng.randint(1, nr_applications) if nr_applications > 1 else None,
+                voters_self_apply=nr_applications > 1,
+            )])[0]
+            states[state].append(election.pk)
+            self.seed_election(rng, election, voters, avatars, options, cast=state != 'upcoming')
+
+        return {
+            'id': session.pk,
+            'voters': len(voters),
+            'voter_ids': [voters[0].voter_id, voters[-1].voter_id] if voters else [],
+            'access_codes': [Voter.get_access_code(voter, password) for voter in voters[:10]],
+            'elections': states,
+        }
+
+    @staticmethod
+    def seed_election(rng, election, voters, avatars, options, cast):
+        applications = Application.objects.bulk_create([
+            Application(
+                election=election,
+                display_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                text='Lorem ipsum dolor sit amet.',
+                avatar=ContentFile(rng.choice(avatars), name='avatar.jpg')
+                if rng.random() < options['avatars'] else None,
+                ballot_index=idx,
+            )
+            for idx in range(options['applications'])
+        ])
+        if not cast:
+            return
+
+        ballots, ballots_cast = [], []
+        for voter in voters:
+            if rng.random() >= options['turnout']:
+                continue
+            ballots_cast.append((random_id(rng, BallotCast), election.pk, voter.voter_id))
+            ballots.append((random_id(rng, Ballot), election.pk,
+                            pack_ballot(random_votes(rng, election, applications))))
+        # shuffled so the ballots can not be matched to the voters by their order
+        rng.shuffle(ballots)
+        insert_rows(BallotCast, ('id', 'election_id', 'voter_id'), ballots_cast)
+        insert_rows(Ballot, ('id', 'election_id', 'votes'), ballots)
@@ -4,17 +4,19 @@ from django.db import migrations, models
 
 
 def char2bool(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
     election = apps.get_model('vote', 'election')
-    for row in election.objects.all():
+    for row in election.objects.using(db_alias).all():
         row.result_unpublished = not bool(int(row.result_published))
-        row.save(update_fields=['result_unpublished'])
+        row.save(using=db_alias, update_fields=['result_unpublished'])
 
 
 def bool2char(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
     election = apps.get_model('vote', 'election')
-    for row in election.objects.all():
+    for row in election.objects.using(db_alias).all():
         row.result_published = str(int(not row.result_unpublished))
-        row.save(update_fields=['result_published'])
+        row.save(using=db_alias, update_fields=['result_published'])
 
 
 class Migration(migrations.Migration):
@@ -5,9 +5,10 @@ from django.db.models import Q
 
 
 def update_values(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
     election = apps.get_model('vote', 'election')
-    election.objects.update(result_published=Q(result_published=False))
-    election.objects.update(enable_abstention=Q(enable_abstention=False))
+    election.objects.using(db_alias).update(result_published=Q(result_published=False))
+    election.objects.using(db_alias).update(enable_abstention=Q(enable_abstention=False))
 
 
 class Migration(migrations.Migration):
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+def assign_ballot_indexes(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Application = apps.get_model('vote', 'Application')
+    applications = []
+    election_id, idx = None, 0
+    for application in Application.objects.using(db_alias).order_by('election_id', 'pk').iterator():
+        if application.election_id != election_id:
+            election_id, idx = application.election_id, 0
+        application.ballot_index = idx
+        idx += 1
+        applications.append(application)
+    Application.objects.using(db_alias).bulk_update(applications, ['ballot_index'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0031_voter_qr'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='ballot_index',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(assign_ballot_indexes, migrations.RunPython.noop),
+    ]
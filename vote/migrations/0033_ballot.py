@@ -0,0 +1,98 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# frozen copy of the encoding in vote.ballots
+VOTE_CODES = {'accept': 1, 'reject': 2, 'abstention': 3}
+VOTE_DECODE = {code: vote for vote, code in VOTE_CODES.items()}
+BATCH_SIZE = 1000
+
+
+def pack_ballot(votes):
+    data = bytearray(max(votes) // 4 + 1 if votes else 0)
+    for idx, vote in votes.items():
+        data[idx // 4] |= VOTE_CODES[vote] << (2 * (idx % 4))
+    return bytes(data)
+
+
+def unpack_ballot(data):
+    for byte_idx, byte in enumerate(bytes(data)):
+        for shift in range(4):
+            code = (byte >> (2 * shift)) & 0b11
+            if code:
+                yield byte_idx * 4 + shift, VOTE_DECODE[code]
+
+
+def votes_to_ballots(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Application = apps.get_model('vote', 'Application')
+    Ballot = apps.get_model('vote', 'Ballot')
+    Vote = apps.get_model('vote', 'Vote')
+
+    ballot_index = dict(Application.objects.using(db_alias).values_list('pk', 'ballot_index'))
+    ballots = []
+    election_id, current = None, {}
+    rows = Vote.objects.using(db_alias).order_by('election_id', 'pk').values_list(
+        'election_id', 'candidate_id', 'vote')
+    # The votes of one ballot were inserted with a single bulk_create and therefore have consecutive primary keys,
+    # a new ballot starts where an application repeats.
+    for vote_election_id, candidate_id, vote in rows.iterator():
+        idx = ballot_index[candidate_id]
+        if vote_election_id != election_id or idx in current:
+            if current:
+                ballots.append(Ballot(election_id=election_id, votes=pack_ballot(current)))
+            election_id, current = vote_election_id, {}
+        current[idx] = vote
+        if len(ballots) >= BATCH_SIZE:
+            Ballot.objects.using(db_alias).bulk_create(ballots)
+            ballots = []
+    if current:
+        ballots.append(Ballot(election_id=election_id, votes=pack_ballot(current)))
+    Ballot.objects.using(db_alias).bulk_create(ballots)
+
+
+def ballots_to_votes(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Application = apps.get_model('vote', 'Application')
+    Ballot = apps.get_model('vote', 'Ballot')
+    Vote = apps.get_model('vote', 'Vote')
+
+    application_ids = {
+        (election_id, idx): pk for pk, election_id, idx in
+        Application.objects.using(db_alias).values_list('pk', 'election_id', 'ballot_index')
+    }
+    votes = []
+    for ballot in Ballot.objects.using(db_alias).order_by('pk').iterator():
+        for idx, vote in unpack_ballot(ballot.votes):
+            votes.append(Vote(election_id=ballot.election_id,
+                              candidate_id=application_ids[(ballot.election_id, idx)], vote=vote))
+        if len(votes) >= BATCH_SIZE:
+            Vote.objects.using(db_alias).bulk_create(votes)
+            votes = []
+    Vote.objects.using(db_alias).bulk_create(votes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0032_application_ballot_index'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='application',
+            unique_together={('voter', 'election'), ('election', 'ballot_index')},
+        ),
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('votes', models.BinaryField()),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ballots',
+                                               to='vote.election')),
+            ],
+        ),
+        migrations.RunPython(votes_to_ballots, ballots_to_votes),
+        migrations.DeleteModel(
+            name='Vote',
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicate_open_votes(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    OpenVote = apps.get_model('vote', 'OpenVote')
+    duplicates = OpenVote.objects.using(db_alias).values('voter_id', 'election_id').annotate(
+        keep=Min('pk'), number=models.Count('pk')).filter(number__gt=1)
+    for duplicate in duplicates:
+        OpenVote.objects.using(db_alias).filter(
+            voter_id=duplicate['voter_id'], election_id=duplicate['election_id']).exclude(pk=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0033_ballot'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_open_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='openvote',
+            constraint=models.UniqueConstraint(fields=('voter', 'election'), name='vote_openvote_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='ballot',
+            index=models.Index(fields=['election', 'votes'], name='vote_ballot_tally_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_votes_to_ballots_cast(apps, schema_editor):
+    """
+    Every participant of a session used to get an open vote for each election that was not closed yet, which was
+    deleted when they voted. Participants without an open vote are therefore recorded as having cast their ballot.
+    """
+    db_alias = schema_editor.connection.alias
+    Election = apps.get_model('vote', 'Election')
+    OpenVote = apps.get_model('vote', 'OpenVote')
+    BallotCast = apps.get_model('vote', 'BallotCast')
+    for election in Election.objects.using(db_alias).all().iterator():
+        open_voters = OpenVote.objects.using(db_alias).filter(election_id=election.pk).values('voter_id')
+        voter_ids = election.session.participants.exclude(pk__in=open_voters).values_list('pk', flat=True)
+        BallotCast.objects.using(db_alias).bulk_create(
+            [BallotCast(election_id=election.pk, voter_id=voter_id) for voter_id in voter_ids.iterator()],
+            batch_size=1000,
+        )
+
+
+def ballots_cast_to_open_votes(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Election = apps.get_model('vote', 'Election')
+    OpenVote = apps.get_model('vote', 'OpenVote')
+    for election in Election.objects.using(db_alias).all().iterator():
+        voter_ids = election.session.participants.exclude(excluded_elections=election).exclude(
+            ballots_cast__election=election).values_list('pk', flat=True)
+        OpenVote.objects.using(db_alias).bulk_create(
+            [OpenVote(election_id=election.pk, voter_id=voter_id) for voter_id in voter_ids.iterator()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0034_openvote_unique_ballot_tally_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='excluded_voters',
+            field=models.ManyToManyField(blank=True, related_name='excluded_elections', to='vote.voter'),
+        ),
+        migrations.CreateModel(
+            name='BallotCast',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                               related_name='ballots_cast', to='vote.election')),
+                ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                            related_name='ballots_cast', to='vote.voter')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ballotcast',
+            constraint=models.UniqueConstraint(fields=('voter', 'election'), name='vote_ballotcast_unique'),
+        ),
+        migrations.RunPython(open_votes_to_ballots_cast, ballots_cast_to_open_votes),
+        migrations.DeleteModel(
+            name='OpenVote',
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0036_voter_roster_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,41 @@
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0037_session_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BallotArchive',
+            fields=[
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ballot_archive', serialize=False, to='vote.election')),
+                ('width', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='election',
+            name='archived_ballots',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ElectionResult',
+            fields=[
+                ('application', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result', serialize=False, to='vote.application')),
+                ('votes_accept', models.PositiveIntegerField()),
+                ('votes_reject', models.PositiveIntegerField()),
+                ('votes_abstention', models.PositiveIntegerField()),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='final_results', to='vote.election')),
+            ],
+        ),
+    ]
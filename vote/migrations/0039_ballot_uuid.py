@@ -0,0 +1,45 @@
+import uuid
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def assign_uuids(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Ballot = apps.get_model('vote', 'Ballot')
+    ballots = []
+    for ballot in Ballot.objects.using(db_alias).only('pk').iterator():
+        ballot.uuid = uuid.uuid4()
+        ballots.append(ballot)
+    Ballot.objects.using(db_alias).bulk_update(ballots, ['uuid'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0038_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ballot',
+            name='uuid',
+            field=models.UUIDField(null=True),
+        ),
+        migrations.RunPython(assign_uuids, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='ballot',
+            name='id',
+        ),
+        migrations.AlterField(
+            model_name='ballot',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.RenameField(
+            model_name='ballot',
+            old_name='uuid',
+            new_name='id',
+        ),
+    ]
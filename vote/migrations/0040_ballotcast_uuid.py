@@ -0,0 +1,45 @@
+import uuid
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def assign_uuids(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    BallotCast = apps.get_model('vote', 'BallotCast')
+    ballots_cast = []
+    for ballot_cast in BallotCast.objects.using(db_alias).only('pk').iterator():
+        ballot_cast.uuid = uuid.uuid4()
+        ballots_cast.append(ballot_cast)
+    BallotCast.objects.using(db_alias).bulk_update(ballots_cast, ['uuid'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0039_ballot_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ballotcast',
+            name='uuid',
+            field=models.UUIDField(null=True),
+        ),
+        migrations.RunPython(assign_uuids, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='ballotcast',
+            name='id',
+        ),
+        migrations.AlterField(
+            model_name='ballotcast',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.RenameField(
+            model_name='ballotcast',
+            old_name='uuid',
+            new_name='id',
+        ),
+    ]
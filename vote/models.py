@@ -6,10 +6,8 @@ from argparse import Namespace
 from datetime import datetime
 from functools import partial
 from io import BytesIO
-from typing import Tuple, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
-import PIL
-from PIL import Image
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
@@ -19,17 +17,18 @@ from django.contrib.auth.hashers import (
 )
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.core.mail import send_mail
-from django.db import models
-from django.db.models import Count, Q, CASCADE
+from django.db import models, transaction
+from django.db.models import Count, F, Max, CASCADE
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.crypto import get_random_string
+from django.utils.functional import cached_property
 from django.utils.html import strip_tags
 
-VOTE_ACCEPT = 'accept'
-VOTE_ABSTENTION = 'abstention'
-VOTE_REJECT = 'reject'
+from vote.avatars import process_avatar
+from vote.ballots import VOTE_ACCEPT, VOTE_ABSTENTION, VOTE_REJECT, tally_ballots
+
 VOTE_CHOICES = [
     (VOTE_ABSTENTION, 'Abstention'),
     (VOTE_ACCEPT, 'Yes'),
@@ -42,6 +41,61 @@ VOTE_CHOICES_NO_ABSTENTION = [
 ]
 
 
+def count_ballots(ballots: 'models.QuerySet[Ballot]') -> Dict[int, Dict[int, List[int]]]:
+    """
+    Tally the given ballots with a single query grouping identical ballots, each distinct ballot is only decoded once.
+    Returns the [yes, no, abstention] counts per ballot index per election id.
+    """
+    rows = ballots.order_by().values_list('election_id', 'votes').annotate(number=Count('pk'))
+    grouped: Dict[int, List[Tuple[bytes, int]]] = {}
+    for election_id, votes, number in rows:
+        grouped.setdefault(election_id, []).append((votes, number))
+    return {election_id: tally_ballots(election_ballots) for election_id, election_ballots in grouped.items()}
+
+
+def count_results(results: 'models.QuerySet[ElectionResult]') -> Dict[int, Dict[int, List[int]]]:
+    """
+    The frozen results of archived elections, in the format of `count_ballots`.
+    """
+    counts: Dict[int, Dict[int, List[int]]] = {}
+    rows = results.values_list('election_id', 'application__ballot_index', 'votes_accept', 'votes_reject',
+                               'votes_abstention')
+    for election_id, ballot_index, *votes in rows:
+        counts.setdefault(election_id, {})[ballot_index] = votes
+    return counts
+
+
+def set_vote_counts(applications: Iterable['Application'], counts: Dict[int, List[int]]) -> List['Application']:
+    """
+    Set `votes_accept`, `votes_reject` and `votes_abstention` on the applications of one election
+    and return them ordered by the number of yes votes.
+    """
+    applications = list(applications)
+    for application in applications:
+        application.votes_accept, application.votes_reject, application.votes_abstention = \
+            counts.get(application.ballot_index, (0, 0, 0))
+    return sorted(applications, key=lambda application: -application.votes_accept)
+
+
+def mark_elected(applications: Iterable['Application'], max_votes_yes: Optional[int]) -> List['Application']:
+    """
+    Set the `elected` attribute on the annotated applications of one election, which have to be ordered by the
+    number of yes votes. An applicant is elected if they have more yes than no votes and are within the
+    `max_votes_yes` applicants with the most yes votes. Without `max_votes_yes` `elected` is None.
+    """
+    applications = list(applications)
+    nr_elected = 0
+    for application in applications:
+        if max_votes_yes is None:
+            application.elected = None
+        elif application.votes_accept > application.votes_reject and nr_elected < max_votes_yes:
+            application.elected = True
+            nr_elected += 1
+        else:
+            application.elected = False
+    return applications
+
+
 class Enc32:
     alphabet = "0123456789abcdefghjknpqrstuvwxyz"
     dec_map = {}
@@ -81,6 +135,29 @@ class Session(models.Model):
     start_date = models.DateTimeField(blank=True, null=True)
     invite_text = models.TextField(max_length=8000, blank=True, null=True)
     spectator_token = models.UUIDField(unique=True, null=True, blank=True)
+    # incremented together with every change of the session, its elections, applications and voters,
+    # the pages of the session are conditional on it, see vote.revisions
+    revision = models.PositiveBigIntegerField(default=0, editable=False)
+    # set when the results were frozen and the ballots and access codes purged, see vote.archive
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    @property
+    def archived(self):
+        return self.archived_at is not None
+
+    @classmethod
+    def bump_revisions(cls, **lookups):
+        cls.objects.filter(**lookups).update(revision=F('revision') + 1)
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if not self._state.adding:
+            # increment in the database, a concurrent bump must not be overwritten with the revision loaded here
+            self.revision = F('revision') + 1
+            if update_fields is not None:
+                update_fields = {*update_fields, 'revision'}
+        super().save(force_insert, force_update, using, update_fields)
+        if not isinstance(self.revision, int):
+            self.refresh_from_db(using=using, fields=['revision'])
 
     def create_spectator_token(self):
         myid = uuid.uuid4()
@@ -103,6 +180,10 @@ class Election(models.Model):
     send_emails_on_start = models.BooleanField(default=False)
     remind_text = models.TextField(max_length=8000, blank=True, null=True)
     remind_text_sent = models.BooleanField(default=False)
+    # every participant of the session may vote, except the ones listed here
+    excluded_voters = models.ManyToManyField('Voter', related_name='excluded_elections', blank=True)
+    # number of ballots cast, set when the ballots were moved to the BallotArchive, see vote.archive
+    archived_ballots = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     @property
     def started(self):
@@ -118,8 +199,16 @@ class Election(models.Model):
 
         return False
 
+    @property
+    def archived(self):
+        # the results are frozen, the election can not be changed anymore, see vote.archive
+        return self.archived_ballots is not None
+
     @property
     def is_open(self):
+        if self.archived:
+            return False
+
         if self.start_date and self.end_date:
             return self.start_date <= timezone.now() < self.end_date
 
@@ -130,41 +219,52 @@ class Election(models.Model):
 
     @property
     def can_apply(self):
+        if self.archived:
+            return False
+
         if self.start_date:
             return timezone.now() < self.start_date
 
         return True
 
     @property
-    def election_summary(self):
+    def election_summary(self) -> List['Application']:
         if not self.closed:
-            return self.objects.none()
-
-        votes_accept = Count('votes', filter=Q(votes__vote=VOTE_ACCEPT))
-        votes_reject = Count('votes', filter=Q(votes__vote=VOTE_REJECT))
-        votes_abstention = Count('votes', filter=Q(votes__vote=VOTE_ABSTENTION))
+            return []
 
-        applications = Application.objects.filter(election_id=self.pk).annotate(
-            votes_accept=votes_accept,
-            votes_reject=votes_reject,
-            votes_abstention=votes_abstention
-        ).order_by('-votes_accept')
+        if self.archived:
+            counts = count_results(ElectionResult.objects.filter(election_id=self.pk)).get(self.pk, {})
+        else:
+            counts = count_ballots(Ballot.objects.filter(election_id=self.pk)).get(self.pk, {})
+        return set_vote_counts(self.applications.order_by('pk'), counts)
 
-        return applications
+    @cached_property
+    def results(self) -> List['Application']:
+        return mark_elected(self.election_summary, self.max_votes_yes)
 
     def number_voters(self):
         return self.session.participants.count()
 
+    def eligible_voters(self) -> 'models.QuerySet[Voter]':
+        """
+        Participants of the session who are not excluded from this election and have not cast their ballot yet.
+        """
+        return self.session.participants.exclude(excluded_elections=self).exclude(ballots_cast__election=self)
+
     def number_votes_open(self):
-        return self.open_votes.count()
+        if self.archived:
+            return 0
+        return self.eligible_voters().count()
 
     def number_votes_cast(self):
-        if self.applications.all().count() == 0:
-            return 0
-        return int(self.votes.count() / self.applications.all().count())
+        if self.archived:
+            return self.archived_ballots
+        return self.ballots.count()
 
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
-        super().save(force_insert, force_update, using, update_fields)
+        with transaction.atomic(using=using):
+            super().save(force_insert, force_update, using, update_fields)
+            Session.bump_revisions(pk=self.session_id)
         # notify users to reload their page
         group = "Session-" + str(self.session.pk)
         async_to_sync(get_channel_layer().group_send)(
@@ -194,6 +294,10 @@ class Voter(models.Model):
 
     class Meta:
         unique_together = ('session', 'email')
+        indexes = [
+            # keyset pagination of the roster, see vote.selectors.voter_roster
+            models.Index(fields=('session', 'voter_id'), name='vote_voter_roster_idx'),
+        ]
 
     def __str__(self):
         if self.email:
@@ -202,12 +306,29 @@ class Voter(models.Model):
             return self.name
         return f'anonymous-{self.pk}'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._shown = self._shown_fields()
+
+    def _shown_fields(self):
+        # the fields shown on the pages conditional on the session revision, see vote.revisions
+        return self.session_id, self.name, self.email
+
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
         if update_fields == ['last_login']:
             return
 
-        super().save(force_insert, force_update, using, update_fields)
+        # e.g. logging in or a new access code does not change the pages of the session
+        shown_changed = self._state.adding or (self._shown_fields() != self._shown and (
+            update_fields is None or bool({'session', 'session_id', 'name', 'email'} & set(update_fields))))
+        if shown_changed:
+            with transaction.atomic(using=using):
+                super().save(force_insert, force_update, using, update_fields)
+                Session.bump_revisions(pk=self.session_id)
+        else:
+            super().save(force_insert, force_update, using, update_fields)
+        self._shown = self._shown_fields()
         if self._password is not None:
             password_validation.password_changed(self._password, self)
             self._password = None
@@ -289,7 +410,7 @@ class Voter(models.Model):
         return self.has_usable_password()
 
     def can_vote(self, election: Election):
-        return election.is_open and OpenVote.objects.filter(voter_id=self.voter_id, election_id=election.id).exists()
+        return election.is_open and election.eligible_voters().filter(pk=self.pk).exists()
 
     def has_applied(self, election: Election):
         return self.applications.filter(election=election).exists()
@@ -327,7 +448,8 @@ class Voter(models.Model):
 
         Voter.send_invitation(test_voter, "mock-up-access-token", from_email)
 
-    def send_invitation(self, access_code: str, from_email: str) -> Tuple[Optional['Voter'], Optional[str]]:
+    def send_invitation(self, access_code: str, from_email: str,
+                        connection=None) -> Tuple[Optional['Voter'], Optional[str]]:
         if not self.email:
             return None, None
         subject = f'Invitation for {self.session.title}'
@@ -366,7 +488,8 @@ class Voter(models.Model):
             message=strip_tags(body_html),
             from_email=from_email,
             html_message=body_html.replace('\n', '<br/>'),
-            fail_silently=False
+            fail_silently=False,
+            connection=connection,
         )
 
     def send_reminder(self, from_email: str, election):
@@ -437,12 +560,6 @@ class Voter(models.Model):
         )
         password = voter.set_password()
         voter.save()
-
-        # add open elections from the session where the user was added
-        open_votes = [OpenVote(election=election, voter=voter) for election in session.elections.all()
-                      if not election.closed]
-        OpenVote.objects.bulk_create(open_votes)
-
         return voter, cls.get_access_code(voter.voter_id, password)
 
     def new_access_token(self):
@@ -464,11 +581,13 @@ class Application(models.Model):
     display_name = models.CharField(max_length=256)
     email = models.EmailField(null=True, blank=True)
     voter = models.ForeignKey(Voter, related_name="applications", null=True, blank=True, on_delete=models.CASCADE)
+    # position of this application's vote in the packed ballots of the election, see vote.ballots
+    ballot_index = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     _old_avatar = None
 
     class Meta:
-        unique_together = ('voter', 'election')
+        unique_together = (('voter', 'election'), ('election', 'ballot_index'))
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -482,6 +601,11 @@ class Application(models.Model):
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
+        if self.ballot_index is None:
+            last_index = Application.objects.filter(election_id=self.election_id).aggregate(
+                Max('ballot_index'))['ballot_index__max']
+            self.ballot_index = 0 if last_index is None else last_index + 1
+
         if self.avatar and self._old_avatar != self.avatar:
             # remove old file
             if self._old_avatar and os.path.isfile(self._old_avatar.path):
@@ -490,47 +614,70 @@ class Application(models.Model):
                 if path.startswith(os.path.join(settings.MEDIA_ROOT, 'avatars')):
                     os.remove(path)
 
-            max_width = 100
-            max_height = 100
-            img = Image.open(self.avatar)
-
-            # remove alpha channel
-            if img.mode in ('RGBA', 'LA'):
-                background = Image.new(img.mode[:-1], img.size, '#FFF')
-                background.paste(img, img.split()[-1])
-                img = background
-
-            # resize
-            width = max_width
-            width_percent = (width / float(img.size[0]))
-            height = int((float(img.size[1]) * float(width_percent)))
-            if height > max_height:
-                height = max_height
-                height_percent = (height / float(img.size[1]))
-                width = int((float(img.size[0]) * float(height_percent)))
-            img = img.resize((width, height), PIL.Image.ANTIALIAS)
-
-            output = BytesIO()
-            img.save(output, format='JPEG', quality=95)
-            output.seek(0)
+            output = BytesIO(process_avatar(self.avatar))
             self.avatar = InMemoryUploadedFile(output, 'ImageField', '%s.jpg' % self.avatar.name.split('.')[0],
                                                'image/jpeg', sys.getsizeof(output), None)
             self._old_avatar = self.avatar
 
-        super().save(force_insert, force_update, using, update_fields)
-
+        with transaction.atomic(using=using):
+            super().save(force_insert, force_update, using, update_fields)
+            Session.bump_revisions(elections=self.election_id)
 
-class OpenVote(models.Model):
-    election = models.ForeignKey(Election, related_name='open_votes', on_delete=models.CASCADE)
-    voter = models.ForeignKey(Voter, related_name='open_votes', on_delete=models.CASCADE)
 
-    def can_vote(self, voter_id, election_id):
-        return self.objects.filter(voter_id=voter_id, election_id=election_id).exists()
+class BallotCast(models.Model):
+    """
+    Records that a voter has cast their ballot in an election, without linking the voter to the ballot.
+    """
+    # random like Ballot.id, sequential ids would record the order in which the voters voted
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    election = models.ForeignKey(Election, related_name='ballots_cast', on_delete=models.CASCADE)
+    voter = models.ForeignKey(Voter, related_name='ballots_cast', on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            # prevents double voting and serves the (voter, election) lookup of Election.eligible_voters
+            models.UniqueConstraint(fields=('voter', 'election'), name='vote_ballotcast_unique'),
+        ]
+
+
+class Ballot(models.Model):
+    """
+    A ballot, without any reference to the voter. Ballot and BallotCast have random ids, so the ballot can not be
+    matched to its BallotCast by the ids. The physical order of the rows still follows the order of insertion (the
+    implicit rowid on SQLite, the heap order on PostgreSQL), so whoever can read the database files can still line
+    up the ballots with the BallotCast records in the order they were written. Group commit (BALLOT_GROUP_COMMIT)
+    shuffles the ballots of each batch, and vote.archive replaces both by a sorted BallotArchive.
+    """
+    # random, sequential ids would follow the ids of the BallotCast records written in the same transaction
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    election = models.ForeignKey(Election, related_name='ballots', on_delete=models.CASCADE)
+    # one 2 bit vote code per application, indexed by Application.ballot_index, see vote.ballots
+    votes = models.BinaryField()
 
-class Vote(models.Model):
-    election = models.ForeignKey(Election, related_name='votes', on_delete=models.CASCADE)
-    candidate = models.ForeignKey(Application, related_name='votes', on_delete=models.CASCADE)
-    vote = models.CharField(choices=VOTE_CHOICES, max_length=max(len(x[0]) for x in VOTE_CHOICES))
-    # save method is not called on bulk_create in forms.VoteForm.
-    # The model update listener for websockets is implemented in the form.
+    class Meta:
+        indexes = [
+            # covers the tally in count_ballots, which groups the ballots of an election by their content
+            models.Index(fields=('election', 'votes'), name='vote_ballot_tally_idx'),
+        ]
+
+
+class ElectionResult(models.Model):
+    """
+    Final counts of an application, frozen when its election was archived.
+    """
+    application = models.OneToOneField(Application, related_name='result', primary_key=True, on_delete=models.CASCADE)
+    election = models.ForeignKey(Election, related_name='final_results', on_delete=models.CASCADE)
+    votes_accept = models.PositiveIntegerField()
+    votes_reject = models.PositiveIntegerField()
+    votes_abstention = models.PositiveIntegerField()
+
+
+class BallotArchive(models.Model):
+    """
+    The ballots of an archived election in one row: the packed ballots, padded to `width` bytes, sorted and
+    concatenated, zlib compressed.
+    """
+    election = models.OneToOneField(Election, related_name='ballot_archive', primary_key=True,
+                                    on_delete=models.CASCADE)
+    width = models.PositiveIntegerField()
+    data = models.BinaryField()
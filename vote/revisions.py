@@ -0,0 +1,74 @@
+"""
+Conditional GET for the pages of a session. `Session.revision` is incremented in the same transaction as every change
+of the session, its elections, applications and voters (see the `save` methods and the receivers below), so the
+ETag of a page can be computed from a few cheap lookups instead of running its selectors and template. Views use it
+with Django's `condition` decorator and `Cache-Control: no-cache`, so browsers revalidate the pages (also the reloads
+of reload.js) and get 304 Not Modified while nothing relevant changed.
+"""
+import hashlib
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.contrib import messages
+from django.utils import timezone
+
+from vote.models import Election, Session
+
+UPCOMING, OPEN, CLOSED = 0, 1, 2
+
+
+def bump_revisions(session_ids: Iterable[int]) -> None:
+    Session.bump_revisions(pk__in=set(session_ids))
+
+
+def election_states(elections: Iterable[Tuple[int, Optional[object], Optional[object]]]) -> Dict[int, int]:
+    """
+    States of (pk, start_date, end_date) elections at this moment. They change with time alone, without a new revision.
+    """
+    now = timezone.now()
+    states = {}
+    for pk, start_date, end_date in elections:
+        if end_date is not None and end_date <= now:
+            states[pk] = CLOSED
+        elif start_date is not None and start_date <= now:
+            states[pk] = OPEN
+        else:
+            states[pk] = UPCOMING
+    return states
+
+
+def session_election_states(session_id: int) -> Dict[int, int]:
+    return election_states(Election.objects.filter(session_id=session_id).values_list('pk', 'start_date', 'end_date'))
+
+
+def page_etag(request, *parts) -> Optional[str]:
+    """
+    ETag of a page of the requesting user made of `parts`, None (no conditional response) for anything but GET and
+    while messages are pending, which are only rendered once.
+    """
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)) > 0:
+        return None
+    user = request.user
+    # the pages embed the CSRF token of their forms
+    key = repr((type(user).__name__, user.pk, request.META.get('CSRF_COOKIE'), *parts))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def session_deleted_child(sender, instance, **kwargs):
+    # elections and voters, rows deleted together with their session update nothing
+    bump_revisions([instance.session_id])
+
+
+def application_deleted(sender, instance, **kwargs):
+    Session.bump_revisions(elections=instance.election_id)
+
+
+def excluded_voters_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    bump_revisions([instance.session_id])
+
+
+def ballot_saved(sender, instance, **kwargs):
+    # tallies are only shown for closed elections, the ballots of open elections only change the turnout
+    if instance.election.closed:
+        bump_revisions([instance.election.session_id])
@@ -1,7 +1,12 @@
+from itertools import groupby
+from operator import attrgetter
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
 from django.db.models import Q
 from django.utils import timezone
 
-from vote.models import Election, Session
+from vote.models import Application, Ballot, Election, ElectionResult, Session, Voter, count_ballots, count_results, \
+    mark_elected, set_vote_counts
 
 
 def upcoming_elections(session: Session):
@@ -29,3 +34,57 @@ def published_elections(session: Session):
 
 def closed_elections(session: Session):
     return _closed_elections(session).filter(result_published=False)
+
+
+def session_results(session: Session) -> Iterator[Tuple[Election, List[Application]]]:
+    """
+    Results of all closed elections of the session (with at least one application), fetched with one query for
+    the applications, one aggregated query for the ballots and one for the frozen results of the archived elections
+    (a session is archived election by election).
+    """
+    now = timezone.now()
+    applications = Application.objects.filter(
+        election__session=session, election__end_date__lte=now
+    ).select_related('election').order_by('election__end_date', 'election_id', 'pk')
+    counts = count_ballots(Ballot.objects.filter(
+        election__session=session, election__end_date__lte=now, election__archived_ballots__isnull=True))
+    counts.update(count_results(ElectionResult.objects.filter(
+        election__session=session, election__archived_ballots__isnull=False)))
+
+    for election, results in groupby(applications, key=attrgetter('election')):
+        yield election, mark_elected(set_vote_counts(results, counts.get(election.pk, {})), election.max_votes_yes)
+
+
+def existing_voter_emails(session: Session, emails: Iterable[str], chunk_size: int = 500) -> Set[str]:
+    """
+    The given email addresses which are already used by a participant of the session, looked up with one `IN`
+    query per `chunk_size` addresses.
+    """
+    emails = list(emails)
+    existing = set()
+    for i in range(0, len(emails), chunk_size):
+        existing.update(session.participants.filter(email__in=emails[i:i + chunk_size]).values_list('email', flat=True))
+    return existing
+
+
+def voter_roster(session: Session, after: Optional[int] = None, limit: int = 100, search: str = '',
+                 logged_in: Optional[bool] = None, invalid_email: Optional[bool] = None,
+                 qr: Optional[bool] = None) -> Tuple[List[Voter], Optional[int]]:
+    """
+    One page of the participants of the session ordered by id, starting after the voter id `after` (keyset
+    pagination). `search` matches name and email, the boolean fields are only filtered on if not None.
+    Returns the voters and the cursor of the next page, None for the last page.
+    """
+    voters = session.participants.order_by('voter_id')
+    if after is not None:
+        voters = voters.filter(voter_id__gt=after)
+    if search:
+        voters = voters.filter(Q(name__icontains=search) | Q(email__icontains=search))
+    for name, value in (('logged_in', logged_in), ('invalid_email', invalid_email), ('qr', qr)):
+        if value is not None:
+            voters = voters.filter(**{name: value})
+
+    page = list(voters[:limit + 1])
+    if len(page) > limit:
+        return page[:limit], page[limit - 1].voter_id
+    return page, None
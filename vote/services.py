@@ -0,0 +1,127 @@
+"""
+Bulk write operations on voters, used by the voter management commands.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils.crypto import get_random_string
+
+from vote.models import Enc32, Session, Voter
+from vote.revisions import bump_revisions
+from vote.turnout import reset_session_turnout
+
+HASH_WORKERS = 4
+BATCH_SIZE = 500
+
+
+def hash_passwords(raw_passwords: Sequence[str], workers: int = HASH_WORKERS) -> List[str]:
+    """
+    Hash the passwords in a thread pool, argon2 releases the GIL while hashing.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(make_password, raw_passwords))
+
+
+def check_access_codes(access_codes: Iterable[str], workers: int = HASH_WORKERS) \
+        -> List[Tuple[str, Optional[Voter]]]:
+    """
+    Look up the voters of the access codes with one query and verify the codes in a thread pool.
+    The voter is None for codes which are malformed, unknown or do not match.
+    """
+    codes = [(code, *Voter.split_access_code(code)) for code in access_codes]
+    voters = Voter.objects.select_related('session').in_bulk(
+        {voter_id for _, voter_id, _ in codes if voter_id is not None})
+
+    def check(code):
+        access_code, voter_id, password = code
+        voter = voters.get(voter_id)
+        if voter is None or not check_password(password, voter.password):
+            return access_code, None
+        return access_code, voter
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(check, codes))
+
+
+def _reload_voters(session_ids: Iterable[int]):
+    # bulk updates do not go through Voter.save, notify the managers once per session instead of once per voter
+    for session_id in set(session_ids):
+        async_to_sync(get_channel_layer().group_send)(
+            "Login-Session-" + str(session_id),
+            {'type': 'send_reload', 'id': '#voterCard'}
+        )
+
+
+def create_voters(session: Session, rows: Sequence[Tuple[Optional[str], Optional[str]]],
+                  workers: int = HASH_WORKERS, batch_size: int = BATCH_SIZE) -> List[Tuple[Voter, str]]:
+    """
+    Create a voter per (email, name) row with one bulk insert. Returns the voters with their access codes.
+    """
+    raw_passwords = [get_random_string(length=20, allowed_chars=Enc32.alphabet) for _ in rows]
+    voters = [
+        Voter(session=session, email=email, name=name, password=password)
+        for (email, name), password in zip(rows, hash_passwords(raw_passwords, workers))
+    ]
+    with transaction.atomic():
+        voters = Voter.objects.bulk_create(voters, batch_size=batch_size)
+        bump_revisions([session.pk])
+    reset_session_turnout(session.pk)
+    _reload_voters([session.pk])
+    return [(voter, Voter.get_access_code(voter.voter_id, password)) for voter, password in zip(voters, raw_passwords)]
+
+
+def reset_voters(voters: Sequence[Voter], workers: int = HASH_WORKERS,
+                 batch_size: int = BATCH_SIZE) -> List[Tuple[Voter, str]]:
+    """
+    Assign new access codes to the voters and log them out. Returns the voters with their new access codes.
+    """
+    raw_passwords = [get_random_string(length=20, allowed_chars=Enc32.alphabet) for _ in voters]
+    for voter, password in zip(voters, hash_passwords(raw_passwords, workers)):
+        voter.password = password
+        voter.logged_in = False
+    with transaction.atomic():
+        Voter.objects.bulk_update(voters, ['password', 'logged_in'], batch_size=batch_size)
+        bump_revisions(voter.session_id for voter in voters)
+    _reload_voters(voter.session_id for voter in voters)
+    return [(voter, Voter.get_access_code(voter.voter_id, password)) for voter, password in zip(voters, raw_passwords)]
+
+
+def revoke_voters(voters: Sequence[Voter], batch_size: int = BATCH_SIZE) -> None:
+    """
+    Make the access codes of the voters unusable and log them out.
+    """
+    for voter in voters:
+        voter.set_unusable_password()
+        voter.logged_in = False
+    with transaction.atomic():
+        Voter.objects.bulk_update(voters, ['password', 'logged_in'], batch_size=batch_size)
+        bump_revisions(voter.session_id for voter in voters)
+    _reload_voters(voter.session_id for voter in voters)
+
+
+def send_invitations(voters_codes: Iterable[Tuple[Voter, str]]) -> List[Tuple[Voter, Optional[str]]]:
+    """
+    Send the invitations over one mail server connection and flag the email addresses which failed as invalid.
+    Returns the voters with the error message of their invitation, None if it was sent (or the voter has no email
+    address).
+    """
+    results = []
+    senders = {}
+    with get_connection() as connection:
+        for voter, access_code in voters_codes:
+            if voter.session_id not in senders:
+                manager = voter.session.managers.all().first()
+                senders[voter.session_id] = manager.sender_email if manager else getattr(settings, 'EMAIL_SENDER', None)
+            _, error = voter.send_invitation(access_code, senders[voter.session_id], connection=connection)
+            results.append((voter, error))
+
+    failed = [voter.voter_id for voter, error in results if error]
+    if failed:
+        Voter.objects.filter(voter_id__in=failed).update(invalid_email=True)
+    return results
@@ -1,17 +1,26 @@
 $(document).ready(() => {
   let timeout;
 
-  function reload_callback() {
+  function reload_callback(reload_id) {
     setup_date_reload();
+    // lets page scripts initialize the reloaded content
+    $(document).trigger('wahlfang:reloaded', [reload_id]);
   }
 
   function open(link){
     window.open(link,"_self")
   }
 
+  function update_turnout(delta) {
+    for (const [name, value] of Object.entries(delta)) {
+      const cell = $("#turnout-" + name);
+      cell.text(parseInt(cell.text()) + value);
+    }
+  }
+
   function reload(reload_id="#content") {
     console.log("Reloading " + reload_id)
-    $(reload_id).load(location.pathname + " " + reload_id, reload_callback)
+    $(reload_id).load(location.pathname + " " + reload_id, () => reload_callback(reload_id))
   }
 
   function setup_date_reload() {
@@ -47,6 +56,8 @@ $(document).ready(() => {
         succ_div.toggleClass('hide');
       }else if(message.open){
         open(message.open);
+      }else if(message.turnout){
+        update_turnout(message.turnout);
       }
     }
     ws.onopen = function (e) {
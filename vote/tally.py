@@ -0,0 +1,56 @@
+from itertools import islice
+from typing import Dict, Tuple
+
+from vote.archive import archived_ballots
+from vote.models import Ballot, Election
+
+Tally = Dict[int, Tuple[int, int, int]]
+
+
+def _numpy():
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise ImportError('the recount engine requires numpy, install wahlfang with the "audit" extra') from e
+    return numpy
+
+
+def recount(election: Election, chunk_size: int = 50000) -> Tally:
+    """
+    Count the votes of the election independently of the aggregation used by `Election.election_summary`.
+    The packed ballots are streamed through a server side cursor in chunks of `chunk_size` and decoded with
+    numpy, so memory usage does not depend on the number of ballots. The ballots of an archived election are read
+    from its BallotArchive. Returns (yes, no, abstention) per application id.
+    """
+    np = _numpy()
+    applications = dict(election.applications.values_list('ballot_index', 'pk'))
+    nr_positions = max(applications, default=-1) + 1
+    width = (nr_positions + 3) // 4
+    # one bin per (ballot index, vote code), see vote.ballots.VOTE_CODES
+    offsets = np.arange(nr_positions, dtype=np.int64) * 4
+    shifts = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+    counts = np.zeros(nr_positions * 4, dtype=np.int64)
+    if election.archived_ballots is None:
+        rows = Ballot.objects.filter(election=election).values_list('votes', flat=True).iterator(chunk_size=chunk_size)
+    else:
+        rows = archived_ballots(election.ballot_archive)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        packed = np.frombuffer(
+            b''.join(bytes(votes)[:width].ljust(width, b'\0') for votes in chunk), dtype=np.uint8
+        ).reshape(len(chunk), width)
+        codes = ((packed[:, :, None] >> shifts) & 0b11).reshape(len(chunk), width * 4)[:, :nr_positions]
+        counts += np.bincount((codes + offsets).ravel(), minlength=nr_positions * 4)
+
+    counts = counts.reshape(nr_positions, 4)
+    return {pk: (int(counts[idx, 1]), int(counts[idx, 2]), int(counts[idx, 3])) for idx, pk in applications.items()}
+
+
+def summary_tally(election: Election) -> Tally:
+    return {
+        application.pk: (application.votes_accept, application.votes_reject, application.votes_abstention)
+        for application in election.election_summary
+    }
@@ -11,7 +11,16 @@ def applicant_name(application):
 
 
 @register.filter
-def shuffle(items):
+def shuffle(items, seed=None):
+    """
+    Random order of the items. With a seed (e.g. the voter) the order of the same model instances is stable, so the
+    rendered list can be cached.
+    """
     items = list(items)[:]
-    random.shuffle(items)
+    if seed is None:
+        random.shuffle(items)
+        return items
+
+    items.sort(key=lambda item: item.pk)
+    random.Random(f'{seed}:{",".join(str(item.pk) for item in items)}').shuffle(items)
     return items
@@ -1,11 +1,63 @@
+import asyncio
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from argparse import Namespace
 from datetime import timedelta, datetime
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-from django.test import TestCase
+from asgiref.sync import iscoroutinefunction
+from asgiref.testing import ApplicationCommunicator
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, router, transaction
+from django.db.utils import ConnectionHandler
+from django.db.models import Count
+from django.template import engines
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
 from django.utils import timezone
 from freezegun import freeze_time
+from PIL import Image
+from prometheus_client import REGISTRY
 
-from vote.models import Election, Enc32, Voter, Session
-from vote.selectors import closed_elections, open_elections, published_elections, upcoming_elections
+from management.consumers import ElectionConsumer
+from management.models import ElectionManager
+from management.forms import AVATAR_WORKERS, AddVotersForm, ApplicationImportForm, CSVUploaderForm, get_avatar_pool
+from management.export import stream_csv, stream_jsonl, stream_zip
+import vote.urls
+import wahlfang.urls
+from vote import intake
+from vote.archive import archivable_sessions, archive_election, archive_session
+from vote.fragments import election_versions
+from vote.ballots import pack_ballot, unpack_ballot
+from vote.forms import VoteForm
+from vote.models import Application, Ballot, BallotCast, Election, Enc32, Voter, Session, VOTE_ACCEPT, VOTE_REJECT, \
+    VOTE_ABSTENTION
+from vote.selectors import closed_elections, open_elections, published_elections, upcoming_elections, \
+    session_results, voter_roster
+from vote.tally import recount, summary_tally
+from vote.templatetags.vote_extras import shuffle
+from vote.turnout import get_turnout, record_ballot
+from wahlfang.metrics import track_queries
+from wahlfang.profiling import profile_block
+from wahlfang.routers import STICKY_COOKIE, use_replica
+from wahlfang.startup import profile_startup
+from wahlfang.warmup import LifespanApplication, warm_databases, warm_up
 
 
 class Enc32TestCase(TestCase):
@@ -26,6 +78,654 @@ class VoterTestCase(TestCase):
             self.assertEqual(raw_password, ret_password)
 
 
+class BallotTestCase(TestCase):
+    def test_packing(self):
+        votes = {0: VOTE_ACCEPT, 1: VOTE_REJECT, 5: VOTE_ABSTENTION, 29: VOTE_ACCEPT}
+        packed = pack_ballot(votes)
+        self.assertEqual(len(packed), 8)
+        self.assertEqual(unpack_ballot(packed), votes)
+
+    def test_secrecy(self):
+        session = Session.objects.create(title='TEST')
+        election = Election.objects.create(session=session, title='board', start_date=timezone.now())
+        application = Application.objects.create(election=election, display_name='alice')
+        for i in range(5):
+            voter, _ = Voter.from_data(session, email=f'voter{i}@example.org')
+            form = VoteForm(Namespace(user=voter), election, data={str(application.pk): VOTE_ACCEPT})
+            self.assertTrue(form.is_valid(), form.errors)
+            form.save()
+
+        self.assertEqual(BallotCast.objects.filter(election=election).count(), 5)
+        # nothing but random ids, neither the ballots nor the casts record the order of the votes by their ids
+        self.assertEqual({field.name for field in Ballot._meta.fields}, {'id', 'election', 'votes'})
+        for model in (Ballot, BallotCast):
+            self.assertTrue(all(isinstance(pk, uuid.UUID) and pk.version == 4
+                                for pk in model.objects.filter(election=election).values_list('pk', flat=True)))
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    The hot queries of the voting path have to be served by their indexes.
+    """
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # the test tables are tiny, make the planner show the index it would use for a large table
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_ballot_cast_lookup(self):
+        # like Election.eligible_voters and the group commit, which select no more than the indexed columns
+        plan = BallotCast.objects.filter(voter_id=1, election_id=1).values_list('voter_id', 'election_id').explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn('COVERING INDEX', plan)
+            self.assertIn('(voter_id=? AND election_id=?)', plan)
+        else:
+            self.assertIn('vote_ballotcast_unique', plan)
+
+    def test_ballot_tally(self):
+        plan = Ballot.objects.filter(election_id=1).order_by().values_list('election_id', 'votes').annotate(
+            number=Count('pk')).explain()
+        self.assertIn('vote_ballot_tally_idx', plan)
+
+
+class EligibilityTestCase(TestCase):
+    def test_eligible_voters(self):
+        session = Session.objects.create(title='TEST')
+        election = Election.objects.create(session=session, title='motion',
+                                           start_date=timezone.now() - timedelta(hours=1))
+        alice, bob, carol = (Voter.from_data(session, email=f'{name}@example.org')[0]
+                             for name in ('alice', 'bob', 'carol'))
+        self.assertEqual(election.number_votes_open(), 3)
+
+        election.excluded_voters.add(carol)
+        BallotCast.objects.create(election=election, voter=bob)
+        self.assertEqual(list(election.eligible_voters()), [alice])
+        self.assertEqual([v.can_vote(election) for v in (alice, bob, carol)], [True, False, False])
+
+
+class GroupCommitTestCase(TransactionTestCase):
+    def setUp(self):
+        self.session = Session.objects.create(title='TEST')
+        self.election = Election.objects.create(session=self.session, title='motion',
+                                                start_date=timezone.now() - timedelta(hours=1))
+        self.voters = [Voter.from_data(self.session, email=f'voter{i}@example.org')[0] for i in range(3)]
+        self.votes = pack_ballot({0: VOTE_ACCEPT})
+
+    def test_batch(self):
+        BallotCast.objects.create(election=self.election, voter=self.voters[2])
+        batch = [intake.PendingBallot(self.election.pk, voter.pk, self.votes)
+                 for voter in (self.voters[0], self.voters[1], self.voters[1], self.voters[2])]
+        with self.assertNumQueries(5):
+            intake.BallotWriter(max_batch=10, max_delay=0).commit(batch)
+        self.assertEqual([pending.stored for pending in batch], [True, True, False, False])
+        self.assertEqual(Ballot.objects.filter(election=self.election).count(), 2)
+
+    @override_settings(BALLOT_GROUP_COMMIT_MAX_DELAY=50)
+    def test_concurrent_submit(self):
+        results = []
+
+        def submit(voter):
+            results.append(intake.submit(self.election.pk, voter.pk, self.votes))
+
+        threads = [threading.Thread(target=submit, args=(voter,)) for voter in self.voters + self.voters[:1]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(BallotCast.objects.filter(election=self.election).count(), 3)
+        self.assertEqual(Ballot.objects.filter(election=self.election).count(), 3)
+        # the second ballot of the first voter is rejected
+        self.assertEqual(sorted(results), [False, True, True, True])
+
+    def test_connection_error(self):
+        errors = [OperationalError('server closed the connection')]
+
+        def close_old_connections():
+            if errors:
+                raise errors.pop()
+
+        with mock.patch('vote.intake.close_old_connections', close_old_connections):
+            with self.assertRaises(OperationalError), self.assertLogs('vote.intake', level='ERROR'):
+                intake.submit(self.election.pk, self.voters[0].pk, self.votes)
+            # the writer survived and stores the next batch
+            self.assertTrue(intake.submit(self.election.pk, self.voters[0].pk, self.votes))
+
+    @override_settings(BALLOT_GROUP_COMMIT_TIMEOUT=0.1)
+    def test_timeout(self):
+        class StalledWriter(intake.BallotWriter):
+            def run(self):
+                release.wait()
+
+        release = threading.Event()
+        writer = StalledWriter(max_batch=10, max_delay=0)
+        writer.start()
+        intake._writer = writer  # pylint: disable=W0212
+        try:
+            with self.assertRaises(TimeoutError):
+                intake.submit(self.election.pk, self.voters[0].pk, self.votes)
+        finally:
+            release.set()
+            writer.join()
+
+
+class FragmentCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session = Session.objects.create(title='TEST')
+        self.election = Election.objects.create(session=self.session, title='board')
+        for name in ('Alice', 'Bob', 'Carol'):
+            Application.objects.create(election=self.election, display_name=name)
+        self.voter, _ = Voter.from_data(self.session, email='voter@example.org')
+        self.client.force_login(self.voter, backend='vote.authentication.AccessCodeBackend')
+
+    def test_seeded_shuffle(self):
+        applications = list(self.election.applications.all())
+        self.assertEqual(shuffle(applications, 1), shuffle(applications[::-1], 1))
+        self.assertCountEqual(shuffle(applications, 1), applications)
+
+    def test_cached_card(self):
+        response = self.client.get(reverse('vote:index'))
+        self.assertContains(response, 'Carol')
+        with self.assertNumQueries(11) as queries:
+            self.client.get(reverse('vote:index'))
+        # the applications are not fetched for the cached card
+        self.assertFalse([q for q in queries.captured_queries if 'display_name' in q['sql']])
+
+        # a new application bumps the version of the election
+        Application.objects.create(election=self.election, display_name='Dave')
+        self.assertContains(self.client.get(reverse('vote:index')), 'Dave')
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.session = Session.objects.create(title='TEST')
+        self.election = Election.objects.create(session=self.session, title='board',
+                                                start_date=timezone.now() - timedelta(hours=1))
+        self.voter, _ = Voter.from_data(self.session, email='voter@example.org')
+
+    def test_revision(self):
+        stale = Session.objects.get(pk=self.session.pk)
+        revision = stale.revision
+        Application.objects.create(election=self.election, display_name='Alice')
+        self.election.excluded_voters.add(self.voter)
+        # saving an outdated instance increments the revision in the database instead of overwriting it
+        stale.save()
+        self.assertEqual(stale.revision, revision + 3)
+
+    def test_voter_saves(self):
+        revision = Session.objects.get(pk=self.session.pk).revision
+        # a new access code and the login do not change the pages of the session
+        access_code = self.voter.new_access_token()
+        self.client.get(reverse('vote:link_login', args=[access_code]))
+        self.assertTrue(Voter.objects.get(pk=self.voter.pk).logged_in)
+        self.assertEqual(Session.objects.get(pk=self.session.pk).revision, revision)
+
+        self.voter.name = 'Alice'
+        self.voter.save()
+        self.assertEqual(Session.objects.get(pk=self.session.pk).revision, revision + 1)
+
+    def test_voter_index(self):
+        self.client.force_login(self.voter, backend='vote.authentication.AccessCodeBackend')
+        etag = self.client.get(reverse('vote:index')).headers['ETag']
+        with self.assertNumQueries(5):
+            self.assertEqual(self.client.get(reverse('vote:index'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # casting the ballot changes the page of the voter
+        BallotCast.objects.create(election=self.election, voter=self.voter)
+        self.assertEqual(self.client.get(reverse('vote:index'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_management_pages(self):
+        manager = ElectionManager.objects.create(username='manager')
+        manager.sessions.add(self.session)
+        self.client.force_login(manager, backend='management.authentication.ManagementBackend')
+        for url in (reverse('management:session', args=[self.session.pk]),
+                    reverse('management:election', args=[self.election.pk])):
+            # the first response sets the CSRF cookie, which is part of the ETag
+            self.client.get(url)
+            etag = self.client.get(url).headers['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            Application.objects.create(election=self.election, display_name='Alice')
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(ASYNC_VOTER_VIEWS=True)
+class AsyncVoterViewsTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reload_urls()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.reload_urls()
+
+    @staticmethod
+    def reload_urls():
+        # the voter views are chosen when the urls are imported
+        importlib.reload(vote.urls)
+        importlib.reload(wahlfang.urls)
+        clear_url_caches()
+
+    def setUp(self):
+        self.session = Session.objects.create(title='TEST')
+        self.election = Election.objects.create(session=self.session, title='board',
+                                                start_date=timezone.now() - timedelta(hours=1))
+        self.applications = [Application.objects.create(election=self.election, display_name=name)
+                             for name in ('Alice', 'Bob')]
+        self.voter, self.access_code = Voter.from_data(self.session, email='voter@example.org')
+        self.token = self.session.create_spectator_token()
+
+    async def test_voter_views(self):
+        self.assertTrue(iscoroutinefunction(resolve(reverse('vote:index')).func))
+        response = await self.async_client.get(reverse('vote:link_login', args=[self.access_code]))
+        self.assertRedirects(response, reverse('vote:index'), fetch_redirect_response=False)
+
+        response = await self.async_client.get(reverse('vote:index'))
+        self.assertContains(response, 'Vote Now!')
+        response = await self.async_client.get(reverse('vote:index'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.post(reverse('vote:vote', args=[self.election.pk]), {
+            str(self.applications[0].pk): VOTE_ACCEPT, str(self.applications[1].pk): VOTE_REJECT,
+        })
+        self.assertRedirects(response, reverse('vote:index'), fetch_redirect_response=False)
+        self.assertEqual(await Ballot.objects.filter(election=self.election).acount(), 1)
+        self.assertContains(await self.async_client.get(reverse('vote:index')), 'Thank You For Your Vote!')
+
+    async def test_invalid_code(self):
+        response = await self.async_client.get(reverse('vote:link_login', args=['aaaa-bbbbbb-cccccc']))
+        self.assertRedirects(response, reverse('vote:code_login'), fetch_redirect_response=False)
+
+    async def test_spectator(self):
+        url = reverse('vote:spectator', args=[self.token])
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'board')
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+class SpectatorCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session = Session.objects.create(title='TEST')
+        self.election = Election.objects.create(session=self.session, title='board',
+                                                start_date=timezone.now() + timedelta(hours=1))
+        self.url = reverse('vote:spectator', args=[self.session.create_spectator_token()])
+
+    def test_shared_rendering(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'board')
+        etag = response.headers['ETag']
+        self.assertIn('public', response.headers['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # a change of the election renders the page again
+        self.election.title = 'supervisory board'
+        self.election.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'supervisory board')
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_expires_at_transition(self):
+        self.client.get(self.url)
+        with freeze_time(timezone.now() + timedelta(hours=1, seconds=1)):
+            self.assertContains(self.client.get(self.url), 'Election is currently ongoing')
+
+
+class SQLiteBackendTestCase(TestCase):
+    alias = 'wahlfang_sqlite'
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        connections.settings[self.alias] = ConnectionHandler({'default': {
+            'ENGINE': 'wahlfang.db.sqlite3',
+            'NAME': os.path.join(self.tmp.name, 'db.sqlite3'),
+            'OPTIONS': {'busy_timeout': 200},
+        }}).settings['default']
+
+    def tearDown(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+        del connections.settings[self.alias]
+        self.tmp.cleanup()
+
+    def test_pragmas_and_write_lock(self):
+        db = connections[self.alias]
+        with db.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 200)
+            cursor.execute('CREATE TABLE t (x integer)')
+
+        # a transaction holds the write lock until it ends, writes of other threads time out meanwhile
+        errors = []
+
+        def write():
+            other = ConnectionHandler({'default': connections.settings[self.alias]})['default']
+            try:
+                with other.cursor() as cursor:
+                    cursor.execute('INSERT INTO t VALUES (2)')
+            except OperationalError as e:
+                errors.append(e)
+            finally:
+                other.close()
+
+        with CaptureQueriesContext(db) as queries, transaction.atomic(using=self.alias):
+            self.assertTrue(db.holds_write_lock)
+            with db.cursor() as cursor:
+                cursor.execute('INSERT INTO t VALUES (1)')
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+        self.assertFalse(db.holds_write_lock)
+        self.assertEqual(len(errors), 1)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        with db.cursor() as cursor:
+            self.assertEqual(cursor.execute('SELECT count(*) FROM t').fetchone()[0], 2)
+
+
+@skipUnless(os.environ.get('WAHLFANG_TEST_POSTGRES') and importlib.util.find_spec('psycopg_pool'),
+            'set WAHLFANG_TEST_POSTGRES to the name of a local PostgreSQL database and install psycopg_pool')
+class PostgreSQLPoolTestCase(TestCase):
+    def setUp(self):
+        self.databases_settings = {'default': {
+            'ENGINE': 'wahlfang.db.postgresql',
+            'NAME': os.environ['WAHLFANG_TEST_POSTGRES'],
+            'OPTIONS': {'pool': {'min_size': 1, 'max_size': 2, 'timeout': 0.5}},
+        }}
+
+    def connect(self):
+        return ConnectionHandler(self.databases_settings)['default']
+
+    @staticmethod
+    def backend_pid(db):
+        with db.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_pool(self):
+        first, second, third = self.connect(), self.connect(), self.connect()
+        self.addCleanup(first.close_pool)
+        wait_count = REGISTRY.get_sample_value('wahlfang_db_pool_wait_seconds_count', {'database': 'default'}) or 0
+
+        # a closed connection goes back to the pool and is handed out again
+        pid = self.backend_pid(first)
+        first.close()
+        self.assertEqual(self.backend_pid(second), pid)
+
+        # the pool is bounded, a third connection times out
+        self.backend_pid(first)
+        with self.assertRaises(OperationalError):
+            third.ensure_connection()
+        self.assertEqual(REGISTRY.get_sample_value('wahlfang_db_pool_connections',
+                                                   {'database': 'default', 'state': 'open'}), 2)
+        self.assertEqual(REGISTRY.get_sample_value('wahlfang_db_pool_timeouts_total', {'database': 'default'}), 1)
+        self.assertEqual(REGISTRY.get_sample_value('wahlfang_db_pool_wait_seconds_count', {'database': 'default'}),
+                         wait_count + 4)
+
+        # a connection which broke while it was in the pool is replaced when it is borrowed
+        with first.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+        first.close()
+        second.close()
+        self.assertNotIn(pid, [self.backend_pid(second), self.backend_pid(third)])
+        second.close()
+        third.close()
+
+
+@skipUnless(os.environ.get('WAHLFANG_TEST_POSTGRES') and importlib.util.find_spec('psycopg'),
+            'set WAHLFANG_TEST_POSTGRES to the name of a local PostgreSQL database and install psycopg')
+class PostgresChannelLayerTestCase(TestCase):
+    async def test_group_send_across_processes(self):
+        from wahlfang.layers import PostgresChannelLayer  # pylint: disable=import-outside-toplevel
+
+        # two layer instances behave like the layers of two worker processes
+        conninfo = f'dbname={os.environ["WAHLFANG_TEST_POSTGRES"]}'
+        sender, receiver = PostgresChannelLayer(conninfo=conninfo), PostgresChannelLayer(conninfo=conninfo)
+        channel = await receiver.new_channel()
+        await receiver.group_add('Session-1', channel)
+        receive = asyncio.ensure_future(receiver.receive(channel))
+        await asyncio.to_thread(receiver.listening.wait, 10)
+
+        for idx in range(3):
+            await sender.group_send('Session-1', {'type': 'send_reload', 'id': idx})
+        self.assertEqual(await asyncio.wait_for(receive, 10), {'type': 'send_reload', 'id': 0})
+        for idx in (1, 2):
+            self.assertEqual(await asyncio.wait_for(receiver.receive(channel), 10), {'type': 'send_reload', 'id': idx})
+
+        # messages to the specific channel of another process
+        await sender.send(channel, {'type': 'send_turnout', 'delta': {'cast': 1}})
+        self.assertEqual(await asyncio.wait_for(receiver.receive(channel), 10),
+                         {'type': 'send_turnout', 'delta': {'cast': 1}})
+        await sender.close()
+        await receiver.close()
+
+
+class TurnoutTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session = Session.objects.create(title='TEST')
+        self.election = Election.objects.create(session=self.session, title='motion',
+                                                start_date=timezone.now() - timedelta(hours=1))
+        for name in ('alice', 'bob'):
+            Voter.from_data(self.session, email=f'{name}@example.org')
+
+    def test_counters(self):
+        self.assertEqual(get_turnout(self.election), {'voters': 2, 'cast': 0, 'open': 2})
+        record_ballot(self.election.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_turnout(self.election), {'voters': 2, 'cast': 1, 'open': 1})
+
+        # a new voter drops the counters, they are aggregated again
+        Voter.from_data(self.session, email='carol@example.org')
+        self.assertEqual(get_turnout(self.election), {'voters': 3, 'cast': 0, 'open': 3})
+
+    async def test_consumer_throttling(self):
+        communicator = WebsocketCommunicator(ElectionConsumer.as_asgi(), '/')
+        communicator.scope['url_route'] = {'kwargs': {'pk': str(self.election.pk)}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        for _ in range(3):
+            await get_channel_layer().group_send(f'Election-{self.election.pk}',
+                                                 {'type': 'send_turnout', 'delta': {'cast': 1, 'open': -1}})
+        self.assertEqual(await communicator.receive_json_from(timeout=2), {'turnout': {'cast': 3, 'open': -3}})
+        self.assertTrue(await communicator.receive_nothing(timeout=0.3))
+        await communicator.disconnect()
+
+
+class RosterTestCase(TestCase):
+    def test_pagination(self):
+        session = Session.objects.create(title='TEST')
+        voters = [Voter.from_data(session, email=f'voter{i}@example.org')[0] for i in range(5)]
+        Voter.from_data(Session.objects.create(title='OTHER'), email='voter5@example.org')
+        Voter.objects.filter(pk=voters[3].pk).update(logged_in=True)
+
+        pages, after = [], None
+        while True:
+            page, after = voter_roster(session, after=after, limit=2)
+            pages.append([v.pk for v in page])
+            if after is None:
+                break
+        self.assertEqual(pages, [[v.pk for v in voters[:2]], [v.pk for v in voters[2:4]], [voters[4].pk]])
+
+        self.assertEqual(voter_roster(session, search='VOTER3')[0], [voters[3]])
+        self.assertEqual(voter_roster(session, logged_in=True), ([voters[3]], None))
+        self.assertEqual(len(voter_roster(session, logged_in=False, qr=False)[0]), 4)
+
+
+class VoterImportTestCase(TestCase):
+    def setUp(self):
+        self.session = Session.objects.create(title='TEST')
+        Voter.from_data(self.session, email='alice@example.org')
+
+    def test_csv_import(self):
+        data = 'name,email\nAlice,alice@EXAMPLE.org\nBob,bob@example.org\nBob,bob@Example.org\nEve,eve@\nAnon,\n'
+        form = CSVUploaderForm(self.session, data={}, files={
+            'csv_data': SimpleUploadedFile('voters.csv', data.encode('utf-8'))})
+        with self.assertNumQueries(1):
+            self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['csv_data'], [
+            'Line 2: a voter with email address alice@example.org already exists',
+            'Line 4: duplicate email address bob@example.org, already in line 3',
+            'Line 5: eve@ is not a valid email address',
+        ])
+
+        form = CSVUploaderForm(self.session, data={}, files={
+            'csv_data': SimpleUploadedFile('voters.csv', b'name,email\nBob,bob@Example.ORG\nAnon,\nAnon,\n')})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['csv_data'], [('bob@example.org', 'Bob'), (None, 'Anon'), (None, 'Anon')])
+
+    def test_email_list(self):
+        form = AddVotersForm(self.session, data={'voters_list': 'bob@example.org\n\nalice@example.org\n'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['voters_list'],
+                         ['Line 3: a voter with email address alice@example.org already exists'])
+
+
+class ApplicationImportTestCase(TestCase):
+    @staticmethod
+    def archive(manifest, images=()):
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w') as archive:
+            archive.writestr('applications.csv', manifest)
+            for name in images:
+                image = BytesIO()
+                Image.new('RGBA', (300, 200), '#f00').save(image, format='PNG')
+                archive.writestr(name, image.getvalue())
+            archive.writestr('broken.png', b'no image')
+        return SimpleUploadedFile('applications.zip', output.getvalue())
+
+    def setUp(self):
+        self.election = Election.objects.create(session=Session.objects.create(title='TEST'), title='board')
+        Application.objects.create(election=self.election, display_name='alice')
+
+    def test_invalid(self):
+        manifest = 'display_name,email,text,avatar\n,,,\nbob,bob@,,\ncarol,,,missing.png\n'
+        form = ApplicationImportForm(self.election, data={}, files={'archive': self.archive(manifest)})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['archive'], [
+            'Line 2: the display name is missing',
+            'Line 3: bob@ is not a valid email address',
+            'Line 4: missing.png is not in the archive',
+        ])
+
+        form = ApplicationImportForm(self.election, data={}, files={
+            'archive': self.archive('display_name,avatar\nbob,broken.png\n')})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['archive'], ['Line 2: broken.png is not a valid image'])
+
+    def test_avatars_read_last(self):
+        # the avatars are not read from an invalid archive
+        with mock.patch.object(zipfile.ZipFile, 'read') as read:
+            form = ApplicationImportForm(self.election, data={}, files={
+                'archive': self.archive('display_name,avatar\n,bob.png\n', images=('bob.png',))})
+            self.assertEqual(form.errors['archive'], ['Line 2: the display name is missing'])
+
+            with mock.patch.object(ApplicationImportForm, 'MAX_ARCHIVE_SIZE', 100):
+                form = ApplicationImportForm(self.election, data={}, files={
+                    'archive': self.archive('display_name,avatar\nbob,bob.png\ncarol,carol.png\n',
+                                            images=('bob.png', 'carol.png'))})
+                self.assertFalse(form.is_valid())
+                self.assertIn('in total', form.errors['archive'][0])
+        read.assert_not_called()
+        self.assertLessEqual(get_avatar_pool()._max_workers, AVATAR_WORKERS)  # pylint: disable=W0212
+
+    def test_import(self):
+        manifest = 'display_name,email,text,avatar\nbob,bob@example.org,,bob.png\ncarol,,hello,carol.png\ndave,,,\n'
+        form = ApplicationImportForm(self.election, data={}, files={
+            'archive': self.archive(manifest, images=('bob.png', 'carol.png'))})
+        self.assertTrue(form.is_valid(), form.errors)
+        # the worker processes are shared by the imports
+        self.assertIs(get_avatar_pool(), get_avatar_pool())
+        version = election_versions([self.election.pk])[self.election.pk]
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                form.save()
+            self.assertNotEqual(election_versions([self.election.pk])[self.election.pk], version)
+            applications = list(self.election.applications.order_by('ballot_index'))
+            self.assertEqual([(a.display_name, a.ballot_index) for a in applications],
+                             [('alice', 0), ('bob', 1), ('carol', 2), ('dave', 3)])
+            with Image.open(applications[1].avatar.path) as avatar:
+                self.assertEqual((avatar.format, avatar.size), ('JPEG', (100, 66)))
+            self.assertFalse(applications[3].avatar)
+
+
+class VoterCommandsTestCase(TestCase):
+    def run_command(self, *args):
+        out = StringIO()
+        call_command(*args, stdout=out, stderr=StringIO())
+        return json.loads(out.getvalue())
+
+    def test_lifecycle(self):
+        session = Session.objects.create(title='TEST')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'voters.csv')
+            with open(path, 'w') as f:
+                f.write('email,name\nalice@example.org,Alice\nbob@Other.org,Bob\n,Anon\n')
+            created = self.run_command('bulk_create_voters', '-i', str(session.pk), '--csv', path)
+            self.assertEqual([(r['email'], r['status']) for r in created],
+                             [('alice@example.org', 'invited'), ('bob@other.org', 'invited'), (None, 'created')])
+            self.assertEqual(len(mail.outbox), 2)
+
+            path = os.path.join(tmp, 'codes.txt')
+            with open(path, 'w') as f:
+                f.write(f'{created[0]["access_code"]}\n0000-000000-000000\n')
+            revoked = self.run_command('bulk_revoke_codes', '--access-codes-file', path)
+            self.assertEqual([r['status'] for r in revoked], ['revoked', 'invalid_code'])
+            self.assertFalse(Voter.objects.get(pk=created[0]['voter_id']).has_usable_password())
+
+        reset = self.run_command('bulk_reset_voters', '--email-domain', 'other.org', '--no-invitation')
+        self.assertEqual([(r['voter_id'], r['status']) for r in reset], [(created[1]['voter_id'], 'reset')])
+        voter_id, password = Voter.split_access_code(reset[0]['access_code'])
+        self.assertTrue(Voter.objects.get(pk=voter_id).check_password(password))
+
+
+class SeedPerfDataTestCase(TestCase):
+    def seed(self, media_root, manifest, **options):
+        with override_settings(MEDIA_ROOT=media_root):
+            call_command('seed_perf_data', voters=30, elections=3, applications=3, manifest=manifest,
+                         stdout=StringIO(), **options)
+        with open(manifest) as f:
+            return json.load(f)
+
+    @staticmethod
+    def snapshot(manifest):
+        session = Session.objects.get(pk=manifest['sessions'][0]['id'])
+        votes = Ballot.objects.filter(election__session=session).values_list('votes', flat=True)
+        return (list(session.participants.order_by('pk').values_list('name', 'email', 'logged_in')),
+                sorted(bytes(v) for v in votes))
+
+    def test_deterministic(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = self.seed(tmp, os.path.join(tmp, 'perf.json'), seed=7)
+            session = Session.objects.get(pk=manifest['sessions'][0]['id'])
+            self.assertEqual(session.participants.count(), 30)
+            closed = Election.objects.get(pk=manifest['sessions'][0]['elections']['closed'][0])
+            self.assertEqual(closed.number_votes_cast(), closed.ballots_cast.count())
+            self.assertTrue(any(a.avatar for a in closed.applications.all()))
+            self.assertLessEqual(sum(a.elected for a in closed.results), closed.max_votes_yes)
+
+            voter_id, password = Voter.split_access_code(manifest['sessions'][0]['access_codes'][0])
+            self.assertTrue(Voter.objects.get(pk=voter_id).check_password(password))
+
+            snapshot = self.snapshot(manifest)
+            Session.objects.all().delete()
+            ElectionManager.objects.all().delete()
+            hashers = settings.PASSWORD_HASHERS + ['django.contrib.auth.hashers.MD5PasswordHasher']
+            with override_settings(PASSWORD_HASHERS=hashers):
+                manifest = self.seed(tmp, os.path.join(tmp, 'perf.json'), seed=7, fast_hasher=True)
+            self.assertEqual(self.snapshot(manifest), snapshot)
+            self.assertTrue(Voter.objects.filter(password__startswith='md5$').exists())
+
+
 class ElectionSelectorsTest(TestCase):
     def test_election_selectors(self) -> None:
         now = datetime(year=2021, month=4, day=1,
@@ -33,7 +733,9 @@ class ElectionSelectorsTest(TestCase):
         before = now - timedelta(seconds=5)
         bbefore = now - timedelta(seconds=10)
         after = now + timedelta(seconds=5)
-        freeze_time(now).start()
+        freezer = freeze_time(now)
+        freezer.start()
+        self.addCleanup(freezer.stop)
 
         session = Session.objects.create(title="TEST")
         # upcoming elections
@@ -88,6 +790,271 @@ class ElectionSelectorsTest(TestCase):
                 e.started and e.closed and not e.is_open and not e.result_published)
 
 
+class ResultsTestCase(TestCase):
+    def setUp(self):
+        self.session = Session.objects.create(title='TEST')
+        now = timezone.now()
+        self.election = Election.objects.create(session=self.session, title='board', max_votes_yes=2,
+                                                start_date=now - timedelta(hours=1), end_date=now)
+        applications = [Application.objects.create(election=self.election, display_name=name)
+                        for name in ('alice', 'bob', 'carol')]
+        ballots = [
+            (VOTE_ACCEPT, VOTE_ACCEPT, VOTE_ACCEPT),
+            (VOTE_ACCEPT, VOTE_ACCEPT, VOTE_REJECT),
+            (VOTE_ACCEPT, VOTE_REJECT, VOTE_REJECT),
+            (VOTE_REJECT, VOTE_REJECT, VOTE_ABSTENTION),
+        ]
+        Ballot.objects.bulk_create(
+            Ballot(election=self.election, votes=pack_ballot({
+                application.ballot_index: vote for application, vote in zip(applications, ballot)
+            })) for ballot in ballots
+        )
+        Election.objects.create(session=self.session, title='motion', start_date=now - timedelta(hours=1),
+                                end_date=now)
+
+    def test_elected(self):
+        results = [(a.display_name, a.votes_accept, a.elected) for a in self.election.results]
+        # bob has as many yes as no votes and is therefore not elected, even though a seat is left
+        self.assertEqual(results, [('alice', 3, True), ('bob', 2, False), ('carol', 1, False)])
+
+    def test_session_export(self):
+        with self.assertNumQueries(3):
+            results = [(e, list(a)) for e, a in session_results(self.session)]
+        self.assertEqual([e.title for e, _ in results], ['board'])
+
+        csv_data = b''.join(stream_csv(results, with_election=True)).decode().splitlines()
+        self.assertEqual(csv_data[0], 'election,#,applicant,email,yes,no,abstention,elected')
+        self.assertEqual(csv_data[1], 'board,1,alice,,3,1,0,True')
+        self.assertEqual(len(b''.join(stream_jsonl(results)).splitlines()), 3)
+        self.assertTrue(b''.join(stream_zip(results)).startswith(b'PK'))
+
+    def test_export_views(self):
+        manager = ElectionManager.objects.create(username='manager')
+        manager.sessions.add(self.session)
+        self.client.force_login(manager, backend='management.authentication.ManagementBackend')
+        for url in (reverse('management:export_csv', args=[self.election.pk]),
+                    reverse('management:export_session', args=[self.session.pk])):
+            self.assertEqual(self.client.get(url, {'format': 'jsonl'}).status_code, 200)
+            self.assertEqual(self.client.get(url, {'format': 'xlsx'}).status_code, 400)
+
+    @skipUnless(importlib.util.find_spec('numpy'), 'numpy is not installed')
+    def test_recount(self):
+        self.assertEqual(recount(self.election, chunk_size=5), summary_tally(self.election))
+        call_command('recount', session_id=self.session.pk, stdout=StringIO())
+
+    def test_archive(self):
+        voter, _ = Voter.from_data(self.session, email='voter@example.org')
+        BallotCast.objects.create(election=self.election, voter=voter)
+        ongoing = Session.objects.create(title='ONGOING')
+        Election.objects.create(session=ongoing, title='board', start_date=timezone.now())
+        expected = [(a.display_name, a.votes_accept, a.votes_reject, a.elected) for a in self.election.results]
+
+        self.assertEqual(list(archivable_sessions(timedelta())), [self.session])
+        call_command('archive_sessions', older_than=0, batch_size=3, stdout=StringIO())
+        with self.assertRaises(ValueError):
+            archive_session(ongoing)
+
+        election = Election.objects.get(pk=self.election.pk)
+        self.assertEqual((election.number_votes_cast(), election.number_votes_open()), (4, 0))
+        self.assertFalse(Ballot.objects.filter(election=election).exists())
+        self.assertFalse(BallotCast.objects.filter(election=election).exists())
+        self.assertFalse(Voter.objects.get(pk=voter.pk).has_usable_password())
+        self.assertEqual([(a.display_name, a.votes_accept, a.votes_reject, a.elected) for a in election.results],
+                         expected)
+        session = Session.objects.get(pk=self.session.pk)
+        self.assertEqual([[a.votes_accept for a in results] for _, results in session_results(session)], [[3, 2, 1]])
+        if importlib.util.find_spec('numpy'):
+            self.assertEqual(recount(election), summary_tally(election))
+
+        # archiving again changes nothing
+        self.assertFalse(archivable_sessions(timedelta()).exists())
+        self.assertEqual(archive_session(session), {
+            'elections': 0, 'ballots': 0, 'ballots_cast': 0, 'credentials': 0, 'avatars': 0})
+
+    def test_archived_read_only(self):
+        voter, _ = Voter.from_data(self.session, email='voter@example.org')
+        self.election.send_emails_on_start = True
+        self.election.save()
+        self.client.force_login(voter, backend='vote.authentication.AccessCodeBackend')
+        self.assertEqual(self.client.get(reverse('vote:index')).status_code, 200)
+        archive_session(self.session)
+        # the voter who was logged in is logged out
+        for url in (reverse('vote:index'), reverse('vote:vote', args=[self.election.pk])):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response.url.startswith(reverse('vote:code_login')))
+
+        manager = ElectionManager.objects.create(username='manager')
+        manager.sessions.add(self.session)
+        self.client.force_login(manager, backend='management.authentication.ManagementBackend')
+
+        # reopening the archived election is rejected, no reminders are sent
+        response = self.client.post(reverse('management:election', args=[self.election.pk]),
+                                    {'action': 'open', 'run_time': 5})
+        self.assertContains(response, 'The election is archived')
+        election = Election.objects.get(pk=self.election.pk)
+        self.assertTrue(election.closed)
+        self.assertFalse(election.is_open)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(Voter.objects.get(pk=voter.pk).can_vote(election))
+        self.assertFalse(VoteForm(Namespace(user=voter), election, data={}).is_valid())
+
+        application = election.applications.first()
+        for url in (reverse('management:add_voters', args=[self.session.pk]),
+                    reverse('management:add_tokens', args=[self.session.pk]),
+                    reverse('management:add_application', args=[election.pk]),
+                    reverse('management:delete_application', args=[election.pk, application.pk])):
+            response = self.client.post(url, {'voters_list': 'bob@example.org', 'nr_anonymous_voters': 3})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.session.participants.count(), 1)
+        self.assertTrue(election.applications.filter(pk=application.pk).exists())
+
+    def test_partly_archived(self):
+        motion = Election.objects.get(session=self.session, title='motion')
+        Application.objects.create(election=motion, display_name='motion')
+        Ballot.objects.create(election=motion, votes=pack_ballot({0: VOTE_REJECT}))
+        expected = [[a.votes_accept for a in results] for _, results in session_results(self.session)]
+
+        # the archival stopped after the first election
+        self.assertTrue(archive_election(self.election))
+        self.assertIsNone(Session.objects.get(pk=self.session.pk).archived_at)
+        self.assertEqual([[a.votes_accept for a in results] for _, results in session_results(self.session)],
+                         expected)
+
+        # a failing storage stops the archival of the session, not of the others
+        with mock.patch('vote.archive.purge_avatars', side_effect=OSError('storage unavailable')):
+            with self.assertRaises(CommandError):
+                call_command('archive_sessions', session_id=[self.session.pk], stdout=StringIO())
+        self.assertFalse(Ballot.objects.filter(election=self.election).exists())
+        self.assertEqual([[a.votes_accept for a in results] for _, results in session_results(self.session)],
+                         expected)
+
+
+class QueryBudgetTestCase(TestCase):
+    @override_settings(SQL_BUDGET_INSTRUMENTATION=True, SQL_SLOW_QUERY_THRESHOLD=0)
+    def test_track_queries(self):
+        with self.assertLogs('wahlfang.slow_queries', level='WARNING') as logs, \
+                track_queries('test') as recorder:
+            Session.objects.count()
+            Session.objects.filter(title='TEST').exists()
+        self.assertEqual(recorder.count, 2)
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn('vote/tests.py', logs.output[0])
+
+    def test_disabled(self):
+        with track_queries('test') as recorder:
+            Session.objects.count()
+        self.assertIsNone(recorder)
+
+
+class ProfilerTestCase(TestCase):
+    def test_profile_block(self):
+        with tempfile.TemporaryDirectory() as spool_dir, \
+                override_settings(PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=1, PROFILER_SPOOL_DIR=spool_dir):
+            with profile_block('view:vote:index'):
+                end = time.perf_counter() + 0.1
+                while time.perf_counter() < end:
+                    pass
+            self.assertEqual(len(os.listdir(spool_dir)), 1)
+
+            output = os.path.join(spool_dir, 'flamegraph.svg')
+            call_command('profile_flamegraph', output=output, name='vote:index', stdout=StringIO())
+            with open(output) as f:
+                self.assertIn('test_profile_block', f.read())
+
+
+class StartupTestCase(TestCase):
+    # seconds a cold import of the ASGI application and the URL configuration may take
+    IMPORT_BUDGET = 2.0
+    LAZY_MODULES = ('PIL', 'qrcode', 'latex', 'django_auth_ldap', 'numpy')
+
+    def test_import_budget(self):
+        profile = min((profile_startup('wahlfang.asgi', settings.SETTINGS_MODULE) for _ in range(2)),
+                      key=lambda run: run['total'])
+        self.assertLess(profile['total'], self.IMPORT_BUDGET)
+        self.assertEqual([name for name in profile['modules'] if name.partition('.')[0] in self.LAZY_MODULES], [])
+
+
+class WarmUpTestCase(TestCase):
+    databases = '__all__'
+
+    def test_warm_up(self):
+        cached_loader = engines['django'].engine.template_loaders[0]
+        cached_loader.reset()
+        with self.assertLogs('wahlfang.warmup', level='INFO'):
+            durations = warm_up()
+        self.assertEqual(set(durations), {'templates', 'urls', 'databases', 'hasher'})
+        self.assertIn('vote/index.html', cached_loader.get_template_cache)
+        self.assertIn('bootstrap4/field.html', cached_loader.get_template_cache)
+
+    def test_database_down(self):
+        with mock.patch.object(connections['default'], 'ensure_connection',
+                               side_effect=OperationalError('connection refused')):
+            with self.assertLogs('wahlfang.warmup', level='ERROR'):
+                self.assertEqual(warm_databases(), len(connections.all()) - 1)
+        # the warm-up on import does not connect at all
+        databases = mock.Mock(return_value=0)
+        with mock.patch.dict('wahlfang.warmup.STEPS', databases=databases), \
+                self.assertLogs('wahlfang.warmup', level='INFO'):
+            self.assertNotIn('databases', warm_up(databases=False))
+        databases.assert_not_called()
+
+    async def test_lifespan(self):
+        communicator = ApplicationCommunicator(LifespanApplication(), {'type': 'lifespan'})
+        with self.assertLogs('wahlfang.warmup', level='INFO'):
+            await communicator.send_input({'type': 'lifespan.startup'})
+            self.assertEqual(await communicator.receive_output(timeout=30), {'type': 'lifespan.startup.complete'})
+        await communicator.send_input({'type': 'lifespan.shutdown'})
+        self.assertEqual(await communicator.receive_output(), {'type': 'lifespan.shutdown.complete'})
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRoutingTestCase(TransactionTestCase):
+    # reads inside transactions, like the one of TestCase, stay on the primary
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.session = Session.objects.create(title='TEST')
+        self.voter, self.access_code = Voter.from_data(self.session, email='voter@example.org')
+        # a copy of the session and the voter, the replica lags behind the election
+        Session.objects.using('replica').bulk_create([Session.objects.get(pk=self.session.pk)])
+        Voter.objects.using('replica').bulk_create([Voter.objects.get(pk=self.voter.pk)])
+        Election.objects.create(session=self.session, title='board', start_date=timezone.now() - timedelta(hours=1))
+
+    def test_router(self):
+        self.assertEqual(router.db_for_read(Election), 'default')
+        with use_replica():
+            self.assertEqual(router.db_for_read(Election), 'replica')
+            self.assertEqual(router.db_for_read(ElectionManager), 'default')
+            self.assertFalse(Election.objects.exists())
+        self.assertEqual(router.db_for_write(Election), 'default')
+
+    def test_sticky_after_write(self):
+        # the login writes the session, the voter reads their own writes afterwards
+        response = self.client.get(reverse('vote:link_login', args=[self.access_code]))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.assertContains(self.client.get(reverse('vote:index')), 'board')
+        self.assertEqual(len(queries), 0)
+
+        del self.client.cookies[STICKY_COOKIE]
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.assertNotContains(self.client.get(reverse('vote:index')), 'board')
+        self.assertGreater(len(queries), 0)
+
+    @override_settings(BALLOT_GROUP_COMMIT=True)
+    def test_sticky_after_group_commit(self):
+        # the ballot is written by the writer thread of vote.intake
+        election = Election.objects.get(session=self.session)
+        application = Application.objects.create(election=election, display_name='Alice')
+        self.client.force_login(self.voter, backend='vote.authentication.AccessCodeBackend')
+        response = self.client.post(reverse('vote:vote', args=[election.pk]), {str(application.pk): VOTE_ACCEPT})
+        self.assertRedirects(response, reverse('vote:index'), fetch_redirect_response=False)
+        self.assertTrue(BallotCast.objects.filter(election=election, voter=self.voter).exists())
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+
 def gen_data():
     session = Session.objects.create(
         title='Test session'
@@ -0,0 +1,82 @@
+"""
+Turnout counters of the elections (voters, cast and open ballots) kept in the cache, so the election page of the
+managers does not aggregate the voters and ballots on every render. The counters are seeded from the database on
+first use, updated atomically when a ballot is committed and dropped when the participants of a session change.
+Deployments with several processes need a shared cache backend (e.g. memcached or redis) for the counters to agree.
+"""
+from typing import Dict, Iterable
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+from vote.models import Election
+
+TURNOUT_FIELDS = ('voters', 'cast', 'open')
+# drift, e.g. from a ballot committed while the counters were seeded, is corrected when they expire
+TURNOUT_TIMEOUT = 60 * 60
+
+
+def _keys(election_id: int) -> Dict[str, str]:
+    return {name: f'turnout:{election_id}:{name}' for name in TURNOUT_FIELDS}
+
+
+def get_turnout(election: Election) -> Dict[str, int]:
+    keys = _keys(election.pk)
+    values = cache.get_many(keys.values())
+    if len(values) == len(keys):
+        return {name: values[key] for name, key in keys.items()}
+
+    turnout = {
+        'voters': election.number_voters(),
+        'cast': election.number_votes_cast(),
+        'open': election.number_votes_open(),
+    }
+    cache.set_many({keys[name]: value for name, value in turnout.items()}, timeout=TURNOUT_TIMEOUT)
+    return turnout
+
+
+def record_ballot(election_id: int, number: int = 1) -> None:
+    """
+    Count `number` committed ballots and push the change to the managers watching the election.
+    """
+    keys = _keys(election_id)
+    try:
+        cache.incr(keys['cast'], number)
+        cache.decr(keys['open'], number)
+    except ValueError:
+        # not seeded (or evicted), the next get_turnout counts the ballot
+        cache.delete_many(keys.values())
+
+    async_to_sync(get_channel_layer().group_send)(
+        "Election-" + str(election_id),
+        {'type': 'send_turnout', 'delta': {'cast': number, 'open': -number}}
+    )
+
+
+def reset_turnout(election_ids: Iterable[int]) -> None:
+    cache.delete_many([key for election_id in election_ids for key in _keys(election_id).values()])
+
+
+def reset_session_turnout(session_id: int) -> None:
+    reset_turnout(Election.objects.filter(session_id=session_id).values_list('pk', flat=True))
+
+
+def voter_saved(sender, instance, created, **kwargs):
+    if created:
+        reset_session_turnout(instance.session_id)
+
+
+def voter_deleted(sender, instance, **kwargs):
+    reset_session_turnout(instance.session_id)
+
+
+def excluded_voters_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        reset_turnout([instance.pk])
+    elif pk_set is not None:
+        reset_turnout(pk_set)
+    else:
+        reset_session_turnout(instance.session_id)
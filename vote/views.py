@@ -1,21 +1,33 @@
+import hashlib
 import sys
+from datetime import datetime
+from typing import Optional
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, views as auth_views
-from django.http.response import HttpResponseNotFound
+from django.core.cache import cache
+from django.http.response import HttpResponse, HttpResponseNotFound
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 # from ratelimit.decorators import ratelimit
 from django_ratelimit.decorators import ratelimit
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 from vote.authentication import voter_login_required
+from vote.fragments import election_versions
 from vote.forms import AccessCodeAuthenticationForm, VoteForm, ApplicationUploadFormUser
 from vote.models import Election, Voter, Session
+from vote.revisions import page_etag, session_election_states
 from vote.selectors import open_elections, upcoming_elections, published_elections, closed_elections
+from wahlfang.routers import replica_reads
 
 
 class LoginView(auth_views.LoginView):
@@ -67,14 +79,32 @@ def code_login(request, access_code=None):
     return redirect('vote:index')
 
 
+def index_etag(request):
+    voter: Voter = request.user
+    return page_etag(request, voter.session.revision, session_election_states(voter.session_id),
+                     sorted(voter.ballots_cast.values_list('election_id', flat=True)))
+
+
 @voter_login_required
+@replica_reads
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=index_etag)
 def index(request):
     voter: Voter = request.user
     session = voter.session
 
+    elections = {
+        'open_elections': list(open_elections(session)),
+        'upcoming_elections': list(upcoming_elections(session)),
+        'published_elections': list(published_elections(session)),
+        'closed_elections': list(closed_elections(session)),
+    }
+    # the election cards are cached per voter under the version of their election, see vote.fragments
+    versions = election_versions(e.pk for group in elections.values() for e in group)
+
     def list_elections(elections):
         return [
-            (e, voter.can_vote(e), voter.has_applied(e))
+            (e, voter.can_vote(e), voter.has_applied(e), versions[e.pk])
             for e in elections
         ]
 
@@ -83,10 +113,8 @@ def index(request):
         'meeting_link': session.meeting_link,
         'voter': voter,
         'existing_elections': (session.elections.count() > 0),
-        'open_elections': list_elections(open_elections(session)),
-        'upcoming_elections': list_elections(upcoming_elections(session)),
-        'published_elections': list_elections(published_elections(session)),
-        'closed_elections': list_elections(closed_elections(session)),
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        **{name: list_elections(group) for name, group in elections.items()},
     }
 
     # overview
@@ -100,7 +128,10 @@ def vote(request, election_id):
         election = voter.session.elections.get(pk=election_id)
     except Election.DoesNotExist:
         return HttpResponseNotFound('Election does not exists')
+    return vote_page(request, voter, election)
 
+
+def vote_page(request, voter: Voter, election: Election):
     can_vote = voter.can_vote(election)
     if election.max_votes_yes is not None:
         max_votes_yes = min(election.max_votes_yes,
@@ -181,16 +212,51 @@ def help_page(request):
     return render(request, template_name='vote/help.html')
 
 
-def spectator(request, uuid):
-    session = get_object_or_404(Session.objects, spectator_token=uuid)
-
-    context = {
+def spectator_context(session: Session):
+    return {
         'title': session.title,
         'meeting_link': session.meeting_link,
         'existing_elections': (session.elections.count() > 0),
-        'open_elections': open_elections(session),
-        'upcoming_elections': upcoming_elections(session),
-        'published_elections': published_elections(session),
-        'closed_elections': closed_elections(session),
+        'open_elections': list(open_elections(session)),
+        'upcoming_elections': list(upcoming_elections(session)),
+        'published_elections': list(published_elections(session)),
+        'closed_elections': list(closed_elections(session)),
     }
-    return render(request, template_name='vote/spectator.html', context=context)
+
+
+def next_transition(elections) -> Optional[datetime]:
+    """
+    The next start or end of an election, when the spectator page changes without any change in the database.
+    """
+    now = timezone.now()
+    return min((date for election in elections for date in (election.start_date, election.end_date)
+                if date is not None and date > now), default=None)
+
+
+@replica_reads
+def spectator(request, uuid):
+    session = get_object_or_404(Session.objects, spectator_token=uuid)
+
+    # the page only differs for logged in users (navigation) and pending messages, render these ones individually
+    if request.user.is_authenticated or len(messages.get_messages(request)) > 0:
+        return render(request, template_name='vote/spectator.html', context=spectator_context(session))
+
+    # every spectator of the session shares one rendering per revision of the session, see vote.revisions
+    key = f'spectator:{session.pk}:{session.revision}'
+    page = cache.get(key)
+    if page is None:
+        context = spectator_context(session)
+        content = render_to_string('vote/spectator.html', context=context, request=request)
+        page = {'content': content, 'etag': f'"{hashlib.sha256(content.encode()).hexdigest()[:32]}"'}
+        timeout = settings.FRAGMENT_CACHE_TIMEOUT
+        transition = next_transition(election for name in ('open_elections', 'upcoming_elections')
+                                     for election in context[name])
+        if transition is not None:
+            # expire when an election starts or ends, the page reloads itself at that time
+            timeout = max(min(timeout, int((transition - timezone.now()).total_seconds())), 1)
+        cache.set(key, page, timeout=timeout)
+
+    response = get_conditional_response(request, etag=page['etag'], response=HttpResponse(page['content']))
+    response.headers['ETag'] = page['etag']
+    patch_cache_control(response, public=True, max_age=settings.SPECTATOR_MAX_AGE)
+    return response
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 """
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 from wahlfang.manage import setup
@@ -17,8 +18,13 @@ django_asgi_application = get_asgi_application()
 from channels.auth import AuthMiddlewareStack  # pylint: disable=wrong-import-order
 from channels.routing import ProtocolTypeRouter  # pylint: disable=wrong-import-order
 import wahlfang.routing  # pylint: disable=wrong-import-order
+from wahlfang.warmup import LifespanApplication, warm_up  # pylint: disable=wrong-import-order
+
+if settings.WARM_UP and settings.WARM_UP_ON_IMPORT:
+    warm_up(databases=False)
 
 application = ProtocolTypeRouter({
-    "https": django_asgi_application,
+    "http": django_asgi_application,
     "websocket": AuthMiddlewareStack(wahlfang.routing.websocket_urlpatterns),
+    "lifespan": LifespanApplication(),
 })
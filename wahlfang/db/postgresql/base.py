@@ -0,0 +1,126 @@
+"""
+PostgreSQL backend with a connection pool per worker process, use it with `'ENGINE': 'wahlfang.db.postgresql'`.
+It requires psycopg 3 with psycopg_pool (`pip install wahlfang[postgres]`).
+
+Without `OPTIONS['pool']` it behaves like `django.db.backends.postgresql`. With `'pool': True` (or a dict overriding
+POOL_DEFAULTS) a thread does not open its own connection but borrows one from a bounded pool shared by the threads of
+the process:
+ - at most `max_size` connections are open, a thread waits up to `timeout` seconds for a free one,
+ - every borrowed connection is checked with a round trip first (`check`), broken connections are replaced,
+ - connections are closed after `max_lifetime` seconds and after `max_idle` seconds without use.
+
+Django returns the connection to the pool when it closes it, i.e. at the end of every request and after every
+`database_sync_to_async` call of the websocket consumers. CONN_MAX_AGE has to be 0 for this. The time waited for a
+connection and the state of the pools are exported as prometheus metrics, see wahlfang.metrics.
+"""
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+from django.utils.asyncio import async_unsafe
+from prometheus_client import REGISTRY
+
+from wahlfang.metrics import PoolStatsCollector, db_pool_timeouts, db_pool_wait
+
+POOL_DEFAULTS = {
+    'min_size': 2,
+    'max_size': 10,
+    'timeout': 10,
+    'max_lifetime': 30 * 60,
+    'max_idle': 10 * 60,
+    'check': True,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+REGISTRY.register(PoolStatsCollector(_pools))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool_options(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        return {**POOL_DEFAULTS, **(options if isinstance(options, dict) else {})}
+
+    @property
+    def pool(self):
+        options = self.pool_options
+        if options is None:
+            return None
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = self.create_pool(options)
+            return _pools[self.alias]
+
+    def create_pool(self, options):
+        if not is_psycopg3:
+            raise ImproperlyConfigured('OPTIONS["pool"] requires psycopg 3')
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured('OPTIONS["pool"] requires CONN_MAX_AGE = 0, persistent connections would never '
+                                       'be returned to the pool')
+        try:
+            from psycopg_pool import ConnectionPool  # pylint: disable=C0415
+        except ImportError as e:
+            raise ImproperlyConfigured('OPTIONS["pool"] requires psycopg_pool') from e
+
+        options = dict(options)
+        check = ConnectionPool.check_connection if options.pop('check') else None
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+
+        def configure(connection):
+            if isolation_level is not None:
+                connection.isolation_level = IsolationLevel(isolation_level)
+
+        return ConnectionPool(kwargs=self.get_connection_params(), configure=configure, check=check,
+                              name=self.alias, open=True, **options)
+
+    def close_pool(self):
+        with _pools_lock:
+            pool = _pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close()
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        try:
+            self.isolation_level = IsolationLevel(isolation_level)
+        except ValueError as e:
+            raise ImproperlyConfigured(f'Invalid transaction isolation level {isolation_level} specified.') from e
+
+        from psycopg_pool import PoolTimeout  # pylint: disable=C0415
+        start = time.perf_counter()
+        try:
+            connection = pool.getconn()
+        except PoolTimeout:
+            db_pool_timeouts.labels(database=self.alias).inc()
+            raise
+        finally:
+            db_pool_wait.labels(database=self.alias).observe(time.perf_counter() - start)
+        # the pool the connection is returned to, even if the pool of the alias is replaced meanwhile
+        connection.wahlfang_pool = pool
+        return connection
+
+    def _close(self):
+        if self.connection is None or not hasattr(self.connection, 'wahlfang_pool'):
+            return super()._close()
+        with self.wrap_database_errors:
+            # an open transaction is rolled back by the pool
+            self.connection.wahlfang_pool.putconn(self.connection)
+            # the connection may be handed to another thread now, never use it again (even inside an atomic block)
+            self.connection = None
+        return None
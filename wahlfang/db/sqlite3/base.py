@@ -0,0 +1,137 @@
+"""
+SQLite backend for small production deployments, use it with `'ENGINE': 'wahlfang.db.sqlite3'`.
+
+Compared to `django.db.backends.sqlite3` it
+ - switches the database to WAL journaling, so readers are not blocked by a writer,
+ - waits up to `busy_timeout` milliseconds for the lock of another process instead of failing right away,
+ - maps up to `mmap_size` bytes of the database file into memory for faster reads,
+ - starts transactions with BEGIN IMMEDIATE, so two transactions never both read and then fail to upgrade to a write
+   lock ("database is locked" regardless of the timeout),
+ - serializes the writes of all threads of the process with one lock per database file, so concurrent requests queue
+   up in the process instead of polling the SQLite lock.
+
+The pragmas and the write lock are configured in OPTIONS, the remaining options are passed to sqlite3.connect.
+"""
+import threading
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+DEFAULT_OPTIONS = {
+    'journal_mode': 'WAL',
+    # with WAL, a power loss may lose the last transactions but never corrupts the database
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'serialize_writes': True,
+}
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_write_locks = {}
+_write_locks_lock = threading.Lock()
+
+
+def get_write_lock(name: str) -> threading.RLock:
+    with _write_locks_lock:
+        return _write_locks.setdefault(name, threading.RLock())
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    """
+    Holds the write lock for write statements outside of transactions (autocommit), transactions hold it from BEGIN
+    until they end.
+    """
+    wrapper = None
+
+    def execute(self, query, params=None):
+        with self.wrapper.autocommit_write(query):
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        with self.wrapper.autocommit_write(query):
+            return super().executemany(query, param_list)
+
+
+class AutocommitWrite:
+    def __init__(self, wrapper, query):
+        self.wrapper = wrapper
+        self.locked = (wrapper.write_lock is not None and not wrapper.holds_write_lock
+                       and not wrapper.connection.in_transaction
+                       and query.lstrip()[:7].upper().startswith(WRITE_STATEMENTS))
+
+    def __enter__(self):
+        if self.locked:
+            self.wrapper.acquire_write_lock()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.locked:
+            self.wrapper.release_write_lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_lock = None
+        self.holds_write_lock = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {name: kwargs.pop(name, default) for name, default in DEFAULT_OPTIONS.items()}
+        serialize = self.pragmas.pop('serialize_writes')
+        self.write_lock = get_write_lock(self.settings_dict['NAME']) if serialize else None
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        # in memory databases keep their journal mode, there is nothing to map
+        if not self.is_in_memory_db():
+            conn.execute(f'PRAGMA journal_mode = {self.pragmas["journal_mode"]}')
+            conn.execute(f'PRAGMA mmap_size = {int(self.pragmas["mmap_size"])}')
+        conn.execute(f'PRAGMA synchronous = {self.pragmas["synchronous"]}')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.pragmas["busy_timeout"])}')
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.wrapper = self
+        return cursor
+
+    def autocommit_write(self, query):
+        return AutocommitWrite(self, query)
+
+    def acquire_write_lock(self):
+        if not self.write_lock.acquire(timeout=self.pragmas['busy_timeout'] / 1000):
+            raise OperationalError('database is locked')
+        self.holds_write_lock = True
+
+    def release_write_lock(self):
+        if self.holds_write_lock:
+            self.holds_write_lock = False
+            self.write_lock.release()
+
+    def _start_transaction_under_autocommit(self):
+        if self.write_lock is not None:
+            self.acquire_write_lock()
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.release_write_lock()
+            raise
+
+    def _commit(self):
+        try:
+            super()._commit()
+        finally:
+            self.release_write_lock()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self.release_write_lock()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self.release_write_lock()
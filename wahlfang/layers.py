@@ -0,0 +1,206 @@
+"""
+Channel layer for deployments with several worker processes (or nodes) which already run PostgreSQL, so they do not
+need Redis to broadcast group messages. Use it with
+
+    CHANNEL_LAYERS = {'default': {'BACKEND': 'wahlfang.layers.PostgresChannelLayer'}}
+
+Every process keeps the groups and channels of its own consumers in memory, like InMemoryChannelLayer, and delivers
+the messages for them locally. Group messages and messages to the channels of other processes are additionally
+published with NOTIFY: a publisher thread collects the messages of up to `batch_delay` milliseconds (at most
+`max_batch` messages) and sends them in one transaction, packed into as few notifications as the 8000 bytes payload
+limit allows. A listener thread LISTENs on the notification channel and hands the messages of the other processes to
+the event loop of the local consumers, which fans them out to the members of the group in this process.
+
+Messages have to be JSON serializable. Like Redis pub/sub, notifications published while a listener is reconnecting
+are lost. It requires psycopg 3 and connects with the settings of the Django database `database`, or with the libpq
+connection string `conninfo` (e.g. to bypass a transaction pooling PgBouncer, which does not support LISTEN).
+"""
+import asyncio
+import json
+import logging
+import queue
+import random
+import string
+import threading
+import time
+import uuid
+from copy import deepcopy
+from typing import List, Optional, Tuple
+
+import psycopg
+from psycopg import sql
+from channels.layers import InMemoryChannelLayer
+from django.db import connections
+
+logger = logging.getLogger('wahlfang.layers')
+
+# PostgreSQL rejects notification payloads of 8000 bytes or more
+MAX_PAYLOAD = 7900
+RECONNECT_DELAY = 1
+
+
+class PostgresChannelLayer(InMemoryChannelLayer):
+    def __init__(self, database='default', conninfo=None, channel='wahlfang_layer', batch_delay=2, max_batch=100,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.database = database
+        self.conninfo = conninfo
+        self.notify_channel = channel
+        self.batch_delay = batch_delay / 1000
+        self.max_batch = max_batch
+        # identifies the channels and notifications of this layer instance (i.e. of this process)
+        self.node = uuid.uuid4().hex[:12]
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.outbox: 'queue.Queue[Tuple[str, str, dict]]' = queue.Queue()
+        self.closed = threading.Event()
+        self.publisher: Optional[threading.Thread] = None
+        self.listener: Optional[threading.Thread] = None
+        self.listening = threading.Event()
+        self.threads_lock = threading.Lock()
+
+    # Channel layer API
+
+    async def new_channel(self, prefix='specific.'):
+        return f'{prefix}.{self.node}!' + ''.join(random.choice(string.ascii_letters) for _ in range(12))
+
+    def is_local(self, channel):
+        return '!' not in channel or self.non_local_name(channel).endswith(f'.{self.node}!')
+
+    async def send(self, channel, message):
+        # general channels (without !) are only received in this process
+        if self.is_local(channel):
+            await super().send(channel, message)
+        else:
+            self.publish('c', channel, message)
+
+    async def receive(self, channel):
+        self.loop = asyncio.get_running_loop()
+        self.start_listener()
+        return await super().receive(channel)
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        self.start_listener()
+
+    async def group_send(self, group, message):
+        await super().group_send(group, message)
+        self.publish('g', group, message)
+
+    async def flush(self):
+        await super().flush()
+        while not self.outbox.empty():
+            self.outbox.get_nowait()
+
+    async def close(self):
+        self.closed.set()
+        self.outbox.put(None)
+
+    # Publishing
+
+    def publish(self, kind: str, name: str, message: dict):
+        if len(json.dumps([kind, name, message])) > MAX_PAYLOAD - 50:
+            raise ValueError(f'The message for {name} exceeds the notification payload limit')
+        self.start_publisher()
+        self.outbox.put((kind, name, message))
+
+    def start_publisher(self):
+        with self.threads_lock:
+            if self.publisher is None or not self.publisher.is_alive():
+                self.publisher = threading.Thread(target=self.run_publisher, name='channel-layer-publisher',
+                                                  daemon=True)
+                self.publisher.start()
+
+    def connect(self):
+        if self.conninfo is not None:
+            return psycopg.connect(self.conninfo, autocommit=True)
+        return psycopg.connect(**connections[self.database].get_connection_params(), autocommit=True)
+
+    def pack(self, batch: List[Tuple[str, str, dict]]) -> List[str]:
+        """
+        Pack the messages into as few notification payloads as possible.
+        """
+        payloads, entries, size = [], [], 0
+        for entry in batch:
+            encoded = json.dumps(entry, separators=(',', ':'))
+            if entries and size + len(encoded) + 1 > MAX_PAYLOAD - 50:
+                payloads.append(f'{{"n":"{self.node}","m":[{",".join(entries)}]}}')
+                entries, size = [], 0
+            entries.append(encoded)
+            size += len(encoded) + 1
+        if entries:
+            payloads.append(f'{{"n":"{self.node}","m":[{",".join(entries)}]}}')
+        return payloads
+
+    def run_publisher(self):
+        conn = None
+        while not self.closed.is_set():
+            batch = [self.outbox.get()]
+            deadline = time.monotonic() + self.batch_delay
+            while len(batch) < self.max_batch and batch[-1] is not None:
+                try:
+                    batch.append(self.outbox.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            batch = [entry for entry in batch if entry is not None]
+            if not batch:
+                continue
+
+            try:
+                if conn is None or conn.closed:
+                    conn = self.connect()
+                with conn.transaction(), conn.cursor() as cursor:
+                    cursor.executemany('SELECT pg_notify(%s, %s)',
+                                       [(self.notify_channel, payload) for payload in self.pack(batch)])
+            except psycopg.Error:
+                logger.exception('Publishing %d channel layer messages failed', len(batch))
+                if conn is not None:
+                    conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    # Listening
+
+    def start_listener(self):
+        with self.threads_lock:
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self.run_listener, name='channel-layer-listener',
+                                                 daemon=True)
+                self.listener.start()
+
+    def run_listener(self):
+        while not self.closed.is_set():
+            try:
+                with self.connect() as conn:
+                    conn.execute(sql.SQL('LISTEN {}').format(sql.Identifier(self.notify_channel)))
+                    self.listening.set()
+                    while not self.closed.is_set():
+                        for notify in conn.notifies(timeout=1):
+                            self.dispatch(notify.payload)
+            except psycopg.Error:
+                self.listening.clear()
+                logger.exception('Listening for channel layer messages failed, reconnecting')
+                self.closed.wait(RECONNECT_DELAY)
+        self.listening.clear()
+
+    def dispatch(self, payload: str):
+        notification = json.loads(payload)
+        # our own messages were delivered locally already, without consumers there is no one to deliver to
+        if notification['n'] == self.node or self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.deliver, notification['m'])
+
+    def deliver(self, entries):
+        """
+        Fan out the messages of another process to the local consumers, in the event loop of the consumers.
+        """
+        self._clean_expired()
+        for kind, name, message in entries:
+            if kind == 'g':
+                channels = list(self.groups.get(name, {}))
+            else:
+                channels = [name] if self.is_local(name) else []
+            for channel in channels:
+                channel_queue = self.channels.setdefault(channel, asyncio.Queue())
+                if channel_queue.qsize() < self.capacity:
+                    channel_queue.put_nowait((time.time() + self.expiry, deepcopy(message)))
@@ -0,0 +1,165 @@
+import logging
+import os
+import time
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger('wahlfang.slow_queries')
+
+view_query_count = Histogram(
+    'wahlfang_view_db_queries', 'Wahlfang Number of database queries per view', ['view'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf'))
+)
+view_query_duration = Histogram(
+    'wahlfang_view_db_duration_seconds', 'Wahlfang Total database time per view', ['view']
+)
+db_pool_wait = Histogram(
+    'wahlfang_db_pool_wait_seconds', 'Wahlfang Time waited for a pooled database connection', ['database'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, float('inf'))
+)
+db_pool_timeouts = Counter(
+    'wahlfang_db_pool_timeouts', 'Wahlfang Number of requests which got no pooled database connection in time',
+    ['database']
+)
+warmup_duration = Gauge(
+    'wahlfang_warmup_duration_seconds', 'Wahlfang Duration of the worker warm-up steps on startup', ['step']
+)
+
+_THIS_FILE = os.path.normcase(os.path.abspath(__file__))
+
+
+def _call_site():
+    """
+    Return the innermost stack frame that belongs to wahlfang itself (and not to django or this module).
+    """
+    base_dir = os.path.normcase(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.normcase(os.path.abspath(frame.filename))
+        if filename == _THIS_FILE or not filename.startswith(base_dir) or 'site-packages' in filename:
+            continue
+        return f'{os.path.relpath(frame.filename, settings.BASE_DIR)}:{frame.lineno} in {frame.name}'
+    return '<unknown>'
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting queries and database time, logging slow queries with
+    their call site and query plan.
+    """
+
+    def __init__(self, name='<unresolved>'):
+        self.name = name
+        self.count = 0
+        self.duration = 0.0
+        self._explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = time.perf_counter() - start
+        self.count += 1
+        self.duration += elapsed
+        if elapsed * 1000 >= settings.SQL_SLOW_QUERY_THRESHOLD:
+            self._log_slow_query(context['connection'], sql, params, many, elapsed)
+        return result
+
+    def _explain(self, connection, sql, params, many):
+        if many or not sql.lstrip().upper().startswith('SELECT') or \
+                not connection.features.supports_explaining_query_execution:
+            return None
+
+        self._explaining = True
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                    return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+        except Exception as e:  # pylint: disable=W0703
+            return f'EXPLAIN failed: {e}'
+        finally:
+            self._explaining = False
+
+    def _log_slow_query(self, connection, sql, params, many, elapsed):
+        logger.warning(
+            'slow query (%.1f ms) in view %s at %s\n%s\nparams: %r\nplan:\n%s',
+            elapsed * 1000, self.name, _call_site(), sql, params, self._explain(connection, sql, params, many)
+        )
+
+    def observe(self):
+        view_query_count.labels(view=self.name).observe(self.count)
+        view_query_duration.labels(view=self.name).observe(self.duration)
+
+    @contextmanager
+    def install(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+@contextmanager
+def track_queries(name):
+    """
+    Record the queries issued inside the block under the given name, e.g. for websocket consumers
+    which are not covered by the middleware. Does nothing unless SQL_BUDGET_INSTRUMENTATION is enabled.
+    """
+    if not settings.SQL_BUDGET_INSTRUMENTATION:
+        yield None
+        return
+
+    recorder = QueryRecorder(name)
+    with recorder.install():
+        yield recorder
+    recorder.observe()
+
+
+class QueryBudgetMiddleware:
+    """
+    Records the number of queries and the total database time per resolved view name.
+    Only active if SQL_BUDGET_INSTRUMENTATION is enabled.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_BUDGET_INSTRUMENTATION:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request.query_recorder = recorder
+        with recorder.install():
+            response = self.get_response(request)
+        recorder.observe()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match:
+            request.query_recorder.name = request.resolver_match.view_name
+
+
+class PoolStatsCollector:
+    """
+    Exports the open, idle and awaited connections of the connection pools of wahlfang.db.postgresql.
+    """
+
+    def __init__(self, pools):
+        self.pools = pools
+
+    def collect(self):
+        gauge = GaugeMetricFamily('wahlfang_db_pool_connections', 'Wahlfang Connections of the database pool',
+                                  labels=['database', 'state'])
+        for alias, pool in list(self.pools.items()):
+            stats = pool.get_stats()
+            gauge.add_metric([alias, 'open'], stats.get('pool_size', 0))
+            gauge.add_metric([alias, 'idle'], stats.get('pool_available', 0))
+            gauge.add_metric([alias, 'waiting'], stats.get('requests_waiting', 0))
+        yield gauge
@@ -0,0 +1,152 @@
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+COLLAPSED_SUFFIX = '.collapsed'
+
+_request_counter = itertools.count(1)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    filename = '/'.join(code.co_filename.replace(os.sep, '/').split('/')[-2:])
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class Profile:
+    def __init__(self, name):
+        self.name = name
+        self.stacks = Counter()
+        self.samples = 0
+
+    def add(self, frame):
+        stack = []
+        while frame is not None and len(stack) < 256:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def dump(self, spool_dir, duration):
+        """
+        Write the samples in the collapsed stack format (one `frame;frame;frame count` line per stack)
+        as understood by flamegraph.pl, speedscope and the profile_flamegraph command.
+        """
+        os.makedirs(spool_dir, exist_ok=True)
+        slug = re.sub(r'[^\w.-]+', '_', self.name)
+        filename = f'{int(time.time() * 1000)}-{os.getpid()}-{slug}-{int(duration * 1000)}ms{COLLAPSED_SUFFIX}'
+        path = os.path.join(spool_dir, filename)
+        with open(path + '.tmp', 'w') as f:
+            for stack, count in self.stacks.items():
+                f.write(f'{stack} {count}\n')
+        os.replace(path + '.tmp', path)
+        return path
+
+
+class StackSampler:
+    """
+    Background thread periodically recording the stack of every thread that currently runs a profiled block.
+    """
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._profiles = {}
+        self._thread = None
+
+    def add(self, ident, profile):
+        with self._lock:
+            self._profiles.setdefault(ident, []).append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='wahlfang-profiler', daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    def remove(self, ident, profile):
+        with self._lock:
+            profiles = self._profiles.get(ident, [])
+            if profile in profiles:
+                profiles.remove(profile)
+            if not profiles:
+                self._profiles.pop(ident, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._profiles:
+                    self._lock.wait()
+            time.sleep(settings.PROFILER_INTERVAL / 1000)
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            with self._lock:
+                for ident, profiles in self._profiles.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    for profile in profiles:
+                        profile.add(frame)
+
+
+sampler = StackSampler()
+
+
+@contextmanager
+def profile_block(name):
+    """
+    Sample the current thread while the block runs. The result is written to PROFILER_SPOOL_DIR for one in
+    PROFILER_SAMPLE_RATE blocks and for every block taking longer than PROFILER_SLOW_THRESHOLD milliseconds.
+    Does nothing unless PROFILER_ENABLED is set.
+    """
+    if not settings.PROFILER_ENABLED:
+        yield None
+        return
+
+    sampled = next(_request_counter) % settings.PROFILER_SAMPLE_RATE == 0
+    profile = Profile(name)
+    ident = threading.get_ident()
+    sampler.add(ident, profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        sampler.remove(ident, profile)
+        duration = time.perf_counter() - start
+        if profile.samples and (sampled or duration * 1000 >= settings.PROFILER_SLOW_THRESHOLD):
+            profile.dump(settings.PROFILER_SPOOL_DIR, duration)
+
+
+class ProfilerMiddleware:
+    """
+    Profiles the django views, only active if PROFILER_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profile_block(f'view:{request.path}') as profile:
+            request.profile = profile
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match and request.profile:
+            request.profile.name = f'view:{request.resolver_match.view_name}'
+
+
+class ProfiledConsumerMixin:
+    """
+    Profiles the handlers of a channels consumer. Note that the event loop thread is sampled, so other
+    coroutines running concurrently on the same loop show up in the profile as well.
+    """
+
+    async def dispatch(self, message):
+        with profile_block(f'consumer:{type(self).__name__}.{message["type"]}'):
+            await super().dispatch(message)
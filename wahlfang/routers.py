@@ -0,0 +1,164 @@
+"""
+Routing of heavy read-only paths (voter overview, spectator page, result exports, prometheus gauges) to a read replica,
+configured with REPLICA_DATABASE. Only code marked with `replica_reads` reads from the replica, everything else,
+all writes, the authentication and the reads inside transactions stay on the primary (`default`) database.
+
+A user who wrote to the database is pinned to the primary for REPLICA_STICKY_SECONDS by a cookie, so they read their
+own writes (e.g. the overview right after voting) even if the replica lags behind.
+"""
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import StreamingHttpResponse
+
+STICKY_COOKIE = 'wahlfang_primary'
+# authentication data is always read from the primary
+PRIMARY_APPS = {'auth', 'sessions', 'contenttypes', 'admin'}
+PRIMARY_MODELS = {'management.electionmanager'}
+
+
+class RoutingState:
+    def __init__(self, sticky: bool = False):
+        self.sticky = sticky
+        self.wrote = False
+
+
+_replica_reads: ContextVar[bool] = ContextVar('replica_reads', default=False)
+_request_state: ContextVar[Optional[RoutingState]] = ContextVar('request_state', default=None)
+
+
+def replica_alias() -> Optional[str]:
+    alias = settings.REPLICA_DATABASE
+    return alias if alias and alias in settings.DATABASES else None
+
+
+@contextmanager
+def use_replica():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def mark_written():
+    """
+    Pin the current request to the primary, for writes on other threads (e.g. the ballot writer of vote.intake).
+    """
+    state = _request_state.get()
+    if state is not None:
+        state.wrote = True
+
+
+def _stream_from_replica(content, state):
+    # the response is streamed after the view and the middleware returned
+    content = iter(content)
+    while True:
+        token = _request_state.set(state)
+        try:
+            with use_replica():
+                chunk = next(content)
+        except StopIteration:
+            return
+        finally:
+            _request_state.reset(token)
+        yield chunk
+
+
+def replica_reads(function):
+    """
+    Read from the replica in the decorated function or view. Views load the user on the primary first and stream
+    their responses from the replica as well.
+    """
+    def finish(response):
+        if isinstance(response, StreamingHttpResponse) and not response.is_async:
+            response.streaming_content = _stream_from_replica(response.streaming_content, _request_state.get())
+        return response
+
+    if iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            if args and hasattr(args[0], 'auser'):
+                args[0].user = await args[0].auser()
+            with use_replica():
+                return finish(await function(*args, **kwargs))
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if args and hasattr(args[0], 'user'):
+            args[0].user.is_authenticated  # pylint: disable=W0104
+        with use_replica():
+            return finish(function(*args, **kwargs))
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        state = _request_state.get()
+        if alias is None or not _replica_reads.get() or (state is not None and (state.sticky or state.wrote)):
+            return None
+        if model._meta.app_label in PRIMARY_APPS or model._meta.label_lower in PRIMARY_MODELS:  # pylint: disable=W0212
+            return None
+        # reads inside a transaction belong to the transaction
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        mark_written()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same data
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Pins users who wrote to the database to the primary for REPLICA_STICKY_SECONDS.
+    Only active if REPLICA_DATABASE is configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if replica_alias() is None:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(sticky=STICKY_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(sticky=STICKY_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_response(state, response)
+
+    @staticmethod
+    def process_response(state, response):
+        if state.wrote:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
@@ -14,6 +14,54 @@ DEBUG = False
 # will also export # of manager accounts, # of sessions, # of elections
 EXPORT_PROMETHEUS_METRICS = True
 
+# record the number of database queries and the database time per view (exported as prometheus metrics)
+# and log queries slower than SQL_SLOW_QUERY_THRESHOLD milliseconds together with their query plan
+SQL_BUDGET_INSTRUMENTATION = False
+SQL_SLOW_QUERY_THRESHOLD = 100
+
+# sampling profiler for views and websocket consumers: profiles one in PROFILER_SAMPLE_RATE requests and every
+# request slower than PROFILER_SLOW_THRESHOLD milliseconds, see the profile_flamegraph management command
+PROFILER_ENABLED = False
+PROFILER_SAMPLE_RATE = 100
+PROFILER_SLOW_THRESHOLD = 1000
+# sampling interval in milliseconds
+PROFILER_INTERVAL = 5
+PROFILER_SPOOL_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# commit the submitted ballots of each worker process in batches of up to BALLOT_GROUP_COMMIT_MAX_BATCH ballots,
+# waiting at most BALLOT_GROUP_COMMIT_MAX_DELAY milliseconds for further ballots, see vote.intake
+BALLOT_GROUP_COMMIT = False
+BALLOT_GROUP_COMMIT_MAX_BATCH = 200
+BALLOT_GROUP_COMMIT_MAX_DELAY = 10
+# seconds a submission waits for its batch to be committed before it fails
+BALLOT_GROUP_COMMIT_TIMEOUT = 30
+
+# seconds the rendered election cards of the voters are cached, they are invalidated on changes, see vote.fragments
+FRAGMENT_CACHE_TIMEOUT = 10 * 60
+# max-age of the shared spectator page (Cache-Control), browsers and proxies revalidate it with its ETag afterwards
+SPECTATOR_MAX_AGE = 0
+
+# serve the voter index, ballot, access code login and spectator pages with native async views (vote.async_views),
+# only useful if HTTP is served with ASGI. Access codes are then verified by ASYNC_PASSWORD_WORKERS threads
+ASYNC_VOTER_VIEWS = False
+ASYNC_PASSWORD_WORKERS = 4
+
+# compile the templates, populate the URL resolvers, connect to the databases and load the password hasher before a
+# worker serves requests (on ASGI lifespan startup and when the WSGI application is loaded), see wahlfang.warmup.
+# ASGI servers without lifespan support (daphne) warm up when the application is imported with WARM_UP_ON_IMPORT.
+# Only the lifespan warm-up connects to the databases, unreachable databases are logged and do not stop the worker
+WARM_UP = True
+WARM_UP_ON_IMPORT = False
+
+# alias in DATABASES of a read replica for the voter overview, the spectator page, the result exports and the
+# prometheus gauges. Users who wrote to the database read from the primary for REPLICA_STICKY_SECONDS afterwards,
+# see wahlfang.routers
+REPLICA_DATABASE = None
+REPLICA_STICKY_SECONDS = 10
+
+# sessions whose elections all ended this many days ago are archived by the archive_sessions command, see vote.archive
+ARCHIVE_AFTER_DAYS = 90
+
 ALLOWED_HOSTS = ['*']
 
 # Application definition
@@ -36,6 +84,9 @@ if EXPORT_PROMETHEUS_METRICS:
     INSTALLED_APPS += ['django_prometheus']
 
 MIDDLEWARE = [
+    'wahlfang.metrics.QueryBudgetMiddleware',
+    'wahlfang.profiling.ProfilerMiddleware',
+    'wahlfang.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +104,8 @@ if EXPORT_PROMETHEUS_METRICS:
 
 ROOT_URLCONF = 'wahlfang.urls'
 
+DATABASE_ROUTERS = ['wahlfang.routers.ReplicaRouter']
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -162,6 +215,15 @@ LOGGING = {
             'filename': os.path.join(BASE_DIR, 'wahlfang.log'),
             'formatter': 'verbose',
         },
+        'slow_queries': {
+            'level': 'INFO',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'slow_queries.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'verbose',
+        },
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
@@ -178,6 +240,16 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'wahlfang.warmup': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'wahlfang.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
     'formatters': {
         'verbose': {
@@ -20,7 +20,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # only used with REPLICA_DATABASE = 'replica', e.g. by the tests of the replica routing
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+    },
 }
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -39,3 +44,6 @@ AUTH_LDAP_USER_DN_TEMPLATE = "cn=%(user)s,ou=account,ou=pnyx,dc=stusta,dc=mhn,dc
 AUTH_LDAP_START_TLS = True
 AUTH_LDAP_USER_ATTR_MAP = {'email': 'mail'}
 AUTH_LDAP_BIND_AS_AUTHENTICATING_USER = True
+
+# accept the fast password hashes of `seed_perf_data --fast-hasher`, new passwords are still hashed with argon2
+PASSWORD_HASHERS = PASSWORD_HASHERS + ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -0,0 +1,118 @@
+"""
+Import time and memory of a worker boot, see the startup_profile management command.
+
+`python -m wahlfang.startup wahlfang.asgi` imports the module and the URL configuration in a fresh interpreter, as
+a worker does until it serves its first request, and prints the time and resident memory every imported module took
+as JSON. Only the standard library may be imported here, everything else is part of the measurement.
+"""
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from importlib import machinery
+from typing import Dict, List, Optional
+
+
+def current_rss() -> int:
+    """
+    Resident memory of the process in bytes, the peak on platforms without /proc.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource  # pylint: disable=import-outside-toplevel
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class ImportRecorder:
+    """
+    Records the time and the memory executing each module took, by itself (`self`) and including the modules it
+    imported (`cumulative`). Covers Python source, bytecode and extension modules.
+    """
+
+    def __init__(self):
+        self.modules: Dict[str, Dict[str, float]] = {}
+        self._stack: List[list] = []
+        self._patched = []
+
+    def install(self):
+        for loader in (machinery.SourceFileLoader, machinery.SourcelessFileLoader, machinery.ExtensionFileLoader):
+            original = loader.exec_module
+            self._patched.append((loader, original))
+            loader.exec_module = self._wrap(original)
+
+    def uninstall(self):
+        for loader, original in reversed(self._patched):
+            loader.exec_module = original
+        self._patched = []
+
+    def _wrap(self, exec_module):
+        recorder = self
+
+        def timed_exec_module(loader, module):
+            # name, start time, start memory, time and memory of the nested imports
+            frame = [module.__name__, time.perf_counter(), current_rss(), 0.0, 0]
+            recorder._stack.append(frame)  # pylint: disable=W0212
+            try:
+                return exec_module(loader, module)
+            finally:
+                recorder._stack.pop()  # pylint: disable=W0212
+                recorder.add(frame)
+
+        return timed_exec_module
+
+    def add(self, frame):
+        name, start, start_rss, nested_time, nested_rss = frame
+        cumulative = time.perf_counter() - start
+        cumulative_rss = current_rss() - start_rss
+        self.modules[name] = {
+            'self': cumulative - nested_time,
+            'cumulative': cumulative,
+            'rss_self': cumulative_rss - nested_rss,
+            'rss_cumulative': cumulative_rss,
+        }
+        if self._stack:
+            self._stack[-1][3] += cumulative
+            self._stack[-1][4] += cumulative_rss
+
+
+def measure(target: str) -> dict:
+    recorder = ImportRecorder()
+    rss = current_rss()
+    start = time.perf_counter()
+    recorder.install()
+    try:
+        importlib.import_module(target)
+        # the URL configuration (and with it all views) is imported on the first request
+        from django.conf import settings  # pylint: disable=import-outside-toplevel
+        importlib.import_module(settings.ROOT_URLCONF)
+    finally:
+        recorder.uninstall()
+    return {
+        'target': target,
+        'total': time.perf_counter() - start,
+        'rss_before': rss,
+        'rss_after': current_rss(),
+        'modules': recorder.modules,
+    }
+
+
+def profile_startup(target: str = 'wahlfang.asgi', settings_module: Optional[str] = None) -> dict:
+    """
+    Measure the import of `target` in a fresh interpreter with the import path of this one.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    if settings_module:
+        env['DJANGO_SETTINGS_MODULE'] = settings_module
+    result = subprocess.run([sys.executable, '-m', 'wahlfang.startup', target], env=env, check=True,
+                            stdout=subprocess.PIPE)
+    # the JSON report is the last line, the imported modules may print as well
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+if __name__ == '__main__':
+    print(json.dumps(measure(sys.argv[1] if len(sys.argv) > 1 else 'wahlfang.asgi')))
@@ -0,0 +1,136 @@
+"""
+Warm-up of a worker before it serves requests, so the first voters after a deploy do not pay for template compilation,
+URL resolver population, the database connection and the initialization of the password hasher.
+
+It runs on ASGI lifespan startup (servers like uvicorn or hypercorn, daphne sends no lifespan events), when the WSGI
+application is loaded and, with WARM_UP_ON_IMPORT, when the ASGI application is imported. The warm-up on import does
+not connect to the databases: a preloading server (e.g. `gunicorn --preload`) imports the application before it forks
+the workers, which would inherit the connections (and the connection pool with its threads) of the parent.
+"""
+import logging
+import os
+import time
+from typing import Dict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.db import DatabaseError, connections
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import URLResolver, get_resolver
+
+from wahlfang.metrics import warmup_duration
+
+logger = logging.getLogger('wahlfang.warmup')
+
+
+def warm_templates() -> int:
+    """
+    Compile every template of the template directories and apps into the cached template loader.
+    """
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    name = os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+                    try:
+                        engine.get_template(name)
+                    except (TemplateSyntaxError, UnicodeDecodeError):
+                        # e.g. templates only meant to be extended with other tag libraries loaded
+                        logger.debug('Skipped template %s', name)
+                    else:
+                        count += 1
+    return count
+
+
+def warm_urls() -> int:
+    """
+    Populate the reverse lookups of the URL resolvers (compiling their patterns), including the namespaced ones.
+    """
+    def populate(resolver):
+        resolver.reverse_dict  # pylint: disable=W0104
+        count = 0
+        for pattern in resolver.url_patterns:
+            count += populate(pattern) if isinstance(pattern, URLResolver) else 1
+        return count
+
+    return populate(get_resolver())
+
+
+def warm_databases() -> int:
+    """
+    Connect to every database, with the pooled PostgreSQL backend this opens the pool. The connections are closed
+    again (returned to the pool) because the warm-up thread does not necessarily serve requests. A database which is
+    down is logged and skipped, the worker connects again on the first request.
+    """
+    count = 0
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            logger.exception('Could not connect to the database %s during the warm-up', connection.alias)
+            continue
+        if not connection.in_atomic_block:
+            connection.close()
+        count += 1
+    return count
+
+
+def warm_hasher() -> int:
+    # loads the argon2 library and allocates its memory once
+    hasher = get_hasher()
+    hasher.encode('warm-up', hasher.salt())
+    return 1
+
+
+STEPS = {
+    'templates': warm_templates,
+    'urls': warm_urls,
+    'databases': warm_databases,
+    'hasher': warm_hasher,
+}
+
+
+def warm_up(databases: bool = True) -> Dict[str, float]:
+    """
+    Run all warm-up steps and return their durations in seconds. Without `databases` when the application is
+    imported, see above.
+    """
+    durations = {}
+    for name, step in STEPS.items():
+        if name == 'databases' and not databases:
+            continue
+        start = time.perf_counter()
+        count = step()
+        durations[name] = time.perf_counter() - start
+        warmup_duration.labels(step=name).set(durations[name])
+        logger.debug('Warmed up %d %s in %.0f ms', count, name, durations[name] * 1000)
+    logger.info('Warm-up finished in %.0f ms (%s)', sum(durations.values()) * 1000,
+                ', '.join(f'{name} {duration * 1000:.0f} ms' for name, duration in durations.items()))
+    return durations
+
+
+class LifespanApplication:
+    """
+    ASGI application for the lifespan scope, warms up the worker on startup if WARM_UP is enabled.
+    """
+
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if settings.WARM_UP and not settings.WARM_UP_ON_IMPORT:
+                    try:
+                        await sync_to_async(warm_up)()
+                    except Exception as e:  # pylint: disable=W0703
+                        logger.exception('Warm-up failed')
+                        await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                        return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -7,9 +7,15 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/wsgi/
 """
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 from wahlfang.manage import setup
 
 setup()
 application = get_wsgi_application()
+
+if settings.WARM_UP:
+    from wahlfang.warmup import warm_up  # pylint: disable=wrong-import-position
+    # the workers connect to the databases themselves, a preloading server imports this before forking them
+    warm_up(databases=False)